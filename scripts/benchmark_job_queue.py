@@ -0,0 +1,110 @@
+"""Benchmark how long runners take to pick a pending job as the jobs table grows.
+
+The jobs are created in a throwaway test database, so the working database is
+untouched. Most jobs are finished, as they would be on a long-running server, and a
+few are pending.
+
+Usage: python scripts/benchmark_job_queue.py [table size ...]
+"""
+
+# pylint: disable=wrong-import-position, no-member
+
+import sys
+import os
+import time
+import datetime
+import django
+
+# Set up Django environment
+sys.path.insert(1, "./ssherlock")
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ssherlock.settings")
+django.setup()
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from ssherlock_server.models import Job
+
+# Table sizes to benchmark when none are given on the command line.
+DEFAULT_TABLE_SIZES = [10_000, 100_000, 1_000_000]
+# Number of pending jobs in the table; the rest are finished.
+PENDING_JOBS = 100
+# Number of times the queue pick is timed at each table size.
+PICKS = 1000
+# Number of jobs inserted per query.
+BATCH_SIZE = 10_000
+
+
+def pick_pending_job():
+    """Run the query runners use to find the oldest pending job."""
+    return (
+        Job.objects.filter(status="Pending")
+        .order_by("created_at")
+        .values_list("id", flat=True)
+        .first()
+    )
+
+
+def grow_jobs_table(user, count, size):
+    """Add finished jobs until the table holds the given number of jobs.
+
+    Args:
+        user (User): The owner of the new jobs.
+        count (int): The number of jobs already in the table.
+        size (int): The number of jobs the table should hold.
+    """
+    created_at = timezone.now() - datetime.timedelta(days=365)
+    while count < size:
+        batch = min(BATCH_SIZE, size - count)
+        jobs = [
+            Job(user=user, status="Completed", instructions="benchmark")
+            for _ in range(batch)
+        ]
+        Job.objects.bulk_create(jobs)
+        count += batch
+    # auto_now_add ignores the values given to bulk_create, so backdate the finished
+    # jobs afterwards so that they are older than the pending ones.
+    Job.objects.exclude(status="Pending").update(created_at=created_at)
+
+
+def benchmark(sizes):
+    """Time the queue pick at each table size and print the results."""
+    user = User.objects.create_user("benchmark", "benchmark@example.com", "password")
+    Job.objects.bulk_create(
+        Job(user=user, status="Pending", instructions="benchmark")
+        for _ in range(PENDING_JOBS)
+    )
+    count = PENDING_JOBS
+    print(f"{'jobs':>12}  {'mean pick (ms)':>15}  query plan")
+    for size in sorted(sizes):
+        grow_jobs_table(user, count, size)
+        count = max(count, size)
+        plan = (
+            Job.objects.filter(status="Pending")
+            .order_by("created_at")
+            .values_list("id", flat=True)[:1]
+            .explain()
+        ).replace("\n", " / ")
+        start = time.perf_counter()
+        for _ in range(PICKS):
+            pick_pending_job()
+        elapsed = (time.perf_counter() - start) / PICKS
+        print(f"{count:>12,}  {elapsed * 1000:>15.3f}  {plan}")
+
+
+def main():
+    """Run the benchmark in a throwaway test database."""
+    sizes = [int(size) for size in sys.argv[1:]] or DEFAULT_TABLE_SIZES
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        benchmark(sizes)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,14 @@
 # pylint: disable=import-error
 from django.contrib import admin
 
-from .models import BastionHost, Credential, Job, LlmApi, TargetHost
+from .models import (
+    BastionHost,
+    Credential,
+    Job,
+    JobTargetHostStatus,
+    LlmApi,
+    TargetHost,
+)
 
 
 @admin.register(Credential)
@@ -19,5 +26,6 @@ class CredentialAdmin(admin.ModelAdmin):
 
 admin.site.register(BastionHost)
 admin.site.register(Job)
+admin.site.register(JobTargetHostStatus)
 admin.site.register(LlmApi)
 admin.site.register(TargetHost)
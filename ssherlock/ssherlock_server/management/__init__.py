@@ -0,0 +1 @@
+"""Mark this as a Python package."""
@@ -0,0 +1,17 @@
+"""Compress the logs of finished jobs that are still stored as plain text."""
+
+# pylint: disable=import-error
+from django.core.management.base import BaseCommand
+
+from ssherlock_server.utils import compress_finished_job_logs
+
+
+class Command(BaseCommand):
+    """Catch up on job log compressions lost when the server restarted."""
+
+    help = "Compress the logs of finished jobs that are still stored as plain text."
+
+    def handle(self, *args, **options):
+        """Compress the logs and report how many were compressed."""
+        compressed = compress_finished_job_logs()
+        self.stdout.write(f"Compressed {compressed} job logs.")
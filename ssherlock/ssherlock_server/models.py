@@ -21,6 +21,11 @@ class BastionHost(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(
+                fields=["user", "-created_at"], name="bastion_user_created_idx"
+            ),
+        ]
 
     def __str__(self):
         return self.hostname
@@ -60,6 +65,11 @@ class Credential(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(
+                fields=["user", "-created_at"], name="credential_user_created_idx"
+            ),
+        ]
 
     def __str__(self):
         return self.credential_name
@@ -78,6 +88,11 @@ class LlmApi(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(
+                fields=["user", "-created_at"], name="llm_api_user_created_idx"
+            ),
+        ]
 
     def __str__(self):
         return self.base_url
@@ -96,6 +111,11 @@ class TargetHost(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(
+                fields=["user", "-created_at"], name="target_host_user_created_idx"
+            ),
+        ]
 
     def __str__(self):
         return self.hostname
@@ -126,12 +146,15 @@ class Job(models.Model):
     )
     STATUS_CHOICES = [
         ("canceled", "Canceled"),
+        ("claimed", "Claimed"),
         ("completed", "Completed"),
         ("context_exceeded", "Context Exceeded"),
         ("failed", "Failed"),
         ("pending", "Pending"),
         ("running", "Running"),
     ]
+    # Statuses a job never leaves on its own.
+    TERMINAL_STATUSES = ["Canceled", "Completed", "Context Exceeded", "Failed"]
     status = models.CharField(
         "Current status of job",
         max_length=32,
@@ -139,6 +162,16 @@ class Job(models.Model):
         default="Pending",
         editable=False,
     )
+    claimed_by = models.CharField(
+        "Runner that claimed the job",
+        max_length=255,
+        blank=True,
+        null=True,
+        editable=False,
+    )
+    claimed_at = models.DateTimeField(
+        "Date job was claimed", blank=True, null=True, editable=False
+    )
     llm_api = models.ForeignKey(LlmApi, on_delete=models.SET_NULL, null=True)
     bastion_host = models.ForeignKey(
         BastionHost, on_delete=models.SET_NULL, blank=True, null=True
@@ -164,12 +197,36 @@ class Job(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # Used by the list views, which show a user's newest jobs first.
+            models.Index(
+                fields=["user", "-created_at"], name="job_user_created_idx"
+            ),
+            # Used to find the oldest job in a given status.
+            models.Index(
+                fields=["status", "created_at"], name="job_status_created_idx"
+            ),
+            # Used by runners to pick the oldest pending job. Only pending jobs are
+            # indexed, so the index stays small however many jobs have finished.
+            # Backends without partial indexes skip it and fall back to the index above.
+            models.Index(
+                fields=["created_at"],
+                name="job_pending_created_idx",
+                condition=models.Q(status="Pending"),
+            ),
+        ]
 
     def __str__(self):
         return str(self.id)
 
     def dict(self) -> dict[str, any]:
-        """Return relevant object data as a dict for runners."""
+        """Return relevant object data as a dict for runners.
+
+        All target hosts are listed under "target_hosts". The first host is also exposed
+        through the target_host_* keys for runners that only handle a single host.
+        """
+        target_hosts = list(self.target_hosts.all())
+        first_target_host = target_hosts[0] if target_hosts else None
         return {
             "id": str(self.id),
             "status": str(self.status),
@@ -186,10 +243,12 @@ class Job(models.Model):
             "credentials_for_bastion_host_private_key": getattr(
                 self.credentials_for_bastion_host, "private_key", None
             ),
-            "target_host_hostname": getattr(
-                self.target_hosts.first(), "hostname", None
-            ),
-            "target_host_port": getattr(self.target_hosts.first(), "port", None),
+            "target_host_hostname": getattr(first_target_host, "hostname", None),
+            "target_host_port": getattr(first_target_host, "port", None),
+            "target_hosts": [
+                {"id": str(host.id), "hostname": host.hostname, "port": host.port}
+                for host in target_hosts
+            ],
             "credentials_for_target_hosts_username": getattr(
                 self.credentials_for_target_hosts, "username", None
             ),
@@ -201,3 +260,34 @@ class Job(models.Model):
             ),
             "instructions": self.instructions,
         }
+
+
+class JobTargetHostStatus(models.Model):
+    """Tracks the status of one target host within a job that runs against several hosts."""
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    job = models.ForeignKey(
+        Job, on_delete=models.CASCADE, related_name="target_host_statuses"
+    )
+    target_host = models.ForeignKey(TargetHost, on_delete=models.CASCADE)
+    updated_at = models.DateTimeField(
+        "Date target host status was last updated", auto_now=True, editable=False
+    )
+    status = models.CharField(
+        "Current status of the job on this target host",
+        max_length=32,
+        choices=Job.STATUS_CHOICES,
+        default="Pending",
+        editable=False,
+    )
+
+    class Meta:
+        ordering = ["target_host__hostname"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["job", "target_host"], name="unique_job_target_host_status"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.target_host}: {self.status}"
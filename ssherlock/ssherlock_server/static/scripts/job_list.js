@@ -1,7 +1,95 @@
 /**
  * Initializes the DataTable for the job list table.
- * This function is called when the document is fully loaded.
+ * Rows are fetched from the server a page at a time, so sorting, searching and paging
+ * are done by the server rather than in the browser.
  */
 $(document).ready(function () {
-    $('#job_list_table').DataTable();
+    const table = $('#job_list_table');
+    if (!table.length) {
+        return;
+    }
+    const csrfToken = $('input[name="csrfmiddlewaretoken"]').val();
+
+    // Badge classes for each job status.
+    const STATUS_CLASSES = {
+        'Canceled': 'bg-gray-700 text-gray-200 ring-white/10',
+        'Claimed': 'bg-indigo-600/20 text-indigo-300 ring-indigo-600/40',
+        'Completed': 'bg-green-600/20 text-green-300 ring-green-600/40',
+        'Context Exceeded': 'bg-red-600/20 text-red-300 ring-red-600/40',
+        'Failed': 'bg-red-600/20 text-red-300 ring-red-600/40',
+        'Pending': 'bg-yellow-600/20 text-yellow-300 ring-yellow-600/40',
+        'Running': 'bg-blue-600/20 text-blue-300 ring-blue-600/40',
+    };
+
+    /**
+     * Render a job's status as a badge.
+     *
+     * @param {string} status
+     * @returns {jQuery}
+     */
+    function renderStatus(status) {
+        const classes = STATUS_CLASSES[status] || 'bg-gray-700 text-gray-200 ring-white/10';
+        return $('<span>')
+            .addClass('inline-flex items-center gap-1 rounded-full px-2 py-0.5 text-xs font-medium ring-1 ring-inset ' + classes)
+            .text(status);
+    }
+
+    /**
+     * Render a job's Cancel and Retry buttons.
+     *
+     * @param {Object} job
+     * @returns {jQuery}
+     */
+    function renderActions(job) {
+        const actions = $('<div>').addClass('flex space-x-2');
+        if (job.cancel_url) {
+            const form = $('<form>').attr({ method: 'post', action: job.cancel_url });
+            form.append($('<input>').attr({ type: 'hidden', name: 'csrfmiddlewaretoken', value: csrfToken }));
+            form.append($('<button>').attr('type', 'submit').addClass('bg-red-500 hover:bg-red-600 mt-2 p-2 rounded').text('Cancel'));
+            actions.append(form);
+        }
+        if (job.retry_url) {
+            actions.append($('<a>').addClass('bg-blue-500 hover:bg-blue-600 mt-2 p-2 rounded').attr('href', job.retry_url).text('Retry'));
+        }
+        return actions;
+    }
+
+    table.DataTable({
+        serverSide: true,
+        processing: true,
+        ajax: table.data('url'),
+        order: [[0, 'desc']],
+        columns: [
+            { data: 'created_at', render: DataTable.render.text() },
+            {
+                data: 'status',
+                render: function (data, type) {
+                    return type === 'display' ? renderStatus(data).prop('outerHTML') : data;
+                },
+            },
+            { data: 'llm_api', render: DataTable.render.text() },
+            { data: 'target_hosts', orderable: false, render: DataTable.render.text() },
+            { data: 'credentials_for_target_hosts', render: DataTable.render.text() },
+            {
+                data: null,
+                orderable: false,
+                searchable: false,
+                render: function (data, type, row) {
+                    return type === 'display' ? renderActions(row).prop('outerHTML') : '';
+                },
+            },
+        ],
+        createdRow: function (row, data) {
+            $(row)
+                .addClass('hover:bg-gray-700 cursor-pointer odd:bg-gray-800 even:bg-gray-900 focus:outline-none focus-visible:ring-2 focus-visible:ring-green-500/50')
+                .attr({ role: 'button', tabindex: 0 })
+                .on('click', function (event) {
+                    // Let the Cancel and Retry buttons work without opening the job.
+                    if ($(event.target).closest('form, a').length) {
+                        return;
+                    }
+                    window.location = data.view_url;
+                });
+        },
+    });
 });
@@ -1,5 +1,6 @@
 /**
- * Load the full job log once, then subscribe to SSE for incremental updates.
+ * Load the end of the job log, then stream new lines over SSE from where it left off.
+ * Older lines are fetched a page at a time as the user scrolls up.
  * Keeps auto-scroll behaviour and handles errors gracefully.
  */
 (function () {
@@ -11,81 +12,154 @@
 
   const streamUrl = jobLogDiv.getAttribute("data-stream-url");
   const fullLogUrl = jobLogDiv.getAttribute("data-full-log-url");
+  // The element that scrolls when the log overflows.
+  const scrollContainer = jobLogDiv.parentElement;
+  // The job log's heading line; older lines are inserted after it.
+  const headerLine = jobLogDiv.firstElementChild;
+
+  // Number of lines fetched per page of the log.
+  const PAGE_LINES = 2000;
+  // Fetch older lines once the user scrolls within this many pixels of the top.
+  const LOAD_OLDER_THRESHOLD_PX = 200;
+
+  // Byte offset of the oldest line loaded so far.
+  let oldestOffset = 0;
+  let loadingOlder = false;
 
   /**
-   * Append a single log line to the job log container.
+   * Create a single log line element.
    *
-   * Ensures the appended element has the `log-line` class so CSS counters
+   * Ensures the element has the `log-line` class so CSS counters
    * can render incremental line numbers. Accepts an optional options object
    * to mark the line as an error.
    *
    * @param {string} line
    * @param {{error?: boolean}} [opts]
+   * @returns {HTMLParagraphElement}
    */
-  function appendLine(line, opts = {}) {
+  function createLine(line, opts = {}) {
     const p = document.createElement("p");
     p.className = "log-line";
     if (opts.error) {
       p.style.color = "red";
     }
     p.textContent = line;
-    jobLogDiv.appendChild(p);
+    return p;
+  }
+
+  /**
+   * Append a single log line to the job log container.
+   *
+   * @param {string} line
+   * @param {{error?: boolean}} [opts]
+   */
+  function appendLine(line, opts = {}) {
+    jobLogDiv.appendChild(createLine(line, opts));
   }
 
   /**
-   * Load the full log via fetch and render it.
+   * Fetch a page of log lines.
+   *
+   * @param {string} query
+   * @returns {Promise<{lines: string[], start: number, end: number}>}
    */
-  async function loadFullLog() {
+  async function fetchPage(query) {
+    const resp = await fetch(`${fullLogUrl}?${query}`, { credentials: "same-origin" });
+    if (!resp.ok) {
+      throw new Error(`Error fetching job log: ${resp.status}`);
+    }
+    return resp.json();
+  }
+
+  /**
+   * Load the last page of the log.
+   *
+   * @returns {Promise<number>} The byte offset to stream new lines from.
+   */
+  async function loadTail() {
     if (!fullLogUrl) {
-      return;
+      return 0;
     }
     try {
-      const resp = await fetch(fullLogUrl, { credentials: "same-origin" });
-      if (!resp.ok) {
-        appendLine(`Error fetching full log: ${resp.status}`, { error: true });
-        return;
-      }
-      const text = await resp.text();
-      if (text) {
-        // Render each line as a paragraph.
-        text.split(/\r?\n/).forEach((line) => {
-          if (line.length > 0) {
-            appendLine(line, { error: /error/i.test(line) });
-          }
-        });
-        // Scroll to bottom after initial load.
-        jobLogDiv.scrollTop = jobLogDiv.scrollHeight;
-      }
+      const page = await fetchPage(`tail=${PAGE_LINES}`);
+      page.lines.forEach((line) => {
+        appendLine(line, { error: /error/i.test(line) });
+      });
+      oldestOffset = page.start;
+      // Scroll to bottom after initial load.
+      scrollContainer.scrollTop = scrollContainer.scrollHeight;
+      return page.end;
     } catch (err) {
       appendLine(`Error loading log: ${err}`, { error: true });
+      return 0;
+    }
+  }
+
+  /**
+   * Load the page of lines before the oldest one shown, keeping the scroll position.
+   */
+  async function loadOlder() {
+    if (loadingOlder || oldestOffset === 0) {
+      return;
+    }
+    loadingOlder = true;
+    try {
+      const page = await fetchPage(`before=${oldestOffset}&limit=${PAGE_LINES}`);
+      const fragment = document.createDocumentFragment();
+      page.lines.forEach((line) => {
+        fragment.appendChild(createLine(line, { error: /error/i.test(line) }));
+      });
+      const previousHeight = scrollContainer.scrollHeight;
+      jobLogDiv.insertBefore(fragment, headerLine ? headerLine.nextSibling : jobLogDiv.firstChild);
+      scrollContainer.scrollTop += scrollContainer.scrollHeight - previousHeight;
+      oldestOffset = page.start;
+    } catch (err) {
+      console.error(err);
+    } finally {
+      loadingOlder = false;
     }
   }
 
   /**
-   * Start EventSource to receive appended log lines.
+   * Start EventSource to receive log lines from the given byte offset onwards.
+   *
+   * Each event's ID is the byte offset just past its line, so when the connection
+   * drops the browser reconnects with Last-Event-ID and only the missing lines are sent.
+   *
+   * @param {number} offset
    */
-  function startSSE() {
+  function startSSE(offset) {
     if (!streamUrl) {
       return;
     }
-    const es = new EventSource(streamUrl);
+    const es = new EventSource(`${streamUrl}?offset=${offset}`);
     es.onmessage = function (event) {
       // Server sends raw lines in event.data; append and scroll.
       appendLine(event.data, { error: /error/i.test(event.data) });
-      jobLogDiv.scrollTop = jobLogDiv.scrollHeight;
+      scrollContainer.scrollTop = scrollContainer.scrollHeight;
     };
-    es.addEventListener("error", function (event) {
-      // If server emits an error event, show it and close the connection.
-      const errText = event.data || "SSE error";
-      appendLine(errText, { error: true });
+    es.addEventListener("end", function () {
+      // The job has finished; close so the browser doesn't reconnect.
       es.close();
     });
-    es.onerror = function () {
+    es.addEventListener("error", function (event) {
+      if (event.data) {
+        // The server emitted an error event; show it and close the connection.
+        appendLine(event.data, { error: true });
+        es.close();
+        return;
+      }
+      // The connection dropped; the browser reconnects and resumes from the last event.
       console.error("Error occurred in SSE connection.");
-      es.close();
-    };
+    });
   }
 
-  // Initialize: load existing content, then stream updates.
-  loadFullLog().then(startSSE);
+  scrollContainer.addEventListener("scroll", function () {
+    if (scrollContainer.scrollTop < LOAD_OLDER_THRESHOLD_PX) {
+      loadOlder();
+    }
+  });
+
+  // Initialize: load the end of the log, then stream updates.
+  loadTail().then(startSSE);
 })();
@@ -19,6 +19,7 @@ urlpatterns = [
     path("bastion_host_list", views.bastion_host_list, name="bastion_host_list"),
     path("credential_list", views.credential_list, name="credential_list"),
     path("job_list", views.job_list, name="job_list"),
+    path("job_list/data", views.job_list_data, name="job_list_data"),
     path("llm_api_list", views.llm_api_list, name="llm_api_list"),
     path("target_host_list", views.target_host_list, name="target_host_list"),
     path("request_job", views.request_job, name="request_job"),
@@ -29,6 +30,11 @@ urlpatterns = [
     ),
     path("get_job_status/<uuid:job_id>", views.get_job_status, name="get_job_status"),
     path("log_job_data/<uuid:job_id>", views.log_job_data, name="log_job_data"),
+    path(
+        "log_job_data_batch/<uuid:job_id>",
+        views.log_job_data_batch,
+        name="log_job_data_batch",
+    ),
     path("view_job/<uuid:job_id>", views.view_job, name="view_job"),
     path("view_job/<uuid:job_id>/log", views.stream_job_log, name="stream_job_log"),
     path(
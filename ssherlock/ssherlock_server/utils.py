@@ -1,10 +1,62 @@
 """Miscellaneous utility functions."""
 
-from django.http import JsonResponse
+# pylint: disable=import-error, invalid-str-returned, no-member
+
+import asyncio
+import collections
+import contextlib
+import datetime
+import fcntl
+import gzip
+import io
+import logging
 import os
+import shutil
+import threading
 import time
+import zlib
+from typing import AsyncIterator, BinaryIO, Iterable, Iterator, List, Optional, Tuple
+
+from asgiref.sync import sync_to_async
 from django.conf import settings
-from typing import Tuple, Iterator
+from django.db import connection, transaction
+from django.db.models import DurationField, ExpressionWrapper, F, Q, Value
+from django.http import JsonResponse
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Number of times the compare-and-swap claim is retried when another runner wins the race.
+CLAIM_JOB_MAX_RETRIES = 5
+
+# Timestamp field set when a job moves to each status.
+JOB_STATUS_TIMESTAMP_FIELDS = {
+    "Running": "started_at",
+    "Completed": "completed_at",
+    "Canceled": "stopped_at",
+    "Context Exceeded": "stopped_at",
+    "Failed": "stopped_at",
+}
+
+# Signaled whenever a job becomes pending so long-polling request_job calls wake up.
+_pending_job_condition = threading.Condition()
+
+# Number of bytes read from a job log file at a time.
+JOB_LOG_CHUNK_SIZE = 64 * 1024
+
+# File suffix of job logs compressed with each supported JOB_LOG_COMPRESSION.
+JOB_LOG_COMPRESSION_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+
+# Open job log streams in this process, keyed by job ID. Each is an (event loop, event)
+# pair; the event is set whenever the job's log or status changes.
+_job_update_subscribers = {}
+_job_update_subscribers_lock = threading.Lock()
+
+# Log compressions scheduled in this process but not yet started, by job ID.
+_scheduled_compressions = {}
+_scheduled_compressions_lock = threading.Lock()
 
 
 def check_private_key(request):
@@ -29,6 +81,196 @@ def check_private_key(request):
     return None
 
 
+def claim_pending_job(runner_id: str) -> Optional[Job]:
+    """Atomically claim the oldest pending job for the given runner.
+
+    On databases that support it, the job row is locked with SELECT ... FOR UPDATE SKIP LOCKED
+    so concurrent runners each get a different job without waiting on each other. Otherwise
+    (e.g. SQLite) a compare-and-swap UPDATE ... WHERE status='Pending' is used, and the claim
+    is retried on the next oldest job if another runner won the race.
+
+    Args:
+        runner_id (str): An identifier for the runner claiming the job.
+
+    Returns:
+        Job or None: The claimed job, or None if there are no pending jobs.
+    """
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            job = (
+                Job.objects.filter(status="Pending")
+                .order_by("created_at")
+                .select_for_update(skip_locked=True)
+                .first()
+            )
+            if job is None:
+                return None
+            job.status = "Claimed"
+            job.claimed_by = runner_id
+            job.claimed_at = timezone.now()
+            job.save(update_fields=["status", "claimed_by", "claimed_at"])
+            return job
+
+    for _ in range(CLAIM_JOB_MAX_RETRIES):
+        job_id = (
+            Job.objects.filter(status="Pending")
+            .order_by("created_at")
+            .values_list("id", flat=True)
+            .first()
+        )
+        if job_id is None:
+            return None
+        claimed = Job.objects.filter(pk=job_id, status="Pending").update(
+            status="Claimed", claimed_by=runner_id, claimed_at=timezone.now()
+        )
+        if claimed:
+            return Job.objects.get(pk=job_id)
+    return None
+
+
+def release_stale_claims() -> int:
+    """Return jobs that were claimed but not started within the lease to Pending.
+
+    A runner that dies between claiming a job and reporting it as Running, or whose
+    request_job response was lost, would otherwise leave the job Claimed forever.
+
+    Returns:
+        int: The number of jobs returned to Pending.
+    """
+    expired = timezone.now() - datetime.timedelta(
+        seconds=settings.JOB_CLAIM_LEASE_SECONDS
+    )
+    released = Job.objects.filter(status="Claimed", claimed_at__lt=expired).update(
+        status="Pending", claimed_by=None, claimed_at=None
+    )
+    if released:
+        logger.warning("Returned %s stale claimed jobs to Pending", released)
+    return released
+
+
+def check_runner_claim(request, job_id, claimed_by=None):
+    """Check that the runner making a request is the one that claimed the job.
+
+    Jobs are claimed with the runner's X-Runner-Id header. A runner whose claim expired,
+    and whose job was then claimed by another runner, mustn't change its status or log.
+
+    Args:
+        request: The runner's request.
+        job_id: The ID of the job.
+        claimed_by (str, optional): The job's claimed_by, if already loaded.
+
+    Returns:
+        JsonResponse or None: Returns a JsonResponse if another runner claimed the job,
+            otherwise None.
+    """
+    if claimed_by is None:
+        claimed_by = (
+            Job.objects.filter(pk=job_id).values_list("claimed_by", flat=True).first()
+        )
+    if claimed_by and claimed_by != request.headers.get("X-Runner-Id", ""):
+        return JsonResponse(
+            {"message": "Job is claimed by another runner."}, status=403
+        )
+    return None
+
+
+def get_job_status_value(job_id) -> Optional[str]:
+    """Return a job's status without loading the rest of the row.
+
+    Args:
+        job_id: The ID of the job.
+
+    Returns:
+        str or None: The job's status, or None if the job doesn't exist.
+    """
+    return Job.objects.filter(pk=job_id).values_list("status", flat=True).first()
+
+
+def transition_job_status(
+    job_id, new_status: str, runner_id: Optional[str] = None
+) -> bool:
+    """Move a job to a new status with a single conditional UPDATE.
+
+    Jobs in a terminal status are left alone, so a runner reporting "Running" late can't
+    undo a user canceling the job. The matching timestamp field is set in the same
+    statement, and a job entering a terminal status has its duration computed from
+    started_at.
+
+    Args:
+        job_id: The ID of the job.
+        new_status (str): The status to move the job to.
+        runner_id (str, optional): The runner reporting the status. If given, jobs claimed
+            by another runner are left alone.
+
+    Returns:
+        bool: True if the job's status was changed, False if the job doesn't exist, is
+            already in a terminal status or is claimed by another runner.
+    """
+    now = timezone.now()
+    fields = {"status": new_status}
+    timestamp_field = JOB_STATUS_TIMESTAMP_FIELDS.get(new_status)
+    if timestamp_field:
+        fields[timestamp_field] = now
+    if new_status in Job.TERMINAL_STATUSES:
+        fields["duration"] = ExpressionWrapper(
+            Value(now) - F("started_at"), output_field=DurationField()
+        )
+    jobs = Job.objects.filter(pk=job_id).exclude(status__in=Job.TERMINAL_STATUSES)
+    if runner_id is not None:
+        jobs = jobs.filter(
+            Q(claimed_by__isnull=True) | Q(claimed_by__in=("", runner_id))
+        )
+    updated = jobs.update(**fields)
+    return updated > 0
+
+
+def release_db_connection() -> None:
+    """Close this thread's database connection, so it isn't held while a request waits.
+
+    A pooled connection goes back to the pool, and the next query opens (or borrows)
+    another one. Connections inside a transaction, as in tests, are left open.
+    """
+    if not connection.in_atomic_block:
+        connection.close()
+
+
+def notify_pending_job() -> None:
+    """Wake any request_job calls waiting in this process for a pending job."""
+    with _pending_job_condition:
+        _pending_job_condition.notify_all()
+
+
+def wait_for_pending_job(runner_id: str, wait_seconds: float) -> Optional[Job]:
+    """Claim a pending job, waiting up to wait_seconds for one to become available.
+
+    Waiting calls are woken as soon as notify_pending_job is called in this process, and
+    re-check the database every REQUEST_JOB_POLL_INTERVAL_SECONDS to pick up jobs created by
+    other server processes. The database connection is released while waiting. Stale
+    claims are released first, so a job whose runner never started it is handed out again.
+
+    Args:
+        runner_id (str): An identifier for the runner claiming the job.
+        wait_seconds (float): Maximum number of seconds to wait. 0 returns immediately.
+
+    Returns:
+        Job or None: The claimed job, or None if no job became available in time.
+    """
+    deadline = time.monotonic() + wait_seconds
+    release_stale_claims()
+    while True:
+        job = claim_pending_job(runner_id)
+        if job is not None:
+            return job
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        release_db_connection()
+        with _pending_job_condition:
+            _pending_job_condition.wait(
+                min(remaining, settings.REQUEST_JOB_POLL_INTERVAL_SECONDS)
+            )
+
+
 def get_object_pretty_name(model_type):
     """Convert a model type string to a pretty name."""
     if model_type == "llm_api" or model_type == "LLM API":
@@ -38,77 +280,713 @@ def get_object_pretty_name(model_type):
     return pretty_name
 
 
-def get_job_log_path(job_id: str) -> Tuple[str, str]:
-    """Return the log directory and log file path for a given job ID.
+def get_job_log_relative_path(job_id: str) -> str:
+    """Return the path of a job's log file relative to the job log directory.
 
     Args:
         job_id (str): The UUID (or string) of the job.
 
     Returns:
-        tuple: (log_dir, log_file_path)
+        str: The relative path, using forward slashes.
     """
-    # Define the directory and file path for storing logs.
     # Use the .git/objects method of storing job files.
     # The first two characters of the job ID become a subdirectory.
     # The next two characters of the job ID become another subdirectory.
     # The remainining characters of the job ID become the name of the log file.
     # This is to prevent letting directories fill up with tons of files.
     job_id = str(job_id)
-    log_dir = os.path.join(
+    return f"{job_id[0:2]}/{job_id[2:4]}/{job_id[4:6]}/{job_id[6:]}.log"
+
+
+def get_job_log_path(job_id: str) -> Tuple[str, str]:
+    """Return the log directory and log file path for a given job ID.
+
+    Args:
+        job_id (str): The UUID (or string) of the job.
+
+    Returns:
+        tuple: (log_dir, log_file_path)
+    """
+    log_file_path = os.path.join(
         settings.BASE_DIR.parent,
         "ssherlock_runner_job_logs",
-        job_id[0:2],
-        job_id[2:4],
-        job_id[4:6],
+        *get_job_log_relative_path(job_id).split("/"),
     )
-    log_file_path = os.path.join(log_dir, f"{job_id[6:]}.log")
-    return log_dir, log_file_path
+    return os.path.dirname(log_file_path), log_file_path
+
 
+def format_log_timestamp(timestamp: Optional[float] = None) -> str:
+    """Format a Unix timestamp as the UTC prefix used on job log lines.
 
-def read_full_job_log(job_id: str) -> str:
-    """Read and return the full contents of a job log file.
+    Args:
+        timestamp (float, optional): Seconds since the epoch. Defaults to now.
 
-    If the log file does not exist, return an empty string.
+    Returns:
+        str: The formatted timestamp.
+    """
+    if timestamp is None:
+        timestamp = time.time()
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).strftime(
+        "%Y-%m-%d %H:%M:%S"
+    )
+
+
+def format_log_entry(entry) -> str:
+    """Format one entry of a log batch as a job log line.
+
+    An entry is either a plain string, which is stamped with the current time, or a dict
+    with a "message" and an optional runner-side "timestamp" and "level".
+
+    Args:
+        entry (str or dict): The log entry.
+
+    Returns:
+        str: The log line, without a trailing newline.
+
+    Raises:
+        ValueError: If the entry is malformed.
+    """
+    if isinstance(entry, str):
+        return f"{format_log_timestamp()} {entry}"
+    if not isinstance(entry, dict) or not isinstance(entry.get("message"), str):
+        raise ValueError("Invalid log entry.")
+    timestamp = entry.get("timestamp")
+    level = entry.get("level")
+    if timestamp is not None and (
+        isinstance(timestamp, bool) or not isinstance(timestamp, (int, float))
+    ):
+        raise ValueError("Invalid log entry.")
+    if level is not None and not isinstance(level, str):
+        raise ValueError("Invalid log entry.")
+    try:
+        line = format_log_timestamp(timestamp)
+    except (OverflowError, OSError, ValueError) as e:
+        raise ValueError("Invalid log entry.") from e
+    if level:
+        line = f"{line} {level}"
+    return f"{line} {entry['message']}"
+
+
+def get_compressed_job_log_path(job_id: str) -> Tuple[Optional[str], Optional[str]]:
+    """Return the compression and path of a job's compressed log file.
 
     Args:
         job_id (str): The UUID (or string) of the job.
 
     Returns:
-        str: The entire log file contents or an empty string.
+        tuple: (compression, compressed_log_file_path), or (None, None) if the job's log
+            hasn't been compressed.
+    """
+    _, log_file_path = get_job_log_path(job_id)
+    for compression, suffix in JOB_LOG_COMPRESSION_SUFFIXES.items():
+        if os.path.exists(log_file_path + suffix):
+            return compression, log_file_path + suffix
+    return None, None
+
+
+def open_job_log(job_id: str) -> BinaryIO:
+    """Open a job's log file for reading, decompressing it on the fly if it's compressed.
+
+    Args:
+        job_id (str): The UUID (or string) of the job.
+
+    Returns:
+        BinaryIO: The opened log file.
+
+    Raises:
+        FileNotFoundError: If the job has no log file.
     """
     _, log_file_path = get_job_log_path(job_id)
     try:
-        with open(log_file_path, "r", encoding="utf-8") as f:
-            return f.read()
+        return open(log_file_path, "rb")
     except FileNotFoundError:
-        return ""
+        compression, compressed_log_file_path = get_compressed_job_log_path(job_id)
+        if compression == "gzip":
+            return gzip.open(compressed_log_file_path, "rb")
+        if compression == "zstd":
+            import zstandard  # pylint: disable=import-outside-toplevel
 
+            return zstandard.ZstdDecompressor().stream_reader(
+                open(compressed_log_file_path, "rb"), read_across_frames=True
+            )
+        raise
 
-def stream_job_log_generator(job_id: str) -> Iterator[str]:
-    """Generator that yields Server-Sent Events for new job log lines.
 
-    The generator seeks to the end of the current log file and yields any new
-    lines appended to the file. If the file is missing it yields a single
-    SSE-formatted error event.
+def seek_job_log(log_file: BinaryIO, offset: int) -> int:
+    """Seek a log file opened by open_job_log, stopping at the end of the log.
+
+    Args:
+        log_file (BinaryIO): The log file.
+        offset (int): The byte offset in the uncompressed log to seek to.
+
+    Returns:
+        int: The new position.
+    """
+    # Compressed files stop at the end by themselves; plain files would seek past it.
+    if isinstance(log_file, io.BufferedReader):
+        offset = min(offset, os.fstat(log_file.fileno()).st_size)
+    return log_file.seek(offset)
+
+
+def _write_all(fd: int, data: bytes) -> None:
+    """Write all of data to a file descriptor."""
+    view = memoryview(data)
+    while view:
+        written = os.write(fd, view)
+        view = view[written:]
+
+
+def _compress(data: bytes, compression: str) -> bytes:
+    """Compress data as a standalone gzip member or zstd frame."""
+    if compression == "zstd":
+        import zstandard  # pylint: disable=import-outside-toplevel
+
+        return zstandard.ZstdCompressor().compress(data)
+    return gzip.compress(data)
+
+
+def append_job_log(job_id: str, lines: Iterable[str]) -> None:
+    """Append lines to a job's log file with a single write.
+
+    The file is opened with O_APPEND, so concurrent batches for the same job never
+    interleave within a batch. If the log has already been compressed, the lines are
+    appended to the compressed file as a new gzip member or zstd frame, which readers
+    decompress along with the rest.
 
     Args:
         job_id (str): The UUID (or string) of the job.
+        lines (Iterable[str]): The lines to append, without trailing newlines.
+    """
+    log_dir, log_file_path = get_job_log_path(job_id)
+    data = "".join(f"{line}\n" for line in lines).encode("utf-8")
+    while True:
+        try:
+            fd = os.open(log_file_path, os.O_WRONLY | os.O_APPEND)
+        except FileNotFoundError:
+            compression, compressed_log_file_path = get_compressed_job_log_path(job_id)
+            if compression:
+                fd = os.open(compressed_log_file_path, os.O_WRONLY | os.O_APPEND)
+                try:
+                    _write_all(fd, _compress(data, compression))
+                finally:
+                    os.close(fd)
+                break
+            os.makedirs(log_dir, exist_ok=True)
+            fd = os.open(
+                log_file_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644
+            )
+        try:
+            # Wait while compress_job_log is compressing the file, then start over if it
+            # was compressed in the meantime.
+            fcntl.flock(fd, fcntl.LOCK_SH)
+            if os.fstat(fd).st_nlink == 0:
+                continue
+            _write_all(fd, data)
+            break
+        finally:
+            os.close(fd)
+    notify_job_update(job_id)
 
-    Yields:
-        Iterator[str]: SSE-formatted strings to be sent over a text/event-stream.
+
+def compress_job_log(job_id: str) -> None:
+    """Compress a job's log file with JOB_LOG_COMPRESSION, replacing the plain text file.
+
+    Appends wait until compression is done and then go to the compressed file. Does
+    nothing if compression is disabled, the log isn't stored as plain text or the job
+    isn't finished.
+
+    Args:
+        job_id (str): The UUID (or string) of the job.
     """
+    compression = settings.JOB_LOG_COMPRESSION
+    if not compression:
+        return
+    if compression not in JOB_LOG_COMPRESSION_SUFFIXES:
+        raise ValueError(f"Unsupported job log compression: {compression}")
+
     _, log_file_path = get_job_log_path(job_id)
+    compressed_log_file_path = log_file_path + JOB_LOG_COMPRESSION_SUFFIXES[compression]
     try:
-        with open(log_file_path, "r", encoding="utf-8") as log_file:
-            # Move to the end of the file so we only stream new lines.
-            log_file.seek(0, os.SEEK_END)
-            while True:
-                line = log_file.readline()
-                if line:
-                    # SSE data lines must not contain bare newlines other than
-                    # the delimiter between events.
-                    yield f"data: {line}\n\n"
-                else:
-                    time.sleep(1)
+        log_file = open(log_file_path, "rb")
     except FileNotFoundError:
-        yield (f"event: error\ndata: Log file not found for job ID {job_id}.\n\n")
+        return
+    with log_file:
+        fcntl.flock(log_file.fileno(), fcntl.LOCK_EX)
+        if os.fstat(log_file.fileno()).st_nlink == 0:
+            # Another process already compressed it.
+            return
+        # The job may have been retried since compression was scheduled, in which case
+        # its runner is writing to this log and open streams are following it.
+        if get_job_status_value(job_id) not in Job.TERMINAL_STATUSES:
+            return
+        temp_path = f"{compressed_log_file_path}.tmp"
+        with open(temp_path, "wb") as compressed_file:
+            if compression == "zstd":
+                import zstandard  # pylint: disable=import-outside-toplevel
+
+                zstandard.ZstdCompressor().copy_stream(log_file, compressed_file)
+            else:
+                with gzip.GzipFile(fileobj=compressed_file, mode="wb") as gzip_file:
+                    shutil.copyfileobj(log_file, gzip_file, JOB_LOG_CHUNK_SIZE)
+            compressed_file.flush()
+            os.fsync(compressed_file.fileno())
+        os.replace(temp_path, compressed_log_file_path)
+        os.unlink(log_file_path)
+
+
+def _compress_job_log_in_background(job_id: str) -> None:
+    """Compress a job's log, logging rather than raising any error."""
+    with _scheduled_compressions_lock:
+        _scheduled_compressions.pop(job_id, None)
+    try:
+        compress_job_log(job_id)
+    except Exception:
+        logger.exception("Failed to compress the log of job %s.", job_id)
+    finally:
+        # This thread's database connection isn't used again.
+        connection.close()
+
+
+def schedule_job_log_compression(job_id: str) -> None:
+    """Compress a finished job's log in a background thread.
+
+    Compression starts after JOB_LOG_COMPRESS_DELAY_SECONDS, which leaves time for log lines
+    the runner is still flushing and for open log streams to finish.
+
+    Args:
+        job_id (str): The UUID (or string) of the job.
+    """
+    if not settings.JOB_LOG_COMPRESSION:
+        return
+    job_id = str(job_id)
+    timer = threading.Timer(
+        settings.JOB_LOG_COMPRESS_DELAY_SECONDS,
+        _compress_job_log_in_background,
+        args=(job_id,),
+    )
+    timer.daemon = True
+    with _scheduled_compressions_lock:
+        previous = _scheduled_compressions.pop(job_id, None)
+        if previous:
+            previous.cancel()
+        _scheduled_compressions[job_id] = timer
+    timer.start()
+
+
+def cancel_job_log_compression(job_id: str) -> None:
+    """Cancel a job's scheduled log compression, if this process has one pending.
+
+    Used when a finished job is retried. Compressions scheduled by other processes are
+    skipped by compress_job_log once it sees the job is no longer finished.
+
+    Args:
+        job_id (str): The UUID (or string) of the job.
+    """
+    with _scheduled_compressions_lock:
+        timer = _scheduled_compressions.pop(str(job_id), None)
+    if timer:
+        timer.cancel()
+
+
+def compress_finished_job_logs() -> int:
+    """Compress the logs of finished jobs that are still stored as plain text.
+
+    Compression is normally scheduled in-process when a job finishes, so it's lost if the
+    server restarts before it runs. This catches up on those logs. Jobs that finished less
+    than JOB_LOG_COMPRESS_DELAY_SECONDS ago are left for their scheduled compression.
+
+    Returns:
+        int: The number of logs compressed.
+    """
+    if not settings.JOB_LOG_COMPRESSION:
+        return 0
+    finished_before = timezone.now() - datetime.timedelta(
+        seconds=settings.JOB_LOG_COMPRESS_DELAY_SECONDS
+    )
+    job_ids = (
+        Job.objects.filter(status__in=Job.TERMINAL_STATUSES)
+        .filter(
+            Q(completed_at__lt=finished_before) | Q(stopped_at__lt=finished_before)
+        )
+        .values_list("id", flat=True)
+    )
+    compressed = 0
+    for job_id in job_ids.iterator():
+        _, log_file_path = get_job_log_path(str(job_id))
+        if not os.path.exists(log_file_path):
+            continue
+        try:
+            compress_job_log(str(job_id))
+        except Exception:
+            logger.exception("Failed to compress the log of job %s.", job_id)
+        else:
+            compressed += 1
+    return compressed
+
+
+def decode_request_body(request) -> bytes:
+    """Return the request body, decompressing it if it was sent gzip-encoded.
+
+    Args:
+        request (HttpRequest): The request.
+
+    Returns:
+        bytes: The decoded body.
+
+    Raises:
+        ValueError: If the encoding is unsupported, the body isn't valid gzip, or it
+            decompresses to more than settings.LOG_BATCH_MAX_BYTES.
+    """
+    encoding = request.headers.get("Content-Encoding", "identity").strip().lower()
+    if encoding == "identity":
+        return request.body
+    if encoding != "gzip":
+        raise ValueError(f"Unsupported Content-Encoding: {encoding}")
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    try:
+        body = decompressor.decompress(request.body, settings.LOG_BATCH_MAX_BYTES)
+    except zlib.error as e:
+        raise ValueError("Invalid gzip request body.") from e
+    if decompressor.unconsumed_tail:
+        raise ValueError("Decompressed request body is too large.")
+    if not decompressor.eof:
+        raise ValueError("Invalid gzip request body.")
+    return body
+
+
+def _read_last_lines_backward(
+    log_file: BinaryIO, limit: int, before: Optional[int]
+) -> Tuple[List[bytes], int]:
+    """Read the last lines before an offset of a plain log file, reading backwards."""
+    end = os.fstat(log_file.fileno()).st_size
+    if before is not None:
+        end = min(before, end)
+    chunks = []
+    position = end
+    newlines = 0
+    # Read one line more than needed so we know where the first line starts.
+    while position > 0 and newlines <= limit:
+        chunk_size = min(JOB_LOG_CHUNK_SIZE, position)
+        position -= chunk_size
+        log_file.seek(position)
+        chunk = log_file.read(chunk_size)
+        newlines += chunk.count(b"\n")
+        chunks.append(chunk)
+    data = b"".join(reversed(chunks))
+
+    # Drop any partial line at the end, then any partial line at the start.
+    *lines, partial_line = data.split(b"\n")
+    return lines[-limit:], end - len(partial_line)
+
+
+def _read_last_lines_forward(
+    log_file: BinaryIO, limit: int, before: Optional[int]
+) -> Tuple[List[bytes], int]:
+    """Read the last lines before an offset of a compressed log file, reading forwards."""
+    lines = collections.deque(maxlen=limit)
+    position = 0
+    partial_line = b""
+    while before is None or position < before:
+        chunk_size = JOB_LOG_CHUNK_SIZE
+        if before is not None:
+            chunk_size = min(chunk_size, before - position)
+        chunk = log_file.read(chunk_size)
+        if not chunk:
+            break
+        position += len(chunk)
+        *complete_lines, partial_line = (partial_line + chunk).split(b"\n")
+        lines.extend(complete_lines)
+    return list(lines), position - len(partial_line)
+
+
+def read_job_log_lines(
+    job_id: str, limit: int, before: Optional[int] = None
+) -> Tuple[List[str], int, int]:
+    """Read up to limit whole lines of a job log, ending at a byte offset.
+
+    Plain text logs are read backwards from the end offset in chunks, so only the requested
+    lines are read no matter how big the log is. Compressed logs have to be decompressed
+    from the start. Any partial line at the end offset is left out.
+
+    Args:
+        job_id (str): The UUID (or string) of the job.
+        limit (int): The maximum number of lines to return.
+        before (int, optional): The byte offset to end at. Defaults to the end of the log.
+
+    Returns:
+        tuple: (lines, start, end) where start and end are the byte offsets the lines span.
+            If the log file does not exist, ([], 0, 0).
+    """
+    try:
+        log_file = open_job_log(job_id)
+    except FileNotFoundError:
+        return [], 0, 0
+
+    with log_file:
+        if isinstance(log_file, io.BufferedReader):
+            lines, end = _read_last_lines_backward(log_file, limit, before)
+        else:
+            lines, end = _read_last_lines_forward(log_file, limit, before)
+    start = end - sum(len(line) + 1 for line in lines)
+    return [line.decode("utf-8", errors="replace") for line in lines], start, end
+
+
+def parse_byte_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse an HTTP Range header asking for a single byte range.
+
+    Args:
+        range_header (str): The value of the Range header.
+        size (int): The size of the file in bytes.
+
+    Returns:
+        tuple or None: (start, end) with end exclusive, or None if the header isn't a single
+            byte range, in which case the whole file should be served.
+
+    Raises:
+        ValueError: If the range can't be satisfied.
+    """
+    units, _, byte_range = range_header.partition("=")
+    if units.strip().lower() != "bytes" or "," in byte_range:
+        return None
+    first, separator, last = byte_range.strip().partition("-")
+    if not separator:
+        return None
+    try:
+        if first:
+            start = int(first)
+            end = int(last) + 1 if last else size
+        else:
+            # A suffix range, e.g. "bytes=-500" for the last 500 bytes.
+            start = size - int(last)
+            end = size
+    except ValueError:
+        return None
+    start = max(start, 0)
+    end = min(end, size)
+    if start >= end:
+        raise ValueError("Range not satisfiable.")
+    return start, end
+
+
+async def iter_file_bytes(
+    file: BinaryIO, start: int = 0, end: Optional[int] = None
+) -> AsyncIterator[bytes]:
+    """Async generator that yields a byte range of a file in chunks, then closes it.
+
+    Reads run in a thread, so serving a large log doesn't block the event loop or load the
+    whole file into memory.
+
+    Args:
+        file (BinaryIO): The file, opened for reading in binary mode.
+        start (int): The byte offset to start at.
+        end (int, optional): The byte offset to stop at, exclusive. Defaults to the end of
+            the file.
+
+    Yields:
+        AsyncIterator[bytes]: Chunks of the file.
+    """
+    with file:
+        if start:
+            file.seek(start)
+        remaining = None if end is None else end - start
+        while remaining is None or remaining > 0:
+            chunk_size = JOB_LOG_CHUNK_SIZE
+            if remaining is not None:
+                chunk_size = min(chunk_size, remaining)
+            chunk = await asyncio.to_thread(file.read, chunk_size)
+            if not chunk:
+                return
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+
+
+def notify_job_update(job_id: str) -> None:
+    """Wake any open streams in this process for a job whose log or status changed.
+
+    Args:
+        job_id (str): The UUID (or string) of the job.
+    """
+    with _job_update_subscribers_lock:
+        subscribers = list(_job_update_subscribers.get(str(job_id), ()))
+    for loop, event in subscribers:
+        try:
+            loop.call_soon_threadsafe(event.set)
+        except RuntimeError:
+            # The stream's event loop has already closed.
+            pass
+
+
+@contextlib.contextmanager
+def subscribe_job_updates(job_id: str) -> Iterator[asyncio.Event]:
+    """Subscribe the running event loop to updates for a job.
+
+    Args:
+        job_id (str): The UUID (or string) of the job.
+
+    Yields:
+        asyncio.Event: An event that is set whenever notify_job_update is called for the job.
+    """
+    job_id = str(job_id)
+    subscriber = (asyncio.get_running_loop(), asyncio.Event())
+    with _job_update_subscribers_lock:
+        _job_update_subscribers.setdefault(job_id, set()).add(subscriber)
+    try:
+        yield subscriber[1]
+    finally:
+        with _job_update_subscribers_lock:
+            subscribers = _job_update_subscribers[job_id]
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del _job_update_subscribers[job_id]
+
+
+async def _get_job_status(job_id: str) -> Optional[str]:
+    """Return the status of a job, or None if it doesn't exist.
+
+    The database connection is released afterwards, since streams spend most of their
+    time waiting.
+    """
+    status = (
+        await Job.objects.filter(pk=job_id).values_list("status", flat=True).afirst()
+    )
+    await sync_to_async(release_db_connection)()
+    return status
+
+
+async def stream_job_log_events(job_id: str, offset: int = 0) -> AsyncIterator[str]:
+    """Async generator that yields Server-Sent Events for job log lines.
+
+    The generator replays the log from the given byte offset, then yields each line appended
+    to it as soon as append_job_log writes it in this process. The file is also re-checked
+    every JOB_LOG_STREAM_POLL_INTERVAL_SECONDS for lines written by other processes. Each
+    line's event ID is the byte offset just past it, so a client can resume from the last
+    event it received without gaps or duplicates. The job's status is re-read when this
+    process updates the job, and otherwise every JOB_LOG_STREAM_STATUS_INTERVAL_SECONDS;
+    the database connection isn't held in between. While idle, a heartbeat comment is sent
+    every JOB_LOG_STREAM_HEARTBEAT_SECONDS. Once the job has reached a terminal status and
+    the stream has caught up, an "end" event with the final status is sent and the stream
+    closes. If the job was still running when the stream opened, the stream waits until no
+    lines have arrived for JOB_LOG_STREAM_CLOSE_GRACE_SECONDS before closing, for lines the
+    runner is still flushing. Compressed logs are decompressed on the fly. A job's log file
+    is only created when the job first logs something, so until then the stream waits for
+    it. If the job has finished or doesn't exist and has no log, it yields a single error
+    event.
+
+    Args:
+        job_id (str): The UUID (or string) of the job.
+        offset (int): The byte offset to start from. Offsets past the end of the file
+            start from the end.
+
+    Yields:
+        AsyncIterator[str]: SSE-formatted strings to be sent over a text/event-stream.
+    """
+    loop = asyncio.get_running_loop()
+    last_sent_at = status_checked_at = loop.time()
+    with subscribe_job_updates(job_id) as job_updated:
+        status = await _get_job_status(job_id)
+        # A job's log file is created when it first logs something, so wait for it.
+        while True:
+            now = loop.time()
+            if (
+                job_updated.is_set()
+                or now - status_checked_at
+                >= settings.JOB_LOG_STREAM_STATUS_INTERVAL_SECONDS
+            ):
+                status = await _get_job_status(job_id)
+                status_checked_at = now
+            job_updated.clear()
+            try:
+                log_file = await asyncio.to_thread(open_job_log, job_id)
+                break
+            except FileNotFoundError:
+                if status is None or status in Job.TERMINAL_STATUSES:
+                    yield (
+                        f"event: error\ndata: Log file not found for job ID {job_id}.\n\n"
+                    )
+                    return
+            if now - last_sent_at >= settings.JOB_LOG_STREAM_HEARTBEAT_SECONDS:
+                last_sent_at = now
+                yield ": heartbeat\n\n"
+            try:
+                await asyncio.wait_for(
+                    job_updated.wait(), settings.JOB_LOG_STREAM_POLL_INTERVAL_SECONDS
+                )
+            except asyncio.TimeoutError:
+                pass
+
+        with log_file:
+            async for event in _stream_open_job_log(
+                job_id, log_file, offset, status, job_updated
+            ):
+                yield event
+
+
+async def _stream_open_job_log(
+    job_id: str,
+    log_file: BinaryIO,
+    offset: int,
+    status: Optional[str],
+    job_updated: asyncio.Event,
+) -> AsyncIterator[str]:
+    """Yield Server-Sent Events for an open job log; see stream_job_log_events.
+
+    Args:
+        job_id (str): The UUID (or string) of the job.
+        log_file (BinaryIO): The job's open log.
+        offset (int): The byte offset to start from.
+        status (str): The job's status when the stream was opened.
+        job_updated (asyncio.Event): Set whenever the job's log or status changes.
+
+    Yields:
+        AsyncIterator[str]: SSE-formatted strings.
+    """
+    offset = await asyncio.to_thread(seek_job_log, log_file, offset)
+    close_grace = (
+        0
+        if status in Job.TERMINAL_STATUSES
+        else settings.JOB_LOG_STREAM_CLOSE_GRACE_SECONDS
+    )
+
+    loop = asyncio.get_running_loop()
+    last_line_at = last_sent_at = status_checked_at = loop.time()
+    partial_line = b""
+    while True:
+        # Status changes made in this process set job_updated; others are picked up
+        # every JOB_LOG_STREAM_STATUS_INTERVAL_SECONDS.
+        status_may_have_changed = job_updated.is_set()
+        job_updated.clear()
+        chunk = await asyncio.to_thread(log_file.read, JOB_LOG_CHUNK_SIZE)
+        if chunk:
+            # Only send complete lines; keep any partially written line for next time.
+            *lines, partial_line = (partial_line + chunk).split(b"\n")
+            if lines:
+                last_line_at = last_sent_at = loop.time()
+            for line in lines:
+                offset += len(line) + 1
+                yield (
+                    f"id: {offset}\n"
+                    f"data: {line.decode('utf-8', errors='replace')}\n\n"
+                )
+            continue
+        now = loop.time()
+        if (
+            status_may_have_changed
+            or now - status_checked_at >= settings.JOB_LOG_STREAM_STATUS_INTERVAL_SECONDS
+        ):
+            status = await _get_job_status(job_id)
+            status_checked_at = now
+        if status is None or (
+            status in Job.TERMINAL_STATUSES and now - last_line_at >= close_grace
+        ):
+            yield f"event: end\ndata: {status}\n\n"
+            return
+        if now - last_sent_at >= settings.JOB_LOG_STREAM_HEARTBEAT_SECONDS:
+            last_sent_at = now
+            yield ": heartbeat\n\n"
+        try:
+            await asyncio.wait_for(
+                job_updated.wait(), settings.JOB_LOG_STREAM_POLL_INTERVAL_SECONDS
+            )
+        except asyncio.TimeoutError:
+            pass
@@ -5,7 +5,6 @@
 import json
 import os
 import time
-import datetime
 
 from django.conf import settings
 from django.contrib.auth import (
@@ -15,6 +14,8 @@ from django.contrib.auth import (
     logout,
 )
 from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Q
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib.auth import authenticate
@@ -38,13 +39,36 @@ from .forms import (
     LlmApiForm,
     TargetHostForm,
 )
-from .models import BastionHost, Credential, Job, LlmApi, TargetHost
+from .models import (
+    BastionHost,
+    Credential,
+    Job,
+    JobTargetHostStatus,
+    LlmApi,
+    TargetHost,
+)
 from .utils import (
+    append_job_log,
+    cancel_job_log_compression,
     check_private_key,
+    check_runner_claim,
+    decode_request_body,
+    format_log_entry,
     get_object_pretty_name,
+    get_compressed_job_log_path,
     get_job_log_path,
-    read_full_job_log,
-    stream_job_log_generator,
+    get_job_log_relative_path,
+    get_job_status_value,
+    iter_file_bytes,
+    notify_job_update,
+    notify_pending_job,
+    open_job_log,
+    parse_byte_range,
+    read_job_log_lines,
+    schedule_job_log_compression,
+    stream_job_log_events,
+    transition_job_status,
+    wait_for_pending_job,
 )
 
 
@@ -116,6 +140,9 @@ def retry_job(request, job_id):
     if job.status in ["Failed", "Canceled"]:
         job.status = "Pending"
         job.save()
+        job.target_host_statuses.all().delete()
+        cancel_job_log_compression(job.id)
+        notify_pending_job()
     # Reload the page that this function was called from to reflect the change.
     referer_url = request.META.get("HTTP_REFERER")
     if referer_url:
@@ -128,9 +155,9 @@ def retry_job(request, job_id):
 def cancel_job(request, job_id):
     """Cancel a given job by changing its status to Canceled."""
     job = get_object_or_404(Job, pk=job_id)
-    if job.status not in ["Completed", "Canceled"]:
-        job.status = "Canceled"
-        job.save()
+    if transition_job_status(job.id, "Canceled"):
+        notify_job_update(job.id)
+        schedule_job_log_compression(job.id)
     # Reload the page that this function was called from to reflect the change.
     referer_url = request.META.get("HTTP_REFERER")
     if referer_url:
@@ -141,32 +168,27 @@ def cancel_job(request, job_id):
 
 @login_required
 def create_job(request):
-    """Handle creating jobs. When the create job form is submitted, a new job is created for every target host."""
+    """Handle creating jobs. A single job is created that runs against every selected target host."""
     form = JobForm(request.POST)
     if request.method == "POST" and form.is_valid():
         cleaned_data = form.cleaned_data
         target_hosts = cleaned_data.pop("target_hosts", [])
 
-        for host in target_hosts:
+        # Save the job and its hosts together so runners never claim a job without hosts.
+        # The host rows are inserted with one query however many hosts are selected. The
+        # job's log file is created by the first line the runner logs.
+        with transaction.atomic():
             # Use the currently-logged-in user in the user field of the object.
-            job = Job(user=request.user, **cleaned_data)
-            job.save()
-            job.target_hosts.add(host.id)
-            job.save()
+            job = Job.objects.create(user=request.user, **cleaned_data)
+            Job.target_hosts.through.objects.bulk_create(
+                Job.target_hosts.through(job=job, targethost=target_host)
+                for target_host in target_hosts
+            )
 
-            # Create an empty log file for this job so SSE consumers won't immediately
-            # encounter "file not found" when the stream is opened right after creation.
-            try:
-                log_dir, log_file_path = get_job_log_path(job.id)
-                os.makedirs(log_dir, exist_ok=True)
-                open(log_file_path, "a", encoding="utf-8").close()
-            except Exception:
-                pass
+        notify_pending_job()
 
-        # Start a SSHerlock runner Docker container in GCP for every target host
-        # in the job.
-        # for host in target_hosts:
-        #     gcp.run()
+        # Start a SSHerlock runner Docker container in GCP for the job.
+        # gcp.run()
 
         return redirect("/job_list")
 
@@ -184,6 +206,7 @@ def view_job(request, job_id):
     job = get_object_or_404(Job, pk=job_id)
     context = {
         "job": job,
+        "target_host_statuses": job.target_host_statuses.select_related("target_host"),
     }
     return render(request, "objects/view_job.html", context)
 
@@ -191,17 +214,127 @@ def view_job(request, job_id):
 @require_http_methods(["GET"])
 @login_required
 def get_full_job_log(request, job_id):
-    """Return the full job log as plain text."""
-    content = read_full_job_log(job_id)
-    return HttpResponse(content, content_type="text/plain")
+    """Return the job log.
+
+    With a "tail" or "before" query parameter, return a page of whole lines as JSON.
+    "tail=N" returns the last N lines and "before=OFFSET&limit=N" returns the N lines ending
+    at byte offset OFFSET. The page's "start" and "end" byte offsets can be used to fetch
+    the page before it or to stream the lines after it.
+
+    Otherwise stream the log file as plain text. A request for a single byte range gets
+    only that range. Compressed logs are decompressed on the fly, or sent as they are to
+    clients that accept gzip. If JOB_LOG_X_ACCEL_REDIRECT_LOCATION is set, nginx serves the
+    file instead.
+    """
+    get_object_or_404(Job, pk=job_id, user=request.user)
+
+    if "tail" in request.GET or "before" in request.GET:
+        try:
+            before = request.GET.get("before")
+            before = int(before) if before is not None else None
+            limit = int(
+                request.GET.get("tail")
+                or request.GET.get("limit")
+                or settings.JOB_LOG_PAGE_MAX_LINES
+            )
+            if limit < 1 or (before is not None and before < 0):
+                raise ValueError
+        except ValueError:
+            return JsonResponse({"message": "Invalid page parameters."}, status=400)
+        lines, start, end = read_job_log_lines(
+            job_id, min(limit, settings.JOB_LOG_PAGE_MAX_LINES), before
+        )
+        return JsonResponse({"lines": lines, "start": start, "end": end})
+
+    _, log_file_path = get_job_log_path(job_id)
+    compression = compressed_log_file_path = None
+    try:
+        size = os.path.getsize(log_file_path)
+    except FileNotFoundError:
+        compression, compressed_log_file_path = get_compressed_job_log_path(job_id)
+        if not compression:
+            return HttpResponse("", content_type="text/plain")
+
+    # nginx can't decompress zstd, so those logs are always served from here.
+    if settings.JOB_LOG_X_ACCEL_REDIRECT_LOCATION and compression != "zstd":
+        # nginx serves the file itself, with sendfile, Range support and compression.
+        # It serves gzipped logs as they are or decompressed, as the client supports.
+        response = HttpResponse(content_type="text/plain")
+        response["X-Accel-Redirect"] = (
+            f"{settings.JOB_LOG_X_ACCEL_REDIRECT_LOCATION.rstrip('/')}/"
+            f"{get_job_log_relative_path(job_id)}"
+        )
+        return response
+
+    if compression == "gzip" and "gzip" in request.headers.get("Accept-Encoding", ""):
+        # Send the compressed file as it is and let the client decompress it.
+        response = StreamingHttpResponse(
+            iter_file_bytes(open(compressed_log_file_path, "rb")),
+            content_type="text/plain",
+        )
+        response["Content-Encoding"] = "gzip"
+        response["Content-Length"] = str(os.path.getsize(compressed_log_file_path))
+        response["Vary"] = "Accept-Encoding"
+        return response
+
+    if compression:
+        # The uncompressed size isn't known, so byte ranges aren't supported.
+        return StreamingHttpResponse(
+            iter_file_bytes(open_job_log(job_id)), content_type="text/plain"
+        )
+
+    start, end = 0, size
+    byte_range = None
+    if request.headers.get("Range"):
+        try:
+            byte_range = parse_byte_range(request.headers["Range"], size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+        if byte_range:
+            start, end = byte_range
+
+    response = StreamingHttpResponse(
+        iter_file_bytes(open(log_file_path, "rb"), start, end),
+        status=206 if byte_range else 200,
+        content_type="text/plain",
+    )
+    response["Accept-Ranges"] = "bytes"
+    response["Content-Length"] = str(end - start)
+    if byte_range:
+        response["Content-Range"] = f"bytes {start}-{end - 1}/{size}"
+    return response
 
 
 @login_required
-def stream_job_log(request, job_id):
-    """Stream job log data to the client using utils.stream_job_log_generator."""
-    return StreamingHttpResponse(
-        stream_job_log_generator(job_id), content_type="text/event-stream"
+async def stream_job_log(request, job_id):
+    """Stream job log data to the client using utils.stream_job_log_events.
+
+    The stream starts from the byte offset in the Last-Event-ID header, which browsers send
+    when reconnecting, or else the "offset" query parameter, which defaults to 0.
+
+    This is an async view, so an open stream doesn't hold a server worker or thread.
+    """
+    user = await request.auser()
+    if not await Job.objects.filter(pk=job_id, user=user).aexists():
+        raise Http404("No Job matches the given query.")
+
+    offset = request.headers.get("Last-Event-ID") or request.GET.get("offset", "0")
+    try:
+        offset = int(offset)
+        if offset < 0:
+            raise ValueError
+    except ValueError:
+        return JsonResponse({"message": "Invalid offset."}, status=400)
+
+    response = StreamingHttpResponse(
+        stream_job_log_events(job_id, offset), content_type="text/event-stream"
     )
+    response["Cache-Control"] = "no-cache"
+    # Stop nginx from buffering the stream.
+    response["X-Accel-Buffering"] = "no"
+    return response
 
 
 def custom_login(request):
@@ -289,9 +422,20 @@ def llm_api_list(request):
     )
 
 
+# Fields the job list's columns are sorted by, in column order. None marks columns that
+# can't be sorted.
+JOB_LIST_ORDER_FIELDS = [
+    "created_at",
+    "status",
+    "llm_api__base_url",
+    None,
+    "credentials_for_target_hosts__credential_name",
+]
+
+
 @login_required
 def job_list(request):
-    """List the jobs."""
+    """List the jobs. The rows are loaded a page at a time from job_list_data."""
     output = Job.objects.filter(user=request.user)
     context = {
         "output": output,
@@ -303,17 +447,93 @@ def job_list(request):
             "Target Host Credentials",
         ],
         "object_name": "Job",
-        "object_fields": [
-            "created_at",
-            "status",
-            "llm_api",
-            "target_hosts_str",
-            "credentials_for_target_hosts",
-        ],
     }
     return render(request, "objects/job_list.html", context)
 
 
+@require_http_methods(["GET"])
+@login_required
+def job_list_data(request):
+    """Return a page of the user's jobs for the job list's DataTables server-side mode.
+
+    Takes DataTables' draw, start, length, search[value], order[0][column] and
+    order[0][dir] query parameters. The page is fetched with a fixed number of queries no
+    matter how many jobs the user has.
+    """
+    try:
+        draw = int(request.GET.get("draw", 0))
+        start = max(int(request.GET.get("start", 0)), 0)
+        length = int(request.GET.get("length", 10))
+        order_column = int(request.GET.get("order[0][column]", 0))
+    except ValueError:
+        return JsonResponse({"message": "Invalid page parameters."}, status=400)
+    # DataTables asks for a length of -1 to show every row.
+    if length < 0 or length > settings.JOB_LIST_MAX_PAGE_SIZE:
+        length = settings.JOB_LIST_MAX_PAGE_SIZE
+
+    jobs = Job.objects.filter(user=request.user)
+    records_total = jobs.count()
+    records_filtered = records_total
+    search = request.GET.get("search[value]", "").strip()
+    if search:
+        jobs = jobs.filter(
+            Q(status__icontains=search)
+            | Q(llm_api__base_url__icontains=search)
+            | Q(credentials_for_target_hosts__credential_name__icontains=search)
+            | Q(
+                pk__in=Job.objects.filter(
+                    target_hosts__hostname__icontains=search
+                ).values("pk")
+            )
+        )
+        records_filtered = jobs.count()
+
+    order_field = "created_at"
+    if 0 <= order_column < len(JOB_LIST_ORDER_FIELDS):
+        order_field = JOB_LIST_ORDER_FIELDS[order_column] or order_field
+    if request.GET.get("order[0][dir]", "desc") == "desc":
+        order_field = f"-{order_field}"
+    end = start + length
+    jobs = (
+        jobs.select_related("llm_api", "credentials_for_target_hosts")
+        .prefetch_related("target_hosts")
+        .order_by(order_field, "-created_at")[start:end]
+    )
+
+    data = [
+        {
+            "id": str(job.id),
+            "created_at": timezone.localtime(job.created_at).strftime(
+                "%Y-%m-%d %H:%M:%S"
+            ),
+            "status": job.status,
+            "llm_api": str(job.llm_api or ""),
+            "target_hosts": job.target_hosts_str,
+            "credentials_for_target_hosts": str(job.credentials_for_target_hosts or ""),
+            "view_url": reverse("view_job", args=[job.id]),
+            "cancel_url": (
+                reverse("cancel_job", args=[job.id])
+                if job.status in ["Running", "Pending", "Claimed"]
+                else None
+            ),
+            "retry_url": (
+                reverse("retry_job", args=[job.id])
+                if job.status in ["Failed", "Canceled"]
+                else None
+            ),
+        }
+        for job in jobs
+    ]
+    return JsonResponse(
+        {
+            "draw": draw,
+            "recordsTotal": records_total,
+            "recordsFiltered": records_filtered,
+            "data": data,
+        }
+    )
+
+
 @login_required
 def target_host_list(request):
     """List the target hosts."""
@@ -344,14 +564,25 @@ def render_object_list(request, model, column_headers, object_fields, object_nam
 def request_job(request):
     """Provide a job for runners to process.
 
-    This is the API endpoint used by runners to retrieve a job.
+    This is the API endpoint used by runners to retrieve a job. The job is atomically
+    moved to the Claimed status so no other runner can receive it.
+
+    Runners may pass a "wait" query parameter to long-poll: the request is held open for up
+    to that many seconds (capped at REQUEST_JOB_MAX_WAIT_SECONDS) until a job is available.
     """
     try:
         key_check_response = check_private_key(request)
         if key_check_response:
             return key_check_response
 
-        job = Job.objects.filter(status="Pending").order_by("created_at").first()
+        try:
+            wait_seconds = float(request.GET.get("wait", 0))
+        except ValueError:
+            return JsonResponse({"message": "Invalid wait parameter."}, status=400)
+        wait_seconds = max(0.0, min(wait_seconds, settings.REQUEST_JOB_MAX_WAIT_SECONDS))
+
+        runner_id = request.headers.get("X-Runner-Id", "")
+        job = wait_for_pending_job(runner_id, wait_seconds)
         if not job:
             return JsonResponse({"message": "No pending jobs found."}, status=404)
         return JsonResponse(job.dict(), status=200)
@@ -363,7 +594,15 @@ def request_job(request):
 @require_http_methods(["POST"])
 @csrf_exempt
 def update_job_status(request, job_id):
-    """Update the status of a job. This is the API endpoint used by runners to update the status of a job."""
+    """Update the status of a job. This is the API endpoint used by runners to update the status of a job.
+
+    When the request includes a "target_host" ID, only the status of the job on that target
+    host is updated. Runners use this to report progress on jobs spanning several hosts.
+
+    Only the runner that claimed the job may update it; other runners get a 403.
+
+    The response carries the job's status, so runners learn when a job has been canceled.
+    """
     try:
         key_check_response = check_private_key(request)
         if key_check_response:
@@ -387,20 +626,38 @@ def update_job_status(request, job_id):
                 {"message": f"Invalid status: {new_status}"}, status=400
             )
 
-        job = get_object_or_404(Job, pk=job_id)
-        job.status = new_status
-
-        # Also update timestamps accordingly.
-        if new_status == "Running":
-            job.started_at = timezone.now()
-        elif new_status == "Completed":
-            job.completed_at = timezone.now()
-        elif new_status == "Failed":
-            job.stopped_at = timezone.now()
+        target_host_id = data.get("target_host")
+        if target_host_id:
+            job = get_object_or_404(Job, pk=job_id)
+            claim_check_response = check_runner_claim(request, job.id, job.claimed_by or "")
+            if claim_check_response:
+                return claim_check_response
+            if not job.target_hosts.filter(pk=target_host_id).exists():
+                return JsonResponse(
+                    {"message": f"Target host not part of job: {target_host_id}"},
+                    status=400,
+                )
+            JobTargetHostStatus.objects.update_or_create(
+                job=job, target_host_id=target_host_id, defaults={"status": new_status}
+            )
+            return JsonResponse({"status": job.status})
+
+        runner_id = request.headers.get("X-Runner-Id", "")
+        if not transition_job_status(job_id, new_status, runner_id=runner_id):
+            job = get_object_or_404(Job, pk=job_id)
+            claim_check_response = check_runner_claim(request, job.id, job.claimed_by or "")
+            if claim_check_response:
+                return claim_check_response
+            return JsonResponse(
+                {"message": f"Job is already {job.status}.", "status": job.status},
+                status=409,
+            )
 
-        job.save()
+        notify_job_update(job_id)
+        if new_status in Job.TERMINAL_STATUSES:
+            schedule_job_log_compression(job_id)
 
-        return HttpResponse(status=200)
+        return JsonResponse({"status": new_status})
 
     except Exception as e:
         return JsonResponse({"message": str(e)}, status=500)
@@ -432,6 +689,11 @@ def log_job_data(request, job_id):
         if key_check_response:
             return key_check_response
 
+        # Only the runner that claimed the job may write to its log.
+        claim_check_response = check_runner_claim(request, job_id)
+        if claim_check_response:
+            return claim_check_response
+
         # Parse the incoming JSON data
         data = json.loads(request.body)
         log_content = data.get("log")
@@ -439,20 +701,52 @@ def log_job_data(request, job_id):
         if not log_content:
             return JsonResponse({"message": "Log content not provided."}, status=400)
 
-        job_id = str(job_id)
-        log_dir, log_file_path = get_job_log_path(job_id)
-        os.makedirs(log_dir, exist_ok=True)
-
         # Write the log data to the file with a UTC timestamp prefix.
-        timestamp = (
-            timezone.now()
-            .astimezone(datetime.timezone.utc)
-            .strftime("%Y-%m-%d %H:%M:%S")
-        )
-        with open(log_file_path, "a", encoding="utf-8", buffering=1) as log_file:
-            log_file.write(f"{timestamp} {log_content}\n")
+        append_job_log(job_id, [format_log_entry(log_content)])
+
+        # Tell the runner the job's status so it learns of cancellation without polling.
+        return JsonResponse({"status": get_job_status_value(job_id)})
+
+    except Exception as e:
+        return JsonResponse({"message": str(e)}, status=500)
+
+
+@require_http_methods(["POST"])
+@csrf_exempt
+def log_job_data_batch(request, job_id):
+    """Receive a batch of log entries from a runner and append them to the job's log file.
+
+    The body is {"logs": [...]}, optionally gzip-compressed with Content-Encoding: gzip.
+    Each entry is either a string, stamped with the server's time, or an object with a
+    "message" and the runner-side "timestamp" (seconds since the epoch) and "level".
+    """
+    try:
+        key_check_response = check_private_key(request)
+        if key_check_response:
+            return key_check_response
+
+        claim_check_response = check_runner_claim(request, job_id)
+        if claim_check_response:
+            return claim_check_response
+
+        try:
+            data = json.loads(decode_request_body(request))
+        except ValueError as e:
+            return JsonResponse({"message": str(e)}, status=400)
+        log_entries = data.get("logs") if isinstance(data, dict) else None
+        if not log_entries or not isinstance(log_entries, list):
+            return JsonResponse({"message": "Log content not provided."}, status=400)
+
+        try:
+            lines = [format_log_entry(entry) for entry in log_entries]
+        except ValueError as e:
+            return JsonResponse({"message": str(e)}, status=400)
+
+        # Write the whole batch with one append.
+        append_job_log(job_id, lines)
 
-        return HttpResponse(status=200)
+        # Tell the runner the job's status so it learns of cancellation without polling.
+        return JsonResponse({"status": get_job_status_value(job_id)})
 
     except Exception as e:
         return JsonResponse({"message": str(e)}, status=500)
@@ -0,0 +1,161 @@
+"""Tests for the job list data view in views.py"""
+
+# pylint: disable=import-error, missing-class-docstring, missing-function-docstring, invalid-str-returned, no-member, invalid-name
+
+from django.utils import timezone
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth.models import User
+from ssherlock_server.models import (
+    Credential,
+    Job,
+    LlmApi,
+    TargetHost,
+)
+
+
+class TestJobListData(TestCase):
+    """Tests for the job list's server-side paging API."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            "testuser", "testuser@example.com", "password"
+        )
+        cls.other_user = User.objects.create_user(
+            "otheruser", "otheruser@example.com", "password"
+        )
+        cls.llm_api = LlmApi.objects.create(
+            base_url="https://llm.example.com", api_key="llm_key", user=cls.user
+        )
+        cls.credential = Credential.objects.create(
+            credential_name="deploy", username="deploy", user=cls.user
+        )
+        cls.target_host = TargetHost.objects.create(
+            hostname="web1.example.com", port=22, user=cls.user
+        )
+        cls.other_target_host = TargetHost.objects.create(
+            hostname="db1.example.com", port=2222, user=cls.user
+        )
+        cls.jobs = []
+        for i in range(5):
+            job = Job.objects.create(
+                llm_api=cls.llm_api,
+                user=cls.user,
+                credentials_for_target_hosts=cls.credential,
+                status="Failed" if i == 0 else "Pending",
+            )
+            job.created_at = timezone.now() - timezone.timedelta(minutes=i)
+            job.save()
+            job.target_hosts.add(cls.target_host)
+            cls.jobs.append(job)
+        cls.jobs[0].target_hosts.add(cls.other_target_host)
+        Job.objects.create(
+            llm_api=cls.llm_api,
+            user=cls.other_user,
+            credentials_for_target_hosts=cls.credential,
+        )
+
+    def setUp(self):
+        self.client.login(username="testuser", password="password")
+
+    def get_page(self, **params):
+        """Request a page of the job list and return its JSON."""
+        response = self.client.get(reverse("job_list_data"), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_returns_only_the_users_jobs(self):
+        """Test that only the user's own jobs are listed."""
+        page = self.get_page(draw=3)
+        self.assertEqual(page["draw"], 3)
+        self.assertEqual(page["recordsTotal"], 5)
+        self.assertEqual(page["recordsFiltered"], 5)
+        self.assertCountEqual(
+            [row["id"] for row in page["data"]], [str(job.id) for job in self.jobs]
+        )
+
+    def test_row_fields(self):
+        """Test that each row carries the columns and action URLs."""
+        page = self.get_page(**{"order[0][column]": 0, "order[0][dir]": "desc"})
+        row = page["data"][0]
+        self.assertEqual(row["id"], str(self.jobs[0].id))
+        self.assertEqual(row["status"], "Failed")
+        self.assertEqual(row["llm_api"], "https://llm.example.com")
+        self.assertCountEqual(
+            row["target_hosts"].split(", "), ["web1.example.com", "db1.example.com"]
+        )
+        self.assertEqual(row["credentials_for_target_hosts"], "deploy")
+        self.assertEqual(row["view_url"], reverse("view_job", args=[self.jobs[0].id]))
+        self.assertIsNone(row["cancel_url"])
+        self.assertEqual(
+            row["retry_url"], reverse("retry_job", args=[self.jobs[0].id])
+        )
+        self.assertEqual(
+            page["data"][1]["cancel_url"],
+            reverse("cancel_job", args=[self.jobs[1].id]),
+        )
+
+    def test_paginates(self):
+        """Test that start and length select a page of jobs."""
+        page = self.get_page(start=2, length=2)
+        self.assertEqual(page["recordsFiltered"], 5)
+        self.assertEqual(
+            [row["id"] for row in page["data"]],
+            [str(self.jobs[2].id), str(self.jobs[3].id)],
+        )
+
+    @override_settings(JOB_LIST_MAX_PAGE_SIZE=3)
+    def test_page_size_is_capped(self):
+        """Test that pages are never longer than the configured maximum."""
+        self.assertEqual(len(self.get_page(length=-1)["data"]), 3)
+        self.assertEqual(len(self.get_page(length=1000)["data"]), 3)
+
+    def test_sorts(self):
+        """Test that jobs are sorted by the requested column and direction."""
+        page = self.get_page(**{"order[0][column]": 0, "order[0][dir]": "asc"})
+        self.assertEqual(
+            [row["id"] for row in page["data"]],
+            [str(job.id) for job in reversed(self.jobs)],
+        )
+        page = self.get_page(**{"order[0][column]": 1, "order[0][dir]": "asc"})
+        self.assertEqual(page["data"][0]["status"], "Failed")
+
+    def test_searches(self):
+        """Test that the search filters jobs by status."""
+        page = self.get_page(**{"search[value]": "fail"})
+        self.assertEqual(page["recordsTotal"], 5)
+        self.assertEqual(page["recordsFiltered"], 1)
+        self.assertEqual(page["data"][0]["id"], str(self.jobs[0].id))
+
+    def test_searches_target_hosts(self):
+        """Test that the search matches any of a job's target hosts."""
+        page = self.get_page(**{"search[value]": "db1"})
+        self.assertEqual(page["recordsFiltered"], 1)
+        self.assertEqual(page["data"][0]["id"], str(self.jobs[0].id))
+
+    def test_invalid_parameters(self):
+        """Test that non-numeric paging parameters are rejected."""
+        response = self.client.get(reverse("job_list_data"), {"start": "x"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"message": "Invalid page parameters."})
+
+    def test_query_count_does_not_grow_with_jobs(self):
+        """Test that a page costs the same number of queries however many jobs exist."""
+        with self.assertNumQueries(5):
+            self.get_page()
+        for _ in range(20):
+            job = Job.objects.create(
+                llm_api=self.llm_api,
+                user=self.user,
+                credentials_for_target_hosts=self.credential,
+            )
+            job.target_hosts.add(self.target_host)
+        with self.assertNumQueries(5):
+            self.get_page(length=25)
+
+    def test_not_authenticated(self):
+        """Test that the API redirects to the login page when not authenticated."""
+        self.client.logout()
+        response = self.client.get(reverse("job_list_data"))
+        self.assertEqual(response.status_code, 302)
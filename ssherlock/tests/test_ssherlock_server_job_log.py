@@ -0,0 +1,589 @@
+"""Tests for the job log views in views.py"""
+
+# pylint: disable=import-error, missing-class-docstring, missing-function-docstring, invalid-str-returned, no-member, invalid-name
+
+import asyncio
+import gzip
+import json
+import os
+from unittest.mock import patch
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from django.http import JsonResponse
+from django.contrib.auth.models import User
+from ssherlock_server.models import Job
+from ssherlock_server.utils import (
+    append_job_log,
+    compress_job_log,
+    get_job_log_path,
+    notify_job_update,
+)
+
+SSHERLOCK_SERVER_RUNNER_TOKEN = "myprivatekey"
+
+
+class TestLogJobData(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.job_id = "f6e752d6-b065-4c49-9241-e4eefbc274e3"
+        self.valid_log_content = {"log": "This is a log entry."}
+        self.invalid_log_content = {"invalid_key": "No log here."}
+        self.url = reverse("log_job_data", args=[self.job_id])
+        self.valid_token = "Bearer myprivatekey"
+        self.invalid_token = "Bearer wrongprivatekey"
+
+        # Define expected log directory and file path
+        self.log_dir = os.path.join(
+            settings.BASE_DIR.parent,
+            "ssherlock_runner_job_logs",
+            self.job_id[0:2],
+            self.job_id[2:4],
+            self.job_id[4:6],
+        )
+        self.log_file_path = os.path.join(self.log_dir, f"{self.job_id[6:]}.log")
+
+    @patch("ssherlock_server.utils.check_private_key")
+    def test_valid_log_entry(self, mock_check_private_key):
+        mock_check_private_key.return_value = None
+
+        response = self.client.post(
+            self.url,
+            data=json.dumps(self.valid_log_content),
+            content_type="application/json",
+            HTTP_AUTHORIZATION=self.valid_token,
+        )
+
+        # Ensure the response is successful
+        self.assertEqual(response.status_code, 200)
+
+        # Check if the log directory exists
+        self.assertTrue(os.path.isdir(self.log_dir))
+
+        # Check if the log file exists and contains the correct data
+        self.assertTrue(os.path.isfile(self.log_file_path))
+        with open(self.log_file_path, "r", encoding="utf-8") as log_file:
+            content = log_file.read()
+            self.assertIn(self.valid_log_content["log"], content)
+
+    @patch("ssherlock_server.utils.check_private_key")
+    def test_missing_log_content(self, mock_check_private_key):
+        mock_check_private_key.return_value = None
+        response = self.client.post(
+            self.url,
+            data=json.dumps(self.invalid_log_content),
+            content_type="application/json",
+            HTTP_AUTHORIZATION=self.valid_token,
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertJSONEqual(response.content, {"message": "Log content not provided."})
+
+    @patch("ssherlock_server.utils.check_private_key")
+    def test_invalid_authorization(self, mock_check_private_key):
+        mock_check_private_key.return_value = JsonResponse(
+            {"message": "Authorization token incorrect."}, status=404
+        )
+        response = self.client.post(
+            self.url,
+            data=json.dumps(self.valid_log_content),
+            content_type="application/json",
+            HTTP_AUTHORIZATION=self.invalid_token,
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertJSONEqual(
+            response.content, {"message": "Authorization token incorrect."}
+        )
+
+    @patch("ssherlock_server.utils.check_private_key")
+    def test_no_authorization_header(self, mock_check_private_key):
+        mock_check_private_key.return_value = None
+        response = self.client.post(
+            self.url,
+            data=json.dumps(self.valid_log_content),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertJSONEqual(
+            response.content, {"message": "Authorization header not provided."}
+        )
+
+    @patch("ssherlock_server.utils.check_private_key")
+    def test_exception_handling(self, mock_check_private_key):
+        """Test exception handling in log job data."""
+        mock_check_private_key.return_value = None
+
+        with patch(
+            "ssherlock_server.views.append_job_log",
+            side_effect=Exception("Test exception"),
+        ):
+            response = self.client.post(
+                self.url,
+                data=json.dumps(self.valid_log_content),
+                content_type="application/json",
+                HTTP_AUTHORIZATION=self.valid_token,
+            )
+            self.assertEqual(response.status_code, 500)
+            self.assertJSONEqual(response.content, {"message": "Test exception"})
+
+    def tearDown(self):
+        # Clean up by removing the created log file and directories
+        if os.path.exists(self.log_file_path):
+            os.remove(self.log_file_path)
+        if os.path.exists(self.log_dir):
+            os.removedirs(self.log_dir)
+
+
+class TestLogJobDataBatch(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.job_id = "a1b2c3d4-b065-4c49-9241-e4eefbc274e3"
+        self.url = reverse("log_job_data_batch", args=[self.job_id])
+        self.valid_token = "Bearer myprivatekey"
+        self.log_dir = os.path.join(
+            settings.BASE_DIR.parent,
+            "ssherlock_runner_job_logs",
+            self.job_id[0:2],
+            self.job_id[2:4],
+            self.job_id[4:6],
+        )
+        self.log_file_path = os.path.join(self.log_dir, f"{self.job_id[6:]}.log")
+
+    def test_valid_log_batch(self):
+        response = self.client.post(
+            self.url,
+            data=json.dumps({"logs": ["first entry", "second entry"]}),
+            content_type="application/json",
+            HTTP_AUTHORIZATION=self.valid_token,
+        )
+        self.assertEqual(response.status_code, 200)
+        with open(self.log_file_path, "r", encoding="utf-8") as log_file:
+            lines = log_file.read().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].endswith(" first entry"))
+        self.assertTrue(lines[1].endswith(" second entry"))
+
+    def test_log_batch_response_reports_job_status(self):
+        """Test the reply tells the runner its job was canceled."""
+        user = User.objects.create(email="testuser@example.com")
+        Job.objects.create(id=self.job_id, user=user, status="Canceled")
+        response = self.client.post(
+            self.url,
+            data=json.dumps({"logs": ["entry"]}),
+            content_type="application/json",
+            HTTP_AUTHORIZATION=self.valid_token,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertJSONEqual(response.content, {"status": "Canceled"})
+
+    def test_missing_log_batch(self):
+        response = self.client.post(
+            self.url,
+            data=json.dumps({"logs": []}),
+            content_type="application/json",
+            HTTP_AUTHORIZATION=self.valid_token,
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertJSONEqual(response.content, {"message": "Log content not provided."})
+
+    def test_structured_log_entries(self):
+        entries = [
+            {"timestamp": 0, "level": "INFO", "message": "runner started"},
+            {"timestamp": 1.5, "level": "WARNING", "message": "retrying"},
+            {"message": "no level"},
+        ]
+        response = self.client.post(
+            self.url,
+            data=json.dumps({"logs": entries}),
+            content_type="application/json",
+            HTTP_AUTHORIZATION=self.valid_token,
+        )
+        self.assertEqual(response.status_code, 200)
+        with open(self.log_file_path, "r", encoding="utf-8") as log_file:
+            lines = log_file.read().splitlines()
+        self.assertEqual(lines[0], "1970-01-01 00:00:00 INFO runner started")
+        self.assertEqual(lines[1], "1970-01-01 00:00:01 WARNING retrying")
+        self.assertTrue(lines[2].endswith(" no level"))
+
+    def test_gzip_log_batch(self):
+        body = gzip.compress(json.dumps({"logs": ["compressed entry"]}).encode())
+        response = self.client.post(
+            self.url,
+            data=body,
+            content_type="application/json",
+            HTTP_AUTHORIZATION=self.valid_token,
+            HTTP_CONTENT_ENCODING="gzip",
+        )
+        self.assertEqual(response.status_code, 200)
+        with open(self.log_file_path, "r", encoding="utf-8") as log_file:
+            self.assertTrue(log_file.read().endswith(" compressed entry\n"))
+
+    def test_invalid_gzip_body(self):
+        response = self.client.post(
+            self.url,
+            data=b"not gzip",
+            content_type="application/json",
+            HTTP_AUTHORIZATION=self.valid_token,
+            HTTP_CONTENT_ENCODING="gzip",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertJSONEqual(response.content, {"message": "Invalid gzip request body."})
+
+    @override_settings(LOG_BATCH_MAX_BYTES=64)
+    def test_gzip_body_too_large(self):
+        body = gzip.compress(json.dumps({"logs": ["x" * 1000]}).encode())
+        response = self.client.post(
+            self.url,
+            data=body,
+            content_type="application/json",
+            HTTP_AUTHORIZATION=self.valid_token,
+            HTTP_CONTENT_ENCODING="gzip",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(os.path.exists(self.log_file_path))
+
+    def test_invalid_log_entry(self):
+        response = self.client.post(
+            self.url,
+            data=json.dumps({"logs": ["valid", {"timestamp": "yesterday", "message": "x"}]}),
+            content_type="application/json",
+            HTTP_AUTHORIZATION=self.valid_token,
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertJSONEqual(response.content, {"message": "Invalid log entry."})
+        self.assertFalse(os.path.exists(self.log_file_path))
+
+    def test_no_authorization_header(self):
+        response = self.client.post(
+            self.url,
+            data=json.dumps({"logs": ["entry"]}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def tearDown(self):
+        if os.path.exists(self.log_file_path):
+            os.remove(self.log_file_path)
+        if os.path.exists(self.log_dir):
+            os.removedirs(self.log_dir)
+
+
+class JobLogTestCase(TestCase):
+    """Sets up a running job with a one-line log."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            "testuser", "testuser@example.com", "password"
+        )
+        self.client = Client()
+        self.job = Job.objects.create(
+            status="Running", instructions="Job instructions", user=self.user
+        )
+        self.job_id = str(self.job.id)
+        self.log_dir, self.log_file_path = get_job_log_path(self.job_id)
+        os.makedirs(self.log_dir, exist_ok=True)
+        with open(self.log_file_path, "w", encoding="utf-8") as log_file:
+            log_file.write("Existing entry\n")
+
+    def tearDown(self):
+        for suffix in ("", ".gz"):
+            if os.path.exists(self.log_file_path + suffix):
+                os.remove(self.log_file_path + suffix)
+        if os.path.exists(self.log_dir):
+            os.removedirs(self.log_dir)
+
+
+class TestStreamJobLog(JobLogTestCase):
+    async def open_stream(self, **kwargs):
+        """Log in, open the job's log stream and return its iterator."""
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(
+            reverse("stream_job_log", args=[self.job_id]), **kwargs
+        )
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        return aiter(response.streaming_content)
+
+    async def next_event(self, stream):
+        """Return the next event from a stream, failing the test if none arrives."""
+        chunk = await asyncio.wait_for(anext(stream), timeout=5)
+        return chunk.decode("utf-8") if isinstance(chunk, bytes) else chunk
+
+    async def test_stream_job_log_pushes_new_lines(self):
+        """Test lines appended to the log are pushed to an open stream."""
+        stream = await self.open_stream()
+        self.assertEqual(
+            await self.next_event(stream), "id: 15\ndata: Existing entry\n\n"
+        )
+        first_event = asyncio.ensure_future(self.next_event(stream))
+        # Give the stream time to reach the end of the existing log.
+        await asyncio.sleep(0.2)
+        await sync_to_async(append_job_log)(self.job_id, ["Log entry 1", "Log entry 2"])
+
+        self.assertEqual(await first_event, "id: 27\ndata: Log entry 1\n\n")
+        self.assertEqual(
+            await self.next_event(stream), "id: 39\ndata: Log entry 2\n\n"
+        )
+        await stream.aclose()
+
+    async def test_stream_job_log_resumes_from_last_event_id(self):
+        """Test a reconnecting stream resumes after the last event the client received."""
+        await sync_to_async(append_job_log)(self.job_id, ["Log entry 1", "Log entry 2"])
+        stream = await self.open_stream(headers={"Last-Event-ID": "27"})
+        self.assertEqual(
+            await self.next_event(stream), "id: 39\ndata: Log entry 2\n\n"
+        )
+        await stream.aclose()
+
+    async def test_stream_job_log_resumes_from_offset(self):
+        """Test the offset query parameter sets where the stream starts."""
+        await sync_to_async(append_job_log)(self.job_id, ["Log entry 1"])
+        stream = await self.open_stream(data={"offset": 15})
+        self.assertEqual(
+            await self.next_event(stream), "id: 27\ndata: Log entry 1\n\n"
+        )
+        await stream.aclose()
+
+    async def test_stream_job_log_invalid_offset(self):
+        """Test an invalid offset is rejected."""
+        await self.async_client.aforce_login(self.user)
+        for offset in ("abc", "-1"):
+            response = await self.async_client.get(
+                reverse("stream_job_log", args=[self.job_id]), {"offset": offset}
+            )
+            self.assertEqual(response.status_code, 400)
+            self.assertJSONEqual(response.content, {"message": "Invalid offset."})
+
+    @override_settings(JOB_LOG_STREAM_CLOSE_GRACE_SECONDS=0)
+    async def test_stream_job_log_ends_when_job_finishes(self):
+        """Test the stream sends an end event and closes once the job finishes."""
+        stream = await self.open_stream(data={"offset": 15})
+        end_event = asyncio.ensure_future(self.next_event(stream))
+        await asyncio.sleep(0.2)
+        await Job.objects.filter(pk=self.job_id).aupdate(status="Completed")
+        notify_job_update(self.job_id)
+
+        self.assertEqual(await end_event, "event: end\ndata: Completed\n\n")
+        with self.assertRaises(StopAsyncIteration):
+            await self.next_event(stream)
+
+    async def test_stream_job_log_finished_job(self):
+        """Test a stream for a finished job replays the log, then ends immediately."""
+        await Job.objects.filter(pk=self.job_id).aupdate(status="Failed")
+        stream = await self.open_stream()
+        self.assertEqual(
+            await self.next_event(stream), "id: 15\ndata: Existing entry\n\n"
+        )
+        self.assertEqual(await self.next_event(stream), "event: end\ndata: Failed\n\n")
+
+    @override_settings(
+        JOB_LOG_STREAM_POLL_INTERVAL_SECONDS=0.01,
+        JOB_LOG_STREAM_STATUS_INTERVAL_SECONDS=60,
+    )
+    async def test_stream_job_log_reads_status_only_when_needed(self):
+        """Test an idle stream doesn't query the job's status on every poll."""
+        with patch(
+            "ssherlock_server.utils._get_job_status", return_value="Running"
+        ) as mock_get_status:
+            stream = await self.open_stream(data={"offset": 15})
+            first_event = asyncio.ensure_future(self.next_event(stream))
+            await asyncio.sleep(0.3)
+            self.assertEqual(mock_get_status.call_count, 1)
+
+            mock_get_status.return_value = "Completed"
+            notify_job_update(self.job_id)
+            await asyncio.sleep(0.1)
+            self.assertEqual(mock_get_status.call_count, 2)
+            first_event.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await first_event
+            await stream.aclose()
+
+    @override_settings(JOB_LOG_STREAM_HEARTBEAT_SECONDS=0)
+    async def test_stream_job_log_heartbeat(self):
+        """Test an idle stream sends heartbeat comments."""
+        stream = await self.open_stream(data={"offset": 15})
+        self.assertEqual(await self.next_event(stream), ": heartbeat\n\n")
+        await stream.aclose()
+
+    @override_settings(JOB_LOG_COMPRESSION="gzip")
+    async def test_stream_compressed_job_log(self):
+        """Test the stream replays a compressed log from an offset."""
+        await sync_to_async(append_job_log)(self.job_id, ["Log entry 1"])
+        await Job.objects.filter(pk=self.job_id).aupdate(status="Completed")
+        await sync_to_async(compress_job_log)(self.job_id)
+        stream = await self.open_stream(data={"offset": 15})
+        self.assertEqual(
+            await self.next_event(stream), "id: 27\ndata: Log entry 1\n\n"
+        )
+        self.assertEqual(
+            await self.next_event(stream), "event: end\ndata: Completed\n\n"
+        )
+
+    def test_stream_job_log_not_authenticated(self):
+        """Test streaming job log while not authenticated redirects to login page."""
+        response = self.client.get(reverse("stream_job_log", args=[self.job_id]))
+        self.assertEqual(response.status_code, 302)
+        self.assertRedirects(
+            response, f"/accounts/login/?next=/view_job/{self.job_id}/log"
+        )
+
+    async def test_stream_job_log_other_users_job(self):
+        """Test streaming another user's job log returns 404."""
+        other_user = await sync_to_async(User.objects.create_user)(
+            "otheruser", "otheruser@example.com", "password"
+        )
+        await self.async_client.aforce_login(other_user)
+        response = await self.async_client.get(
+            reverse("stream_job_log", args=[self.job_id])
+        )
+        self.assertEqual(response.status_code, 404)
+
+    async def test_stream_job_log_file_not_found(self):
+        """Test streaming of job log when a finished job has no log file."""
+        os.remove(self.log_file_path)
+        await Job.objects.filter(pk=self.job_id).aupdate(status="Canceled")
+        stream = await self.open_stream()
+        event = await self.next_event(stream)
+        self.assertIn("event: error", event)
+        self.assertIn("data: Log file not found", event)
+
+    async def test_stream_job_log_waits_for_log_file(self):
+        """Test streaming the log of a job that hasn't logged anything yet."""
+        os.remove(self.log_file_path)
+        stream = await self.open_stream()
+        first_event = asyncio.ensure_future(self.next_event(stream))
+        await asyncio.sleep(0.2)
+        self.assertFalse(first_event.done())
+        await sync_to_async(append_job_log)(self.job_id, ["First entry"])
+        self.assertEqual(await first_event, "id: 12\ndata: First entry\n\n")
+        await stream.aclose()
+
+
+class TestGetFullJobLog(JobLogTestCase):
+    async def get_full_job_log(self, **kwargs):
+        """Log in, fetch the full job log and return the response and its body."""
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(
+            reverse("get_full_job_log", args=[self.job_id]), **kwargs
+        )
+        body = b"".join([chunk async for chunk in response.streaming_content])
+        return response, body.decode("utf-8")
+
+    async def test_get_full_job_log_authenticated(self):
+        """Test fetching the full job log while authenticated."""
+        response, body = await self.get_full_job_log()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, "Existing entry\n")
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(response["Content-Length"], "15")
+
+    async def test_get_full_job_log_range(self):
+        """Test fetching a byte range of the job log."""
+        for range_header, expected_body, content_range in (
+            ("bytes=9-", "entry\n", "bytes 9-14/15"),
+            ("bytes=0-7", "Existing", "bytes 0-7/15"),
+            ("bytes=-6", "entry\n", "bytes 9-14/15"),
+        ):
+            response, body = await self.get_full_job_log(headers={"Range": range_header})
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(body, expected_body)
+            self.assertEqual(response["Content-Range"], content_range)
+
+    def test_get_full_job_log_range_not_satisfiable(self):
+        """Test a byte range past the end of the job log is rejected."""
+        self.client.login(username="testuser", password="password")
+        response = self.client.get(
+            reverse("get_full_job_log", args=[self.job_id]), headers={"Range": "bytes=15-"}
+        )
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */15")
+
+    def test_get_full_job_log_pages(self):
+        """Test fetching the job log a page of lines at a time, newest first."""
+        append_job_log(self.job_id, ["Log entry 1", "Log entry 2"])
+        self.client.login(username="testuser", password="password")
+        url = reverse("get_full_job_log", args=[self.job_id])
+
+        response = self.client.get(url, {"tail": 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(), {"lines": ["Log entry 1", "Log entry 2"], "start": 15, "end": 39}
+        )
+
+        response = self.client.get(url, {"before": 15, "limit": 10})
+        self.assertEqual(
+            response.json(), {"lines": ["Existing entry"], "start": 0, "end": 15}
+        )
+
+    def test_get_full_job_log_invalid_page(self):
+        """Test invalid page parameters are rejected."""
+        self.client.login(username="testuser", password="password")
+        url = reverse("get_full_job_log", args=[self.job_id])
+        for params in ({"tail": "abc"}, {"tail": 0}, {"before": -1}):
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 400)
+            self.assertJSONEqual(
+                response.content, {"message": "Invalid page parameters."}
+            )
+
+    @override_settings(JOB_LOG_X_ACCEL_REDIRECT_LOCATION="/internal/job_logs/")
+    def test_get_full_job_log_x_accel_redirect(self):
+        """Test full job log downloads are handed off to nginx when configured."""
+        self.client.login(username="testuser", password="password")
+        response = self.client.get(reverse("get_full_job_log", args=[self.job_id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(
+            response["X-Accel-Redirect"],
+            f"/internal/job_logs/{self.job_id[0:2]}/{self.job_id[2:4]}/"
+            f"{self.job_id[4:6]}/{self.job_id[6:]}.log",
+        )
+
+    def test_get_full_job_log_other_users_job(self):
+        """Test users can't fetch the logs of other users' jobs."""
+        User.objects.create_user("otheruser", "otheruser@example.com", "password")
+        self.client.login(username="otheruser", password="password")
+        response = self.client.get(reverse("get_full_job_log", args=[self.job_id]))
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(JOB_LOG_COMPRESSION="gzip")
+    async def test_get_full_job_log_compressed(self):
+        """Test a compressed log is decompressed for clients that don't accept gzip."""
+        await Job.objects.filter(pk=self.job_id).aupdate(status="Completed")
+        await sync_to_async(compress_job_log)(self.job_id)
+        response, body = await self.get_full_job_log()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, "Existing entry\n")
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    @override_settings(JOB_LOG_COMPRESSION="gzip")
+    async def test_get_full_job_log_precompressed(self):
+        """Test a gzipped log is sent as it is to clients that accept gzip."""
+        await Job.objects.filter(pk=self.job_id).aupdate(status="Completed")
+        await sync_to_async(compress_job_log)(self.job_id)
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(
+            reverse("get_full_job_log", args=[self.job_id]),
+            headers={"Accept-Encoding": "gzip, deflate"},
+        )
+        body = b"".join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["Content-Length"], str(len(body)))
+        self.assertEqual(gzip.decompress(body), b"Existing entry\n")
+
+    def test_get_full_job_log_not_authenticated(self):
+        """Test fetching the full job log while not authenticated redirects to login page."""
+        response = self.client.get(reverse("get_full_job_log", args=[self.job_id]))
+        self.assertEqual(response.status_code, 302)
+        self.assertRedirects(
+            response, f"/accounts/login/?next=/view_job/{self.job_id}/log/full"
+        )
+
+    def test_get_full_job_log_file_not_found(self):
+        """Test fetching the full job log when the file does not exist returns empty body."""
+        os.remove(self.log_file_path)
+        self.client.login(username="testuser", password="password")
+        response = self.client.get(reverse("get_full_job_log", args=[self.job_id]))
+        self.assertEqual(response.status_code, 200)
+        # Body should be empty string when file not found
+        self.assertEqual(response.content.decode("utf-8"), "")
@@ -320,11 +320,31 @@ class TestJob(TestCase):
             "bastion_host_hostname": self.bastion_host.hostname,
             "bastion_host_port": self.bastion_host.port,
             "credentials_for_bastion_host_username": self.credential.username,
+            "credentials_for_bastion_host_password": self.credential.password,
+            "credentials_for_bastion_host_private_key": self.credential.private_key,
             "target_host_hostname": self.target_host.hostname,
             "target_host_port": self.target_host.port,
+            "target_hosts": [
+                {
+                    "id": str(self.target_host.id),
+                    "hostname": self.target_host.hostname,
+                    "port": self.target_host.port,
+                }
+            ],
             "credentials_for_target_hosts_username": self.credential.username,
+            "credentials_for_target_host_password": self.credential.password,
+            "credentials_for_target_host_private_key": self.credential.private_key,
             "instructions": self.job1.instructions,
         }
 
         job_json = self.job1.dict()
         self.assertEqual(job_json, expected_json)
+
+    def test_to_json_method_lists_every_target_host(self):
+        second_host = TargetHost.objects.create(
+            user=self.user, hostname="target2.example.com", port=2222
+        )
+        self.job1.target_hosts.add(second_host)
+
+        hostnames = [host["hostname"] for host in self.job1.dict()["target_hosts"]]
+        self.assertCountEqual(hostnames, ["target.example.com", "target2.example.com"])
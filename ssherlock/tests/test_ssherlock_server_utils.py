@@ -2,12 +2,46 @@
 
 # pylint: disable=import-error, missing-class-docstring, missing-function-docstring, invalid-str-returned, no-member, invalid-name
 
-from django.test import TestCase, RequestFactory
+import gzip
+import io
+import os
+import threading
+import time
+import datetime
+import uuid
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, RequestFactory, override_settings
+from django.urls import reverse
 from django.http import JsonResponse
+from django.utils import timezone
+from ssherlock_server.models import Job
 from ssherlock_server.utils import (
+    append_job_log,
     check_private_key,
+    claim_pending_job,
+    compress_finished_job_logs,
+    compress_job_log,
+    get_compressed_job_log_path,
+    get_job_log_path,
+    notify_pending_job,
+    open_job_log,
+    parse_byte_range,
+    read_job_log_lines,
+    release_stale_claims,
+    schedule_job_log_compression,
+    transition_job_status,
+    wait_for_pending_job,
 )  # Adjust the import according to your app structure
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 SSHERLOCK_SERVER_RUNNER_TOKEN = "myprivatekey"
 
 
@@ -60,3 +94,263 @@ class CheckPrivateKeyTests(TestCase):
         response = check_private_key(request)
 
         self.assertIsNone(response)
+
+
+class ClaimPendingJobTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="testuser@example.com")
+        self.job1 = Job.objects.create(user=self.user, instructions="first")
+        self.job2 = Job.objects.create(user=self.user, instructions="second")
+
+    def test_claims_oldest_pending_job(self):
+        job = claim_pending_job("runner-1")
+        self.assertEqual(job.id, self.job1.id)
+        self.assertEqual(job.status, "Claimed")
+        self.assertEqual(job.claimed_by, "runner-1")
+
+    def test_records_claim_time(self):
+        job = claim_pending_job("runner-1")
+        self.assertIsNotNone(job.claimed_at)
+
+    @override_settings(JOB_CLAIM_LEASE_SECONDS=300)
+    def test_releases_stale_claims(self):
+        stale = claim_pending_job("runner-1")
+        fresh = claim_pending_job("runner-2")
+        Job.objects.filter(pk=stale.pk).update(
+            claimed_at=timezone.now() - datetime.timedelta(seconds=301)
+        )
+        self.assertEqual(release_stale_claims(), 1)
+        stale.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertEqual(stale.status, "Pending")
+        self.assertIsNone(stale.claimed_by)
+        self.assertEqual(fresh.status, "Claimed")
+
+        # The released job is handed out again.
+        self.assertEqual(wait_for_pending_job("runner-3", 0).id, stale.id)
+
+    def test_returns_none_when_queue_empty(self):
+        Job.objects.update(status="Running")
+        self.assertIsNone(claim_pending_job("runner-1"))
+
+    @patch("ssherlock_server.utils.connection")
+    def test_compare_and_swap_fallback(self, mock_connection):
+        mock_connection.features.has_select_for_update_skip_locked = False
+        first = claim_pending_job("runner-1")
+        second = claim_pending_job("runner-2")
+        self.assertEqual(first.id, self.job1.id)
+        self.assertEqual(second.id, self.job2.id)
+        self.assertIsNone(claim_pending_job("runner-3"))
+        self.job2.refresh_from_db()
+        self.assertEqual(self.job2.claimed_by, "runner-2")
+
+
+class TransitionJobStatusTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("testuser", "test@example.com", "pw")
+        self.job = Job.objects.create(user=self.user, instructions="Do things")
+
+    def test_sets_status_and_timestamp(self):
+        self.assertTrue(transition_job_status(self.job.id, "Running"))
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, "Running")
+        self.assertIsNotNone(self.job.started_at)
+        self.assertIsNone(self.job.duration)
+
+    def test_terminal_status_sets_duration(self):
+        transition_job_status(self.job.id, "Running")
+        self.assertTrue(transition_job_status(self.job.id, "Failed"))
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, "Failed")
+        self.assertEqual(self.job.duration, self.job.stopped_at - self.job.started_at)
+
+    def test_terminal_status_without_start_leaves_duration_empty(self):
+        self.assertTrue(transition_job_status(self.job.id, "Canceled"))
+        self.job.refresh_from_db()
+        self.assertIsNone(self.job.duration)
+
+    def test_never_leaves_terminal_status(self):
+        transition_job_status(self.job.id, "Completed")
+        for status in ("Running", "Pending", "Failed", "Canceled"):
+            self.assertFalse(transition_job_status(self.job.id, status))
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, "Completed")
+
+    def test_missing_job(self):
+        self.assertFalse(transition_job_status(uuid.uuid4(), "Running"))
+
+
+class WaitForPendingJobTests(TestCase):
+    def test_returns_none_after_timeout(self):
+        started = time.monotonic()
+        self.assertIsNone(wait_for_pending_job("runner-1", 0.2))
+        self.assertGreaterEqual(time.monotonic() - started, 0.2)
+
+    @override_settings(REQUEST_JOB_POLL_INTERVAL_SECONDS=0.05)
+    @patch("ssherlock_server.utils.release_db_connection")
+    def test_releases_connection_while_waiting(self, mock_release):
+        self.assertIsNone(wait_for_pending_job("runner-1", 0.2))
+        self.assertGreaterEqual(mock_release.call_count, 1)
+
+    @override_settings(REQUEST_JOB_POLL_INTERVAL_SECONDS=10)
+    @patch("ssherlock_server.utils.claim_pending_job")
+    def test_wakes_up_when_job_is_created(self, mock_claim):
+        job = object()
+        mock_claim.side_effect = [None, job]
+        threading.Timer(0.1, notify_pending_job).start()
+        started = time.monotonic()
+        self.assertIs(wait_for_pending_job("runner-1", 30), job)
+        self.assertLess(time.monotonic() - started, 5)
+
+
+class ReadJobLogLinesTests(TestCase):
+    def setUp(self):
+        self.job_id = str(uuid.uuid4())
+        self.log_dir, self.log_file_path = get_job_log_path(self.job_id)
+        os.makedirs(self.log_dir, exist_ok=True)
+        with open(self.log_file_path, "w", encoding="utf-8") as log_file:
+            log_file.write("".join(f"line {i}\n" for i in range(10)) + "partial")
+
+    def tearDown(self):
+        os.remove(self.log_file_path)
+        os.removedirs(self.log_dir)
+
+    @patch("ssherlock_server.utils.JOB_LOG_CHUNK_SIZE", 5)
+    def test_reads_last_lines_across_chunks(self):
+        lines, start, end = read_job_log_lines(self.job_id, 3)
+        self.assertEqual(lines, ["line 7", "line 8", "line 9"])
+        self.assertEqual((start, end), (49, 70))
+
+    def test_reads_lines_before_offset(self):
+        lines, start, end = read_job_log_lines(self.job_id, 100, before=14)
+        self.assertEqual(lines, ["line 0", "line 1"])
+        self.assertEqual((start, end), (0, 14))
+
+    def test_missing_log_file(self):
+        self.assertEqual(read_job_log_lines(str(uuid.uuid4()), 10), ([], 0, 0))
+
+
+class ParseByteRangeTests(TestCase):
+    def test_single_ranges(self):
+        self.assertEqual(parse_byte_range("bytes=0-99", 1000), (0, 100))
+        self.assertEqual(parse_byte_range("bytes=900-", 1000), (900, 1000))
+        self.assertEqual(parse_byte_range("bytes=-100", 1000), (900, 1000))
+        self.assertEqual(parse_byte_range("bytes=900-2000", 1000), (900, 1000))
+
+    def test_unsupported_ranges_are_ignored(self):
+        self.assertIsNone(parse_byte_range("bytes=0-1,5-6", 1000))
+        self.assertIsNone(parse_byte_range("lines=0-1", 1000))
+        self.assertIsNone(parse_byte_range("bytes=abc", 1000))
+
+    def test_unsatisfiable_range(self):
+        with self.assertRaises(ValueError):
+            parse_byte_range("bytes=1000-", 1000)
+
+
+class CompressJobLogTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("testuser", "test@example.com", "pw")
+        self.job = Job.objects.create(user=self.user, status="Completed")
+        self.job_id = str(self.job.id)
+        self.log_dir, self.log_file_path = get_job_log_path(self.job_id)
+        append_job_log(self.job_id, [f"line {i}" for i in range(10)])
+
+    def tearDown(self):
+        for suffix in ("", ".gz", ".zst"):
+            if os.path.exists(self.log_file_path + suffix):
+                os.remove(self.log_file_path + suffix)
+        os.removedirs(self.log_dir)
+
+    def read_log(self):
+        with open_job_log(self.job_id) as log_file:
+            return log_file.read().decode("utf-8")
+
+    @override_settings(JOB_LOG_COMPRESSION="gzip")
+    def test_compresses_with_gzip(self):
+        compress_job_log(self.job_id)
+        self.assertFalse(os.path.exists(self.log_file_path))
+        self.assertEqual(
+            get_compressed_job_log_path(self.job_id),
+            ("gzip", self.log_file_path + ".gz"),
+        )
+        with gzip.open(self.log_file_path + ".gz", "rt", encoding="utf-8") as log_file:
+            self.assertEqual(log_file.read(), "".join(f"line {i}\n" for i in range(10)))
+
+    @skipUnless(zstandard, "zstandard is not installed")
+    @override_settings(JOB_LOG_COMPRESSION="zstd")
+    def test_compresses_with_zstd(self):
+        compress_job_log(self.job_id)
+        self.assertFalse(os.path.exists(self.log_file_path))
+        self.assertEqual(get_compressed_job_log_path(self.job_id)[0], "zstd")
+        self.assertEqual(self.read_log(), "".join(f"line {i}\n" for i in range(10)))
+
+    @override_settings(JOB_LOG_COMPRESSION=None)
+    def test_compression_disabled(self):
+        compress_job_log(self.job_id)
+        self.assertTrue(os.path.exists(self.log_file_path))
+        self.assertEqual(get_compressed_job_log_path(self.job_id), (None, None))
+
+    @override_settings(JOB_LOG_COMPRESSION="gzip")
+    def test_skips_jobs_that_are_not_finished(self):
+        Job.objects.filter(pk=self.job.pk).update(status="Running")
+        compress_job_log(self.job_id)
+        self.assertTrue(os.path.exists(self.log_file_path))
+        self.assertEqual(get_compressed_job_log_path(self.job_id), (None, None))
+
+    @override_settings(JOB_LOG_COMPRESSION="gzip", JOB_LOG_COMPRESS_DELAY_SECONDS=60)
+    def test_retrying_job_cancels_scheduled_compression(self):
+        Job.objects.filter(pk=self.job.pk).update(status="Failed")
+        with patch("ssherlock_server.utils.threading.Timer") as mock_timer:
+            schedule_job_log_compression(self.job_id)
+            self.client.force_login(self.user)
+            self.client.get(reverse("retry_job", args=[self.job_id]))
+        mock_timer.return_value.cancel.assert_called_once()
+
+        # A compression already running in another process leaves the log alone too.
+        compress_job_log(self.job_id)
+        append_job_log(self.job_id, ["retried"])
+        self.assertTrue(os.path.exists(self.log_file_path))
+        self.assertTrue(self.read_log().endswith("line 9\nretried\n"))
+
+    @override_settings(JOB_LOG_COMPRESSION="gzip")
+    def test_appends_after_compression(self):
+        compress_job_log(self.job_id)
+        append_job_log(self.job_id, ["late line"])
+        self.assertFalse(os.path.exists(self.log_file_path))
+        self.assertTrue(self.read_log().endswith("line 9\nlate line\n"))
+
+    @override_settings(JOB_LOG_COMPRESSION="gzip", JOB_LOG_COMPRESS_DELAY_SECONDS=60)
+    def test_compresses_finished_job_logs(self):
+        finished = self.job
+        Job.objects.filter(pk=finished.pk).update(
+            completed_at=timezone.now() - datetime.timedelta(seconds=61)
+        )
+        just_finished = Job.objects.create(
+            user=self.user, status="Failed", stopped_at=timezone.now()
+        )
+        running = Job.objects.create(user=self.user, status="Running")
+        for job in (just_finished, running):
+            append_job_log(str(job.id), ["line"])
+        try:
+            self.assertEqual(compress_finished_job_logs(), 1)
+            self.assertEqual(get_compressed_job_log_path(finished.id)[0], "gzip")
+            for job in (just_finished, running):
+                self.assertEqual(get_compressed_job_log_path(job.id), (None, None))
+            # Logs that are already compressed are skipped.
+            call_command("compress_job_logs", stdout=io.StringIO())
+            self.assertEqual(compress_finished_job_logs(), 0)
+        finally:
+            for job in (just_finished, running):
+                log_dir, log_file_path = get_job_log_path(str(job.id))
+                os.remove(log_file_path)
+                os.removedirs(log_dir)
+
+    @override_settings(JOB_LOG_COMPRESSION="gzip")
+    def test_reads_lines_of_compressed_log(self):
+        compress_job_log(self.job_id)
+        lines, start, end = read_job_log_lines(self.job_id, 2, before=14)
+        self.assertEqual(lines, ["line 0", "line 1"])
+        self.assertEqual((start, end), (0, 14))
+        lines, start, end = read_job_log_lines(self.job_id, 1)
+        self.assertEqual(lines, ["line 9"])
+        self.assertEqual((start, end), (63, 70))
@@ -5,21 +5,24 @@
 import uuid
 import json
 import os
-from unittest.mock import patch, mock_open
+from unittest.mock import patch
 from django.utils import timezone
 from django.conf import settings
+from django.db import connection
 from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from django.http import JsonResponse
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from ssherlock_server.models import (
     BastionHost,
     Credential,
     Job,
+    JobTargetHostStatus,
     LlmApi,
     TargetHost,
 )
+from ssherlock_server.utils import get_job_log_path
 
 SSHERLOCK_SERVER_DOMAIN = "localhost:8000"
 SSHERLOCK_SERVER_PROTOCOL = "http"
@@ -740,18 +743,52 @@ class TestCreateJobView(TestCase):
         self.assertEqual(job.llm_api, self.llm_api)
         self.assertIn(self.target_host1, job.target_hosts.all())  # codespell:ignore
 
-        # Verify that a log file was created for the job when it was created.
-        job_id = str(job.id)
-        log_dir = os.path.join(
-            settings.BASE_DIR.parent,
-            "ssherlock_runner_job_logs",
-            job_id[0:2],
-            job_id[2:4],
-            job_id[4:6],
+        # The log file is created by the job's first log line, not when the job is created.
+        _, log_file_path = get_job_log_path(job.id)
+        self.assertFalse(os.path.exists(log_file_path))
+
+    def test_create_job_with_multiple_hosts_creates_one_job(self):
+        """Test that selecting several target hosts creates one job spanning all of them."""
+        self.client.login(username="testuser", password="password")
+        data = {
+            "llm_api": self.llm_api.id,
+            "credentials_for_target_hosts": self.credential.id,
+            "target_hosts": [self.target_host1.id, self.target_host2.id],
+            "instructions": "Test instructions",
+        }
+        response = self.client.post(reverse("create_job"), data)
+        self.assertEqual(response.status_code, 302)
+
+        job = Job.objects.get()
+        self.assertCountEqual(
+            job.target_hosts.all(), [self.target_host1, self.target_host2]
+        )
+
+    def test_create_job_with_many_hosts(self):
+        """Test that a job's hosts are saved with a fixed number of queries."""
+        target_hosts = TargetHost.objects.bulk_create(
+            TargetHost(hostname=f"host{i}.example.com", port=22, user=self.user)
+            for i in range(1000)
         )
-        log_file_path = os.path.join(log_dir, f"{job_id[6:]}.log")
-        self.assertTrue(os.path.isdir(log_dir))
-        self.assertTrue(os.path.isfile(log_file_path))
+        self.client.login(username="testuser", password="password")
+        data = {
+            "llm_api": self.llm_api.id,
+            "credentials_for_target_hosts": self.credential.id,
+            "target_hosts": [host.id for host in target_hosts],
+            "instructions": "Test instructions",
+        }
+        response = self.client.post(reverse("create_job"), data)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Job.objects.get().target_hosts.count(), 1000)
+
+        # Saving 2 hosts or 200 takes the same number of queries.
+        query_counts = []
+        for host_count in (2, 200):
+            data["target_hosts"] = [host.id for host in target_hosts[:host_count]]
+            with CaptureQueriesContext(connection) as queries:
+                self.client.post(reverse("create_job"), data)
+            query_counts.append(len(queries))
+        self.assertEqual(query_counts[0], query_counts[1])
 
     def test_create_single_job_not_authenticated(self):
         """Test creating a single job with one target host while not authenticated redirects to login."""
@@ -870,6 +907,46 @@ class TestRequestJob(TestCase):
             job_data["credentials_for_target_hosts_username"], self.credential.username
         )
 
+    def test_requested_job_is_claimed(self):
+        """Test that the returned job is moved to Claimed and records the runner."""
+        headers = {
+            "HTTP_AUTHORIZATION": "Bearer myprivatekey",
+            "HTTP_X_RUNNER_ID": "runner-1",
+        }
+        response = self.client.get(reverse("request_job"), **headers)
+        self.assertEqual(response.status_code, 200)
+        self.job2.refresh_from_db()
+        self.assertEqual(self.job2.status, "Claimed")
+        self.assertEqual(self.job2.claimed_by, "runner-1")
+
+    def test_each_pending_job_is_only_handed_out_once(self):
+        """Test that consecutive requests receive different jobs until the queue is empty."""
+        headers = {"HTTP_AUTHORIZATION": "Bearer myprivatekey"}
+        first = self.client.get(reverse("request_job"), **headers)
+        second = self.client.get(reverse("request_job"), **headers)
+        third = self.client.get(reverse("request_job"), **headers)
+        self.assertEqual(first.json()["id"], str(self.job2.id))
+        self.assertEqual(second.json()["id"], str(self.job3.id))
+        self.assertEqual(third.status_code, 404)
+
+    def test_invalid_wait_parameter(self):
+        """Test that 400 is returned if the long-poll wait parameter isn't a number."""
+        headers = {"HTTP_AUTHORIZATION": "Bearer myprivatekey"}
+        response = self.client.get(reverse("request_job"), {"wait": "abc"}, **headers)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["message"], "Invalid wait parameter.")
+
+    @patch("ssherlock_server.views.wait_for_pending_job", return_value=None)
+    def test_wait_parameter_is_capped(self, mock_wait):
+        """Test that the long-poll wait is capped at REQUEST_JOB_MAX_WAIT_SECONDS."""
+        headers = {"HTTP_AUTHORIZATION": "Bearer myprivatekey"}
+        with self.settings(REQUEST_JOB_MAX_WAIT_SECONDS=5):
+            response = self.client.get(
+                reverse("request_job"), {"wait": "600"}, **headers
+            )
+        self.assertEqual(response.status_code, 404)
+        mock_wait.assert_called_once_with("", 5)
+
     def test_no_pending_jobs(self):
         """Test that 404 is returned if no pending jobs are found."""
         Job.objects.all().delete()
@@ -944,9 +1021,22 @@ class TestUpdateJobStatus(TestCase):
             HTTP_AUTHORIZATION=f"Bearer {SSHERLOCK_SERVER_RUNNER_TOKEN}",
         )
         self.assertEqual(response.status_code, 200)
+        self.assertJSONEqual(response.content, {"status": "Completed"})
         self.job1.refresh_from_db()
         self.assertEqual(self.job1.status, "Completed")
 
+    @patch("ssherlock_server.views.schedule_job_log_compression")
+    def test_update_job_status_schedules_log_compression(self, mock_schedule):
+        """Test the job's log is compressed once the job finishes, and not before."""
+        for status in ("Running", "Completed"):
+            self.client.post(
+                self.url,
+                data=json.dumps({"status": status}),
+                content_type="application/json",
+                HTTP_AUTHORIZATION=f"Bearer {SSHERLOCK_SERVER_RUNNER_TOKEN}",
+            )
+        mock_schedule.assert_called_once_with(self.job1.id)
+
     def test_update_job_status_to_canceled_with_valid_key_and_status(self):
         """Test updating job status to Canceled with a valid key and status."""
         response = self.client.post(
@@ -1090,6 +1180,146 @@ class TestUpdateJobStatus(TestCase):
             timezone.now() - self.job2.stopped_at < timezone.timedelta(seconds=1)
         )
 
+    def test_update_job_status_to_completed_sets_duration(self):
+        """Test that finishing a job records how long it ran."""
+        Job.objects.filter(pk=self.job1.pk).update(
+            started_at=timezone.now() - timezone.timedelta(minutes=5)
+        )
+        self.client.post(
+            self.url,
+            data=json.dumps({"status": "Completed"}),
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"Bearer {SSHERLOCK_SERVER_RUNNER_TOKEN}",
+        )
+        self.job1.refresh_from_db()
+        self.assertAlmostEqual(self.job1.duration.total_seconds(), 300, delta=5)
+
+    def test_update_job_status_does_not_leave_terminal_status(self):
+        """Test that a runner can't overwrite a job the user canceled."""
+        Job.objects.filter(pk=self.job1.pk).update(status="Canceled")
+        response = self.client.post(
+            self.url,
+            data=json.dumps({"status": "Running"}),
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"Bearer {SSHERLOCK_SERVER_RUNNER_TOKEN}",
+        )
+        self.assertEqual(response.status_code, 409)
+        self.assertJSONEqual(
+            response.content.decode("utf-8"),
+            {"message": "Job is already Canceled.", "status": "Canceled"},
+        )
+        self.job1.refresh_from_db()
+        self.assertEqual(self.job1.status, "Canceled")
+
+    def test_update_job_status_uses_a_single_update(self):
+        """Test that the status change is one UPDATE that leaves other columns alone."""
+        with self.assertNumQueries(1) as queries:
+            self.client.post(
+                self.url2,
+                data=json.dumps({"status": "Running"}),
+                content_type="application/json",
+                HTTP_AUTHORIZATION=f"Bearer {SSHERLOCK_SERVER_RUNNER_TOKEN}",
+            )
+        self.assertTrue(queries.captured_queries[0]["sql"].startswith("UPDATE"))
+        self.assertNotIn("instructions", queries.captured_queries[0]["sql"])
+
+    def test_update_target_host_status(self):
+        """Test that passing a target host only updates the job's status on that host."""
+        response = self.client.post(
+            self.url,
+            data=json.dumps(
+                {"status": "Completed", "target_host": str(self.target_host.id)}
+            ),
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"Bearer {SSHERLOCK_SERVER_RUNNER_TOKEN}",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.job1.refresh_from_db()
+        self.assertEqual(self.job1.status, "Running")
+        host_status = JobTargetHostStatus.objects.get(
+            job=self.job1, target_host=self.target_host
+        )
+        self.assertEqual(host_status.status, "Completed")
+
+    def test_update_target_host_status_for_host_not_in_job(self):
+        """Test that a target host that isn't part of the job is rejected."""
+        other_host = TargetHost.objects.create(
+            hostname="other.example.com", user=self.user, port=22
+        )
+        response = self.client.post(
+            self.url,
+            data=json.dumps({"status": "Completed", "target_host": str(other_host.id)}),
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"Bearer {SSHERLOCK_SERVER_RUNNER_TOKEN}",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(JobTargetHostStatus.objects.exists())
+
+
+class TestRunnerClaims(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create(email="testuser@example.com")
+        self.job = Job.objects.create(user=self.user, instructions="Job instructions")
+
+    def runner_headers(self, runner_id):
+        return {
+            "HTTP_AUTHORIZATION": f"Bearer {SSHERLOCK_SERVER_RUNNER_TOKEN}",
+            "HTTP_X_RUNNER_ID": runner_id,
+        }
+
+    def post_status(self, runner_id, status):
+        return self.client.post(
+            reverse("update_job_status", args=[self.job.id]),
+            data=json.dumps({"status": status}),
+            content_type="application/json",
+            **self.runner_headers(runner_id),
+        )
+
+    def expire_claim(self):
+        Job.objects.filter(pk=self.job.pk).update(
+            claimed_at=timezone.now()
+            - timezone.timedelta(seconds=settings.JOB_CLAIM_LEASE_SECONDS + 1)
+        )
+
+    def test_job_reported_running_outlives_the_lease(self):
+        """Test a runner whose startup outlasts the lease keeps its job once it's Running."""
+        response = self.client.get(reverse("request_job"), **self.runner_headers("a"))
+        self.assertEqual(response.json()["id"], str(self.job.id))
+        self.assertEqual(self.post_status("a", "Running").status_code, 200)
+
+        self.expire_claim()
+        response = self.client.get(reverse("request_job"), **self.runner_headers("b"))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.post_status("a", "Completed").status_code, 200)
+
+    def test_runner_that_lost_its_claim_is_rejected(self):
+        """Test a runner can't update a job that was reclaimed after its lease expired."""
+        self.client.get(reverse("request_job"), **self.runner_headers("a"))
+        self.expire_claim()
+        response = self.client.get(reverse("request_job"), **self.runner_headers("b"))
+        self.assertEqual(response.json()["id"], str(self.job.id))
+
+        response = self.post_status("a", "Running")
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.json()["message"], "Job is claimed by another runner.")
+        for url, body in (
+            ("log_job_data", {"log": "stale"}),
+            ("log_job_data_batch", {"logs": ["stale"]}),
+        ):
+            response = self.client.post(
+                reverse(url, args=[self.job.id]),
+                data=json.dumps(body),
+                content_type="application/json",
+                **self.runner_headers("a"),
+            )
+            self.assertEqual(response.status_code, 403)
+
+        self.assertEqual(self.post_status("b", "Running").status_code, 200)
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, "Running")
+        self.assertEqual(self.job.claimed_by, "b")
+
 
 class TestGetJobStatus(TestCase):
     def setUp(self):
@@ -1299,6 +1529,15 @@ class TestCancelJob(TestCase):
         self.assertEqual(self.running_job.status, "Canceled")
         self.assertEqual(response.status_code, 302)
 
+    def test_cancel_running_job_records_stop_time(self):
+        """Test canceling a running job records when it stopped and how long it ran."""
+        self.client.login(username="testuser", password="password")
+        Job.objects.filter(pk=self.running_job.pk).update(started_at=timezone.now())
+        self.client.get(reverse("cancel_job", args=[self.running_job.pk]))
+        self.running_job.refresh_from_db()
+        self.assertIsNotNone(self.running_job.stopped_at)
+        self.assertIsNotNone(self.running_job.duration)
+
     def test_cancel_running_job_not_authenticated(self):
         """Test canceling a running job while not authenticated redirects to login page."""
         response = self.client.get(reverse("cancel_job", args=[self.running_job.pk]))
@@ -1342,115 +1581,6 @@ class TestCancelJob(TestCase):
         self.assertRedirects(response, "/job_list")
 
 
-class TestLogJobData(TestCase):
-    def setUp(self):
-        self.client = Client()
-        self.job_id = "f6e752d6-b065-4c49-9241-e4eefbc274e3"
-        self.valid_log_content = {"log": "This is a log entry."}
-        self.invalid_log_content = {"invalid_key": "No log here."}
-        self.url = reverse("log_job_data", args=[self.job_id])
-        self.valid_token = "Bearer myprivatekey"
-        self.invalid_token = "Bearer wrongprivatekey"
-
-        # Define expected log directory and file path
-        self.log_dir = os.path.join(
-            settings.BASE_DIR.parent,
-            "ssherlock_runner_job_logs",
-            self.job_id[0:2],
-            self.job_id[2:4],
-            self.job_id[4:6],
-        )
-        self.log_file_path = os.path.join(self.log_dir, f"{self.job_id[6:]}.log")
-
-    @patch("ssherlock_server.utils.check_private_key")
-    def test_valid_log_entry(self, mock_check_private_key):
-        mock_check_private_key.return_value = None
-
-        response = self.client.post(
-            self.url,
-            data=json.dumps(self.valid_log_content),
-            content_type="application/json",
-            HTTP_AUTHORIZATION=self.valid_token,
-        )
-
-        # Ensure the response is successful
-        self.assertEqual(response.status_code, 200)
-
-        # Check if the log directory exists
-        self.assertTrue(os.path.isdir(self.log_dir))
-
-        # Check if the log file exists and contains the correct data
-        self.assertTrue(os.path.isfile(self.log_file_path))
-        with open(self.log_file_path, "r", encoding="utf-8") as log_file:
-            content = log_file.read()
-            self.assertIn(self.valid_log_content["log"], content)
-
-    @patch("ssherlock_server.utils.check_private_key")
-    def test_missing_log_content(self, mock_check_private_key):
-        mock_check_private_key.return_value = None
-        response = self.client.post(
-            self.url,
-            data=json.dumps(self.invalid_log_content),
-            content_type="application/json",
-            HTTP_AUTHORIZATION=self.valid_token,
-        )
-        self.assertEqual(response.status_code, 400)
-        self.assertJSONEqual(response.content, {"message": "Log content not provided."})
-
-    @patch("ssherlock_server.utils.check_private_key")
-    def test_invalid_authorization(self, mock_check_private_key):
-        mock_check_private_key.return_value = JsonResponse(
-            {"message": "Authorization token incorrect."}, status=404
-        )
-        response = self.client.post(
-            self.url,
-            data=json.dumps(self.valid_log_content),
-            content_type="application/json",
-            HTTP_AUTHORIZATION=self.invalid_token,
-        )
-        self.assertEqual(response.status_code, 404)
-        self.assertJSONEqual(
-            response.content, {"message": "Authorization token incorrect."}
-        )
-
-    @patch("ssherlock_server.utils.check_private_key")
-    def test_no_authorization_header(self, mock_check_private_key):
-        mock_check_private_key.return_value = None
-        response = self.client.post(
-            self.url,
-            data=json.dumps(self.valid_log_content),
-            content_type="application/json",
-        )
-        self.assertEqual(response.status_code, 400)
-        self.assertJSONEqual(
-            response.content, {"message": "Authorization header not provided."}
-        )
-
-    @patch("ssherlock_server.utils.check_private_key")
-    def test_exception_handling(self, mock_check_private_key):
-        """Test exception handling in log job data."""
-        mock_check_private_key.return_value = None
-
-        with patch(
-            "ssherlock_server.views.open", side_effect=Exception("Test exception")
-        ):
-            response = self.client.post(
-                self.url,
-                data=json.dumps(self.valid_log_content),
-                content_type="application/json",
-                HTTP_AUTHORIZATION=self.valid_token,
-            )
-            self.assertEqual(response.status_code, 500)
-            self.assertJSONEqual(response.content, {"message": "Test exception"})
-
-    def tearDown(self):
-        # Clean up by removing the created log file and directories
-        if os.path.exists(self.log_file_path):
-            os.remove(self.log_file_path)
-        if os.path.exists(self.log_dir):
-            os.removedirs(self.log_dir)
-
-
 class TestViewJob(TestCase):
     """Tests for the view_job function."""
 
@@ -1507,104 +1637,6 @@ class TestViewJob(TestCase):
         self.assertEqual(response.status_code, 404)
 
 
-class TestStreamJobLog(TestCase):
-    def setUp(self):
-        self.user = User.objects.create_user(
-            "testuser", "testuser@example.com", "password"
-        )
-        self.client = Client()
-        self.job_id = "0d7420d5-f24b-4b8e-8e50-bb0a20575b54"
-
-    @patch(
-        "builtins.open", new_callable=mock_open, read_data="Log entry 1\nLog entry 2\n"
-    )
-    def test_stream_job_log_authenticated(self, _):
-        """Test streaming job log while authenticated."""
-        self.client.login(username="testuser", password="password")
-        with patch(
-            "builtins.open",
-            new_callable=mock_open,
-            read_data="Log entry 1\nLog entry 2\n",
-        ):
-            response = self.client.get(
-                reverse("stream_job_log", args=[self.job_id]), stream=True
-            )
-
-            # Collect a finite number of lines from the stream
-            content = []
-            for chunk in response.streaming_content:
-                content.append(chunk.decode("utf-8"))
-                if len(content) >= 2:  # Limit to two lines for the test
-                    break
-
-            combined_content = "".join(content)
-            self.assertIn("data: Log entry 1", combined_content)
-            self.assertIn("data: Log entry 2", combined_content)
-
-    def test_stream_job_log_not_authenticated(self):
-        """Test streaming job log while not authenticated redirects to login page."""
-        response = self.client.get(reverse("stream_job_log", args=[self.job_id]))
-        self.assertEqual(response.status_code, 302)
-        self.assertRedirects(
-            response, f"/accounts/login/?next=/view_job/{self.job_id}/log"
-        )
-
-    @patch("builtins.open", side_effect=FileNotFoundError)
-    def test_stream_job_log_file_not_found(self, _):
-        """Test streaming of job log when file does not exist."""
-        self.client.login(username="testuser", password="password")
-        response = self.client.get(
-            reverse("stream_job_log", args=[self.job_id]), stream=True
-        )
-
-        # Collect a finite number of lines from the stream
-        content = []
-        for chunk in response.streaming_content:
-            content.append(chunk.decode("utf-8"))
-            if "event: error" in chunk.decode("utf-8"):
-                break
-
-        combined_content = "".join(content)
-        self.assertIn("event: error", combined_content)
-        self.assertIn("data: Log file not found", combined_content)
-
-    @patch(
-        "builtins.open",
-        new_callable=mock_open,
-        read_data="Full log line 1\nFull log line 2\n",
-    )
-    def test_get_full_job_log_authenticated(self, _):
-        """Test fetching the full job log while authenticated."""
-        self.client.login(username="testuser", password="password")
-        with patch(
-            "builtins.open",
-            new_callable=mock_open,
-            read_data="Full log line 1\nFull log line 2\n",
-        ):
-            response = self.client.get(reverse("get_full_job_log", args=[self.job_id]))
-            self.assertEqual(response.status_code, 200)
-            self.assertEqual(
-                response.content.decode("utf-8"), "Full log line 1\nFull log line 2\n"
-            )
-
-    def test_get_full_job_log_not_authenticated(self):
-        """Test fetching the full job log while not authenticated redirects to login page."""
-        response = self.client.get(reverse("get_full_job_log", args=[self.job_id]))
-        self.assertEqual(response.status_code, 302)
-        self.assertRedirects(
-            response, f"/accounts/login/?next=/view_job/{self.job_id}/log/full"
-        )
-
-    @patch("builtins.open", side_effect=FileNotFoundError)
-    def test_get_full_job_log_file_not_found(self, _):
-        """Test fetching the full job log when the file does not exist returns empty body."""
-        self.client.login(username="testuser", password="password")
-        response = self.client.get(reverse("get_full_job_log", args=[self.job_id]))
-        self.assertEqual(response.status_code, 200)
-        # Body should be empty string when file not found
-        self.assertEqual(response.content.decode("utf-8"), "")
-
-
 class TestSignupView(TestCase):
     """Tests for the signup view."""
 
@@ -1,20 +1,37 @@
 """Main worker that runs jobs created by the SSHerlock server."""
 
-# pylint: disable=import-error
+# pylint: disable=import-error, too-many-lines
+import abc
+import argparse
+import functools
+import gzip
 import os
 import json
 import logging as log
+import queue
+import re
+import socket
+import threading
 import time
 
 import fabric
+import httpx
 import openai
 import requests
 import tiktoken
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import tempfile
 import stat
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Optional
 
 
+def env_flag(name: str, default: str) -> bool:
+    """Return whether the given environment variable turns a setting on."""
+    return os.getenv(name, default).strip().lower() in ("1", "true", "yes", "on")
+
+
 SSHERLOCK_SERVER_DOMAIN = os.getenv(
     "SSHERLOCK_SERVER_DOMAIN", "host.docker.internal:8000"
 )
@@ -22,37 +39,391 @@ SSHERLOCK_SERVER_PROTOCOL = os.getenv("SSHERLOCK_SERVER_PROTOCOL", "http")
 SSHERLOCK_SERVER_RUNNER_TOKEN = os.getenv(
     "SSHERLOCK_SERVER_RUNNER_TOKEN", "myprivatekey"
 )
+SSHERLOCK_RUNNER_ID = os.getenv("SSHERLOCK_RUNNER_ID", socket.gethostname())
 SSHERLOCK_RUNNER_MAX_ATTEMPTS = int(os.getenv("SSHERLOCK_RUNNER_MAX_ATTEMPTS", "3"))
+SSHERLOCK_RUNNER_CONCURRENCY = int(os.getenv("SSHERLOCK_RUNNER_CONCURRENCY", "1"))
+SSHERLOCK_RUNNER_MAX_HOSTS_PER_JOB = int(
+    os.getenv("SSHERLOCK_RUNNER_MAX_HOSTS_PER_JOB", "50")
+)
+SSHERLOCK_RUNNER_LONG_POLL_SECONDS = int(
+    os.getenv("SSHERLOCK_RUNNER_LONG_POLL_SECONDS", "30")
+)
 SSHERLOCK_RUNNER_LOG_LEVEL = os.getenv("SSHERLOCK_RUNNER_LOG_LEVEL", "DEBUG").upper()
+SSHERLOCK_SERVER_POOL_SIZE = int(os.getenv("SSHERLOCK_SERVER_POOL_SIZE", "20"))
+SSHERLOCK_SERVER_MAX_RETRIES = int(os.getenv("SSHERLOCK_SERVER_MAX_RETRIES", "3"))
+SSHERLOCK_RUNNER_LOG_BATCH_SIZE = int(os.getenv("SSHERLOCK_RUNNER_LOG_BATCH_SIZE", "100"))
+SSHERLOCK_RUNNER_LOG_FLUSH_INTERVAL_MS = int(
+    os.getenv("SSHERLOCK_RUNNER_LOG_FLUSH_INTERVAL_MS", "500")
+)
+SSHERLOCK_RUNNER_LOG_QUEUE_SIZE = int(
+    os.getenv("SSHERLOCK_RUNNER_LOG_QUEUE_SIZE", "10000")
+)
+SSHERLOCK_RUNNER_LOG_CLOSE_TIMEOUT_SECONDS = float(
+    os.getenv("SSHERLOCK_RUNNER_LOG_CLOSE_TIMEOUT_SECONDS", "30")
+)
+# Log batches at least this many bytes are sent gzip-compressed. 0 disables compression.
+SSHERLOCK_RUNNER_LOG_GZIP_MIN_BYTES = int(
+    os.getenv("SSHERLOCK_RUNNER_LOG_GZIP_MIN_BYTES", "1024")
+)
 SSHERLOCK_LLM_MODEL = os.getenv("SSHERLOCK_LLM_MODEL", "llama3.1")
 SSHERLOCK_TOKEN_ENCODING_MODEL = os.getenv("SSHERLOCK_TOKEN_ENCODING_MODEL", "gpt-4o")
+SSHERLOCK_LLM_TIMEOUT_SECONDS = float(os.getenv("SSHERLOCK_LLM_TIMEOUT_SECONDS", "600"))
+SSHERLOCK_LLM_CONNECT_TIMEOUT_SECONDS = float(
+    os.getenv("SSHERLOCK_LLM_CONNECT_TIMEOUT_SECONDS", "10")
+)
+SSHERLOCK_LLM_MAX_CONNECTIONS = int(os.getenv("SSHERLOCK_LLM_MAX_CONNECTIONS", "100"))
+SSHERLOCK_LLM_MAX_KEEPALIVE_CONNECTIONS = int(
+    os.getenv("SSHERLOCK_LLM_MAX_KEEPALIVE_CONNECTIONS", "20")
+)
+SSHERLOCK_LLM_KEEPALIVE_EXPIRY_SECONDS = float(
+    os.getenv("SSHERLOCK_LLM_KEEPALIVE_EXPIRY_SECONDS", "60")
+)
+# Whether the LLM's next command is streamed, so the reply can be cut off as soon as the
+# first command is complete instead of waiting for the model to stop on its own.
+SSHERLOCK_LLM_STREAM = env_flag("SSHERLOCK_LLM_STREAM", "true")
+# Whether conversation requests ask the LLM server to keep the prompt's KV cache for the
+# next turn: cache_prompt for llama.cpp, and a per-job session ID in the "user" field
+# for servers and routers that pin a session to one cache.
+SSHERLOCK_LLM_CACHE_HINTS = env_flag("SSHERLOCK_LLM_CACHE_HINTS", "false")
+
+# Number of tokens the LLM's context window holds. 0 means it's looked up from the LLM
+# API's model list, falling back to SSHERLOCK_LLM_DEFAULT_CONTEXT_SIZE if the API doesn't
+# say.
+SSHERLOCK_LLM_CONTEXT_SIZE = int(os.getenv("SSHERLOCK_LLM_CONTEXT_SIZE", "0"))
+# Context size assumed when the LLM API doesn't report one. The default is small enough
+# for any model SSHerlock is likely to run against, so compaction starts too early rather
+# than too late; raise it for APIs that serve models with bigger windows.
+SSHERLOCK_LLM_DEFAULT_CONTEXT_SIZE = int(
+    os.getenv("SSHERLOCK_LLM_DEFAULT_CONTEXT_SIZE", "8192")
+)
+# Fraction of the context window a conversation may fill before older turns are folded
+# into a summary.
+SSHERLOCK_RUNNER_CONTEXT_COMPACT_RATIO = float(
+    os.getenv("SSHERLOCK_RUNNER_CONTEXT_COMPACT_RATIO", "0.75")
+)
+# Number of most recent turns always kept verbatim when a conversation is compacted.
+SSHERLOCK_RUNNER_CONTEXT_KEEP_TURNS = int(
+    os.getenv("SSHERLOCK_RUNNER_CONTEXT_KEEP_TURNS", "5")
+)
+
+# Share of the LLM's context window a single command's output may use.
+SSHERLOCK_RUNNER_OUTPUT_CONTEXT_SHARE = float(
+    os.getenv("SSHERLOCK_RUNNER_OUTPUT_CONTEXT_SHARE", "0.1")
+)
+
+# Longest command output, in characters, passed to the LLM as is when the model's
+# context size is unknown.
+OUTPUT_MAX_CHARACTERS = 1000
+# Fewest tokens a command's output is allowed, however full the context window is.
+OUTPUT_MIN_TOKENS = 64
+# Outputs up to this many times their token allowance are truncated locally; longer ones
+# are summarized by the LLM.
+OUTPUT_TRUNCATE_RATIO = 2
+# Lines of a long command output always kept from its start and end when it's reduced.
+OUTPUT_HEAD_LINES = 10
+OUTPUT_TAIL_LINES = 20
+# Most lines that look like errors kept from the middle of a long command output.
+OUTPUT_MAX_ERROR_LINES = 20
+# Runs of at least this many similar lines (like a package manager's per-package lines)
+# are cut down to their first and last lines when a command output is reduced.
+OUTPUT_SIMILAR_RUN_LINES = 4
+# Terminal escape sequences, like colors and cursor movement.
+ANSI_ESCAPE_PATTERN = re.compile(
+    r"\x1b(?:\[[0-?]*[ -/]*[@-~]|\][^\x07\x1b]*(?:\x07|\x1b\\)|[@-Z\\-_])"
+)
+# Lines of command output that are kept however much of the output is dropped.
+ERROR_LINE_PATTERN = re.compile(
+    r"error|fail|fatal|denied|not found|no such|unable|cannot|can't|^E:|^W:",
+    re.IGNORECASE,
+)
+# Progress indicators, like "45%" or "[#####     ]".
+PROGRESS_LINE_PATTERN = re.compile(r"\d{1,3}(?:\.\d+)?%|\[[#=>.\- ]{5,}\]")
+
+# Statuses after which a job (or one of its target hosts) is no longer running.
+TERMINAL_JOB_STATUSES = ["Canceled", "Completed", "Context Exceeded", "Failed"]
+
+# Tracks which job (and target host) the current thread is working on, so concurrent jobs
+# only ship their own log records to the server.
+_job_context = threading.local()
+
+
+# IDs of jobs the server has reported as canceled. The server includes the job's status in
+# its replies to status updates and log batches, so jobs learn they were canceled without
+# polling the server on every turn. Jobs the server says another runner has claimed are
+# treated the same way.
+_canceled_jobs = set()
+_canceled_jobs_lock = threading.Lock()
+
+
+def record_job_status(job_id, response: requests.Response) -> None:
+    """Remember that a job was canceled if the server's response says so.
+
+    A 403 means this runner's claim on the job expired and another runner claimed it, so
+    this runner must stop working on it too.
+
+    Args:
+        job_id (str): The ID of the job the request was about.
+        response (requests.Response): The server's response.
+    """
+    if response.status_code == 403:
+        log.error("Job %s was claimed by another runner", job_id)
+        with _canceled_jobs_lock:
+            _canceled_jobs.add(str(job_id))
+        return
+    try:
+        status = response.json().get("status")
+    except Exception:
+        return
+    if status == "Canceled":
+        with _canceled_jobs_lock:
+            _canceled_jobs.add(str(job_id))
+
+
+def job_was_canceled(job_id) -> bool:
+    """Return whether the server has reported the job as canceled."""
+    with _canceled_jobs_lock:
+        return str(job_id) in _canceled_jobs
+
+
+def forget_job_status(job_id) -> None:
+    """Forget a finished job's reported cancellation."""
+    with _canceled_jobs_lock:
+        _canceled_jobs.discard(str(job_id))
+
+
+def set_job_context(job_id, target_host_hostname=None) -> None:
+    """Mark the current thread as working on the given job and target host."""
+    _job_context.job_id = job_id
+    _job_context.target_host_hostname = target_host_hostname
+
+
+def clear_job_context() -> None:
+    """Mark the current thread as no longer working on a job."""
+    _job_context.job_id = None
+    _job_context.target_host_hostname = None
+
+
+class ServerApiClient:
+    """Client for the SSHerlock server's runner API.
+
+    All runner-to-server calls go through one pooled requests.Session, so they reuse
+    keep-alive connections instead of opening a new one per call. The session is shared by
+    every thread in the runner. Failed connections, and idempotent requests that fail with
+    a 502/503/504, are retried with exponential backoff. Job claims are only retried when
+    the connection fails.
+    """
+
+    # The path runners claim jobs from.
+    CLAIM_JOB_PATH = "request_job"
+
+    def __init__(
+        self,
+        base_url: str,
+        token: str,
+        runner_id: str,
+        pool_size: int = 20,
+        max_retries: int = 3,
+    ):
+        """Initialize the session, its connection pool and retry policy.
+
+        Args:
+            base_url (str): The server's base URL, like "http://host.docker.internal:8000".
+            token (str): The runner token sent in the Authorization header.
+            runner_id (str): The identifier sent to the server in the X-Runner-Id header.
+            pool_size (int): Maximum number of connections kept open to the server.
+            max_retries (int): Maximum number of retries for a failed request.
+        """
+        self.base_url = base_url.rstrip("/")
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=0.5,
+            status_forcelist=(502, 503, 504),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=pool_size, max_retries=retry
+        )
+        # request_job is a GET, but it claims a job: if its response is lost, a retry would
+        # claim a second job. Only retry it when the connection couldn't be made, so the
+        # request never reached the server.
+        claim_retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=0,
+            status=0,
+            other=0,
+            backoff_factor=0.5,
+            raise_on_status=False,
+        )
+        claim_adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=pool_size, max_retries=claim_retry
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.mount(f"{self.base_url}/{self.CLAIM_JOB_PATH}", claim_adapter)
+        self.session.headers.update(
+            {
+                "Authorization": f"Bearer {token}",
+                "X-Runner-Id": runner_id,
+            }
+        )
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        """Send a GET request to the given server API path."""
+        return self.session.get(f"{self.base_url}/{path}", **kwargs)
+
+    def post(self, path: str, **kwargs) -> requests.Response:
+        """Send a POST request to the given server API path."""
+        return self.session.post(f"{self.base_url}/{path}", **kwargs)
+
+
+server_api = ServerApiClient(
+    f"{SSHERLOCK_SERVER_PROTOCOL}://{SSHERLOCK_SERVER_DOMAIN}",
+    SSHERLOCK_SERVER_RUNNER_TOKEN,
+    SSHERLOCK_RUNNER_ID,
+    pool_size=SSHERLOCK_SERVER_POOL_SIZE,
+    max_retries=SSHERLOCK_SERVER_MAX_RETRIES,
+)
 
 
 class HttpPostHandler(log.Handler):
-    """Custom logging handler to send logs to the SSHerlock server via HTTP POST."""
+    """Custom logging handler to send logs to the SSHerlock server via HTTP POST.
 
-    def __init__(self, job_id):
-        """Initialize the HttpPostHandler with a job ID."""
+    Only records logged by threads working on this handler's job are sent. emit() just
+    formats the record and puts it on a bounded in-memory queue, so logging doesn't slow
+    down the job. A background thread sends queued records to the server in batches of up
+    to batch_size records, at least every flush_interval seconds. If the server can't keep
+    up and the queue fills, new records are dropped and the number dropped is reported with
+    the next batch. close() sends everything still queued.
+
+    Each entry carries the time and level the record was logged with, so the server's log
+    reflects when things happened on the runner rather than when the batch arrived.
+    """
+
+    def __init__(
+        self,
+        job_id,
+        batch_size=None,
+        flush_interval=None,
+        queue_size=None,
+    ):
+        """Initialize the HttpPostHandler with a job ID and start its sender thread."""
         super().__init__()
         self.job_id = job_id
+        self.batch_size = batch_size or SSHERLOCK_RUNNER_LOG_BATCH_SIZE
+        self.flush_interval = (
+            flush_interval
+            if flush_interval is not None
+            else SSHERLOCK_RUNNER_LOG_FLUSH_INTERVAL_MS / 1000
+        )
+        self._queue = queue.Queue(maxsize=queue_size or SSHERLOCK_RUNNER_LOG_QUEUE_SIZE)
+        self._dropped = 0
+        self._dropped_lock = threading.Lock()
+        self._closing = threading.Event()
+        self._sender = threading.Thread(
+            target=self._send_loop, name=f"ssherlock_log_{job_id}", daemon=True
+        )
+        self._sender.start()
+
+    def filter(self, record):
+        """Drop records logged by threads that aren't working on this job."""
+        if getattr(_job_context, "job_id", None) != self.job_id:
+            return False
+        return super().filter(record)
 
     def emit(self, record):
-        """Emit a log record to the SSHerlock server."""
-        log_entry = self.format(record)
+        """Queue a log record to be sent to the SSHerlock server."""
+        try:
+            message = self.format(record)
+            # Prefix records from multi-host jobs with the host so they can be told apart.
+            target_host_hostname = getattr(_job_context, "target_host_hostname", None)
+            if target_host_hostname:
+                message = f"[{target_host_hostname}] {message}"
+            self._queue.put_nowait(
+                {
+                    "timestamp": record.created,
+                    "level": record.levelname,
+                    "message": message,
+                }
+            )
+        except queue.Full:
+            with self._dropped_lock:
+                self._dropped += 1
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        """Send any queued records, stop the sender thread and close the handler."""
+        self._closing.set()
+        # Wake the sender if it's waiting on an empty queue. A full queue needs no wakeup.
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+        self._sender.join(timeout=SSHERLOCK_RUNNER_LOG_CLOSE_TIMEOUT_SECONDS)
+        super().close()
+
+    def _next_batch(self) -> List[dict]:
+        """Wait for queued records and return up to batch_size of them."""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                if self._closing.is_set():
+                    entry = self._queue.get_nowait()
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    entry = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            # None is the wakeup close() queues; it isn't a log record.
+            if entry is not None:
+                batch.append(entry)
+        with self._dropped_lock:
+            dropped, self._dropped = self._dropped, 0
+        if dropped:
+            batch.append(
+                {
+                    "timestamp": time.time(),
+                    "level": "WARNING",
+                    "message": f"{dropped} log records were dropped by the runner.",
+                }
+            )
+        return batch
+
+    def _send_loop(self) -> None:
+        """Send batches of queued records until the handler is closed and drained."""
+        while True:
+            closing = self._closing.is_set()
+            batch = self._next_batch()
+            if batch:
+                self._send(batch)
+            elif closing:
+                return
+
+    def _send(self, batch: List[dict]) -> None:
+        """Send a batch of log entries to the SSHerlock server, gzipped if it's large."""
         try:
-            response = requests.post(
-                f"{SSHERLOCK_SERVER_PROTOCOL}://{SSHERLOCK_SERVER_DOMAIN}/log_job_data/{self.job_id}",
-                headers={
-                    "Authorization": f"Bearer {SSHERLOCK_SERVER_RUNNER_TOKEN}",
-                    "Content-Type": "application/json",
-                },
-                data=json.dumps({"log": log_entry}),
+            body = json.dumps({"logs": batch}).encode("utf-8")
+            headers = {"Content-Type": "application/json"}
+            if 0 < SSHERLOCK_RUNNER_LOG_GZIP_MIN_BYTES <= len(body):
+                body = gzip.compress(body)
+                headers["Content-Encoding"] = "gzip"
+            response = server_api.post(
+                f"log_job_data_batch/{self.job_id}",
+                data=body,
+                headers=headers,
                 timeout=10,
             )
             if response.status_code != 200:
-                print(f"Failed to send log entry: {response.content}")
+                print(f"Failed to send log entries: {response.content}")
+            else:
+                record_job_status(self.job_id, response)
         except Exception as e:
-            print(f"Error sending log entry: {e}")
+            print(f"Error sending log entries: {e}")
 
 
 log.basicConfig(
@@ -60,29 +431,122 @@ log.basicConfig(
     format="%(asctime)s %(levelname)s %(filename)s:%(funcName)s - %(message)s",
 )
 
+# One OpenAI client per (base_url, api_key), shared by every job in this process so
+# conversation turns reuse pooled keep-alive connections to the LLM API.
+_llm_clients = {}
+_llm_clients_lock = threading.Lock()
+
+
+def get_llm_client(base_url: str, api_key: str) -> openai.OpenAI:
+    """Return the shared OpenAI client for the given LLM API, creating it if needed.
+
+    The OpenAI client is thread-safe, so concurrent jobs share one connection pool.
+
+    Args:
+        base_url (str): The base URL of the LLM API.
+        api_key (str): The API key for the LLM API.
+
+    Returns:
+        openai.OpenAI: The client.
+    """
+    key = (base_url, api_key)
+    with _llm_clients_lock:
+        client = _llm_clients.get(key)
+        if client is None:
+            http_client = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=SSHERLOCK_LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=SSHERLOCK_LLM_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=SSHERLOCK_LLM_KEEPALIVE_EXPIRY_SECONDS,
+                ),
+                timeout=httpx.Timeout(
+                    SSHERLOCK_LLM_TIMEOUT_SECONDS,
+                    connect=SSHERLOCK_LLM_CONNECT_TIMEOUT_SECONDS,
+                ),
+            )
+            client = openai.OpenAI(
+                base_url=base_url,
+                api_key=api_key,
+                http_client=http_client,
+            )
+            _llm_clients[key] = client
+        return client
 
-def update_job_status(job_id, status):
+
+# Model metadata keys holding the context size, e.g. vLLM's max_model_len and llama.cpp's
+# n_ctx_train (under "meta").
+MODEL_CONTEXT_SIZE_KEYS = ("max_model_len", "context_length", "context_window", "n_ctx_train")
+
+
+@functools.lru_cache(maxsize=None)
+def _lookup_model_context_size(base_url: str, api_key: str, model_id: str) -> int:
+    """Return the context size the LLM API reports for a model, or raise LookupError."""
+    for model in get_llm_client(base_url, api_key).models.list():
+        metadata = model.model_dump()
+        metadata.update(metadata.get("meta") or {})
+        sizes = [metadata[name] for name in MODEL_CONTEXT_SIZE_KEYS if metadata.get(name)]
+        if model.id == model_id and sizes:
+            return int(sizes[0])
+    raise LookupError(f"the LLM API doesn't report the context size of {model_id}")
+
+
+def get_model_context_size(base_url: str, api_key: str) -> int:
+    """Return SSHERLOCK_LLM_CONTEXT_SIZE, or else the context size the LLM API reports.
+
+    Falls back to SSHERLOCK_LLM_DEFAULT_CONTEXT_SIZE, with a warning, if the API doesn't
+    report one.
+    """
+    if SSHERLOCK_LLM_CONTEXT_SIZE:
+        return SSHERLOCK_LLM_CONTEXT_SIZE
+    try:
+        return _lookup_model_context_size(base_url, api_key, SSHERLOCK_LLM_MODEL)
+    except Exception as e:
+        log.warning(
+            "Assuming a %s-token context, set by SSHERLOCK_LLM_DEFAULT_CONTEXT_SIZE: %s",
+            SSHERLOCK_LLM_DEFAULT_CONTEXT_SIZE,
+            e,
+        )
+        return SSHERLOCK_LLM_DEFAULT_CONTEXT_SIZE
+
+
+def close_llm_clients() -> None:
+    """Close and forget every shared LLM client."""
+    with _llm_clients_lock:
+        for client in _llm_clients.values():
+            try:
+                client.close()
+            except Exception:
+                pass
+        _llm_clients.clear()
+
+
+def update_job_status(job_id, status, target_host=None):
     """Update the status of a job via an API call.
 
     Args:
         job_id (str): The ID of the job.
         status (str): The new status of the job.
+        target_host (str, optional): The ID of a target host. If given, only the job's status
+                                     on that host is updated.
 
     Returns:
         None
     """
+    payload = {"status": status}
+    if target_host:
+        payload["target_host"] = target_host
     try:
         log.debug("Updating job %s status to %s", job_id, status)
-        response = requests.post(
-            f"{SSHERLOCK_SERVER_PROTOCOL}://{SSHERLOCK_SERVER_DOMAIN}/update_job_status/{job_id}",
-            headers={
-                "Authorization": f"Bearer {SSHERLOCK_SERVER_RUNNER_TOKEN}",
-                "Content-Type": "application/json",
-            },
-            data=json.dumps({"status": status}),
+        response = server_api.post(
+            f"update_job_status/{job_id}",
+            json=payload,
             timeout=10,
         )
-        if response.status_code != 200:
+        record_job_status(job_id, response)
+        if response.status_code == 409:
+            # The job already finished, e.g. because a user canceled it.
+            log.info("Job %s has already finished; not setting it to %s", job_id, status)
+        elif response.status_code != 200:
             log.error(
                 "Failed to update job %s status to %s. Status code: %d. Output: %s",
                 job_id,
@@ -94,9 +558,120 @@ def update_job_status(job_id, status):
         log.error("Error updating job status for job %s: %s", job_id, str(e))
 
 
+def build_runner(job_data, target_host=None):
+    """Create a Runner for the given job data.
+
+    Args:
+        job_data (dict): Dictionary containing job information including id, API base URL,
+                         instructions, target host details, and credentials.
+        target_host (dict, optional): One entry of job_data["target_hosts"]. If given, the
+                                      Runner targets this host and reports its status as a
+                                      per-host status. Otherwise the target_host_* keys are used.
+
+    Returns:
+        Runner: The configured runner.
+    """
+    if target_host is None:
+        target_host = {
+            "id": None,
+            "hostname": job_data.get("target_host_hostname"),
+            "port": job_data.get("target_host_port"),
+        }
+    # Map job response fields to Runner parameters using the names provided
+    # by Job.dict in ssherlock_server.models. Keep optional secret fields
+    # if the server included them, but expect the core keys below.
+    return Runner(
+        job_id=job_data["id"],
+        llm_api_base_url=job_data.get("llm_api_baseurl"),
+        initial_prompt=job_data.get("instructions"),
+        target_host_hostname=target_host.get("hostname"),
+        target_host_port=target_host.get("port"),
+        target_host_id=target_host.get("id"),
+        credentials_for_target_hosts_username=job_data.get(
+            "credentials_for_target_hosts_username"
+        ),
+        llm_api_api_key=job_data.get("llm_api_api_key"),
+        model_context_size=SSHERLOCK_LLM_CONTEXT_SIZE,
+        bastion_host_hostname=job_data.get("bastion_host_hostname", ""),
+        bastion_host_port=job_data.get("bastion_host_port"),
+        credentials_for_bastion_host_username=job_data.get(
+            "credentials_for_bastion_host_username", ""
+        ),
+        # Optional secrets that may be present in the response
+        credentials_for_target_hosts_password=job_data.get(
+            "credentials_for_target_hosts_password", ""
+        ),
+        credentials_for_target_hosts_private_key=job_data.get(
+            "credentials_for_target_hosts_private_key", ""
+        ),
+        credentials_for_bastion_host_password=job_data.get(
+            "credentials_for_bastion_host_password", ""
+        ),
+        credentials_for_bastion_host_private_key=job_data.get(
+            "credentials_for_bastion_host_private_key", ""
+        ),
+    )
+
+
+def rollup_job_status(statuses: List[Optional[str]]) -> str:
+    """Combine the final statuses of each target host into one status for the whole job.
+
+    Args:
+        statuses (list of str): The final status of the job on each target host.
+
+    Returns:
+        str: Completed if every host completed, otherwise the most significant failure.
+    """
+    if statuses and all(status == "Completed" for status in statuses):
+        return "Completed"
+    if "Canceled" in statuses:
+        return "Canceled"
+    if "Context Exceeded" in statuses:
+        return "Context Exceeded"
+    return "Failed"
+
+
+def run_job_on_target_hosts(job_data, target_hosts) -> None:
+    """Run a job against several target hosts in parallel, one conversation per host.
+
+    Each host reports its own status to the server. Once every host has finished, the
+    job's status is set from the combined host statuses.
+
+    Args:
+        job_data (dict): The job data received from the server.
+        target_hosts (list of dicts): The job's target hosts, from job_data["target_hosts"].
+    """
+    job_id = job_data["id"]
+    update_job_status(job_id, "Running")
+
+    def run_on_target_host(target_host):
+        set_job_context(job_id, target_host.get("hostname"))
+        runner = build_runner(job_data, target_host)
+        try:
+            runner.run()
+        except Exception as e:
+            log.error("Error running job on %s: %s", target_host.get("hostname"), e)
+            if runner.status not in TERMINAL_JOB_STATUSES:
+                runner.update_status("Failed")
+        finally:
+            clear_job_context()
+        return runner.status
+
+    max_workers = max(1, min(len(target_hosts), SSHERLOCK_RUNNER_MAX_HOSTS_PER_JOB))
+    with ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix=f"ssherlock_job_{job_id}"
+    ) as executor:
+        statuses = list(executor.map(run_on_target_host, target_hosts))
+
+    log.info("Job %s finished on %s target hosts", job_id, len(target_hosts))
+    update_job_status(job_id, rollup_job_status(statuses))
+
+
 def run_job(job_data):
     """Execute a job based on the provided job data.
 
+    Jobs with more than one target host are fanned out with run_job_on_target_hosts.
+
     Args:
         job_data (dict): Dictionary containing job information including id, API base URL,
                          instructions, target host details, and credentials.
@@ -108,63 +683,52 @@ def run_job(job_data):
 
     try:
         # Start sending log messages to the server when the job starts.
+        set_job_context(job_data["id"])
         log.getLogger().addHandler(http_post_handler)
 
         log.info("Running job: %s", job_data["id"])
-        # Map job response fields to Runner parameters using the names provided
-        # by Job.dict in ssherlock_server.models. Keep optional secret fields
-        # if the server included them, but expect the core keys below.
-        runner = Runner(
-            job_id=job_data["id"],
-            llm_api_base_url=job_data.get("llm_api_baseurl"),
-            initial_prompt=job_data.get("instructions"),
-            target_host_hostname=job_data.get("target_host_hostname"),
-            target_host_port=job_data.get("target_host_port"),
-            credentials_for_target_hosts_username=job_data.get(
-                "credentials_for_target_hosts_username"
-            ),
-            llm_api_api_key=job_data.get("llm_api_api_key"),
-            bastion_host_hostname=job_data.get("bastion_host_hostname", ""),
-            bastion_host_port=job_data.get("bastion_host_port"),
-            credentials_for_bastion_host_username=job_data.get(
-                "credentials_for_bastion_host_username", ""
-            ),
-            # Optional secrets that may be present in the response
-            credentials_for_target_hosts_password=job_data.get(
-                "credentials_for_target_hosts_password", ""
-            ),
-            credentials_for_target_hosts_private_key=job_data.get(
-                "credentials_for_target_hosts_private_key", ""
-            ),
-            credentials_for_bastion_host_password=job_data.get(
-                "credentials_for_bastion_host_password", ""
-            ),
-            credentials_for_bastion_host_private_key=job_data.get(
-                "credentials_for_bastion_host_private_key", ""
-            ),
-        )
-        runner.run()
+        target_hosts = job_data.get("target_hosts") or []
+        if len(target_hosts) > 1:
+            run_job_on_target_hosts(job_data, target_hosts)
+        else:
+            runner = build_runner(job_data)
+            # Report the job as Running before the runner's startup checks, which can take
+            # longer than the server's claim lease, so the job isn't handed to another runner.
+            runner.update_status("Running")
+            try:
+                runner.run()
+            except Exception:
+                if runner.status not in TERMINAL_JOB_STATUSES:
+                    runner.update_status("Failed")
+                raise
         log.info("Job %s completed", job_data["id"])
     except Exception as e:
         log.error("Error running job: %s", e)
     finally:
         try:
             log.getLogger().removeHandler(http_post_handler)
+            # Send any log records still queued before the job is considered finished.
+            http_post_handler.close()
         except Exception:
             pass
+        forget_job_status(job_data["id"])
+        clear_job_context()
 
 
 def request_job():
     """Fetch the next available job from the API.
 
+    The server holds the request open for up to SSHERLOCK_RUNNER_LONG_POLL_SECONDS until a
+    job becomes available, so new jobs are picked up as soon as they are created.
+
     Returns:
         dict: A dictionary containing job details if available, otherwise None.
     """
     try:
-        response = requests.get(
-            f"{SSHERLOCK_SERVER_PROTOCOL}://{SSHERLOCK_SERVER_DOMAIN}/request_job",
-            timeout=60,
-            headers={"Authorization": f"Bearer {SSHERLOCK_SERVER_RUNNER_TOKEN}"},
+        response = server_api.get(
+            ServerApiClient.CLAIM_JOB_PATH,
+            params={"wait": SSHERLOCK_RUNNER_LONG_POLL_SECONDS},
+            timeout=SSHERLOCK_RUNNER_LONG_POLL_SECONDS + 30,
         )
         if response.status_code == 200:
             # Parse JSON once so we can optionally log the full response when debug is enabled.
@@ -248,19 +812,33 @@ class Runner:  # pylint: disable=too-many-arguments
         credentials_for_target_hosts_private_key="",
         credentials_for_target_hosts_sudo_password="",
         target_host_port=None,
+        target_host_id=None,
         bastion_host_hostname="",
         credentials_for_bastion_host_username="",
         credentials_for_bastion_host_password="",
         credentials_for_bastion_host_private_key="",
         bastion_host_port=None,
+        context_strategy=None,
     ):
         """Initialize main runner configuration."""
         self.job_id = job_id
         self.log_level = log_level
         self.initial_prompt = initial_prompt
         self.model_context_size = model_context_size
+        # Keeps the conversation within the LLM's context window.
+        self.context_strategy = context_strategy or SlidingWindowContext(
+            model_context_size
+        )
         self.target_host_hostname = target_host_hostname
         self.target_host_port = target_host_port
+        # Set when this runner handles one host of a multi-host job.
+        self.target_host_id = target_host_id
+        # Identifies this runner's conversation to the LLM server for prompt caching.
+        self.llm_session_id = f"ssherlock-{job_id}" + (
+            f"-{target_host_id}" if target_host_id else ""
+        )
+        # The last status this runner reported for the job.
+        self.status = None
         self.credentials_for_target_hosts_username = (
             credentials_for_target_hosts_username
         )
@@ -286,6 +864,8 @@ class Runner:  # pylint: disable=too-many-arguments
         )
         # Track any temp key files we create so we can remove them.
         self._temp_key_paths: List[str] = []
+        # Timings of each streamed LLM reply, in the order they were received.
+        self.llm_turn_metrics: List[dict] = []
         self.llm_api_base_url = llm_api_base_url
         self.llm_api_api_key = llm_api_api_key
         self.shell_environment = (
@@ -316,6 +896,28 @@ class Runner:  # pylint: disable=too-many-arguments
             "3. Don't be verbose."
             "4. Don't summarize over multiple lines."
         )
+        self.system_prompt_summarize_turns = (
+            "You are a helpful AI assistant that summarizes the progress of a system"
+            " administration task."
+            "You are given the commands that have been run so far and their output."
+            "Summarize what has been done and what was learned, and NOTHING ELSE!"
+            "You must follow these rules:"
+            "1. Be brief."
+            "2. Keep details needed to continue the task, like paths, package names and errors."
+            "3. Don't repeat the commands' full output."
+        )
+
+    def update_status(self, status: str) -> None:
+        """Report the job's status, scoped to this runner's target host if it has one.
+
+        Args:
+            status (str): The new status of the job.
+        """
+        self.status = status
+        if self.target_host_id:
+            update_job_status(self.job_id, status, target_host=self.target_host_id)
+        else:
+            update_job_status(self.job_id, status)
 
     def initialize(self) -> None:
         """Run general setup and safety checks."""
@@ -323,8 +925,17 @@ class Runner:  # pylint: disable=too-many-arguments
             log.critical("Can't reach target server!")
             raise RuntimeError
         self.wait_for_llm_to_become_available()
+        if not self.model_context_size:
+            self.model_context_size = get_model_context_size(
+                self.llm_api_base_url, self.llm_api_api_key
+            )
+            if (
+                isinstance(self.context_strategy, SlidingWindowContext)
+                and not self.context_strategy.context_size
+            ):
+                self.context_strategy.context_size = self.model_context_size
 
-    def query_llm(self, prompt) -> str:
+    def query_llm(self, prompt, first_command=False) -> str:
         """Send a prompt to an LLM API and return its reply.
 
         LLM API must be OpenAI-compatible.
@@ -334,6 +945,11 @@ class Runner:  # pylint: disable=too-many-arguments
             prompt (list of dicts): The LLM prompt, including system prompt. Previous responses
                                     from the LLM can also be added as context for new replies in
                                     order to mimic a conversation. See example below.
+            first_command (bool): Only the first command in the reply is wanted. If streaming
+                                  is enabled, the reply is streamed and cut off as soon as its
+                                  first command is complete. The prompt is taken to be
+                                  the job's conversation, so prompt caching hints are
+                                  sent too.
 
         Example:
             prompt = [
@@ -346,20 +962,106 @@ class Runner:  # pylint: disable=too-many-arguments
         Returns:
             str: LLM's response.
         """
-        client = openai.OpenAI(
-            base_url=self.llm_api_base_url,
-            api_key=self.llm_api_api_key,
-        )
+        client = get_llm_client(self.llm_api_base_url, self.llm_api_api_key)
+
+        if first_command and SSHERLOCK_LLM_STREAM:
+            return self.stream_first_command(client, prompt)
 
         llm_reply = client.chat.completions.create(
             model=SSHERLOCK_LLM_MODEL,
             messages=prompt,
+            **(self.llm_cache_options() if first_command else {}),
         )
 
         response_string = llm_reply.choices[0].message.content
         response_string_stripped = strip_eot_from_string(response_string)
         return response_string_stripped
 
+    def llm_cache_options(self) -> dict:
+        """Return the prompt caching hints to send with the conversation's requests.
+
+        Only conversation requests carry the hints; summaries are one-off prompts that
+        don't share the conversation's prefix, so caching them would only evict it.
+
+        Returns:
+            dict: Extra arguments for chat.completions.create(), empty unless
+                SSHERLOCK_LLM_CACHE_HINTS is set.
+        """
+        if not SSHERLOCK_LLM_CACHE_HINTS:
+            return {}
+        return {
+            "user": self.llm_session_id,
+            "extra_body": {"cache_prompt": True},
+        }
+
+    def stream_first_command(self, client: openai.OpenAI, prompt) -> str:
+        """Stream a reply from the LLM and return its first command.
+
+        The stream is closed as soon as the first command line (or DONE) is complete, so
+        the runner doesn't wait for anything the model adds after it, and the server
+        stops generating it. The time to the first token and the rate tokens arrived at are
+        logged and added to llm_turn_metrics.
+
+        Args:
+            client (openai.OpenAI): The client for the LLM API.
+            prompt (list of dicts): The LLM prompt. See query_llm().
+
+        Returns:
+            str: The first command in the LLM's reply.
+        """
+        start = time.monotonic()
+        first_token_at = None
+        chunks = 0
+        reply = ""
+        command = None
+        stream = client.chat.completions.create(
+            model=SSHERLOCK_LLM_MODEL,
+            messages=prompt,
+            stream=True,
+            **self.llm_cache_options(),
+        )
+        try:
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                content = chunk.choices[0].delta.content
+                if not content:
+                    continue
+                if first_token_at is None:
+                    first_token_at = time.monotonic()
+                # OpenAI-compatible servers send one token per chunk.
+                chunks += 1
+                reply += content
+                command = first_command_in_reply(reply)
+                if command is not None:
+                    break
+        finally:
+            stream.close()
+        end = time.monotonic()
+
+        if command is None:
+            # The model stopped before finishing a line; use whatever it sent.
+            command = first_command_in_reply(reply + "\n") or reply.strip()
+        metrics = {
+            "time_to_first_token": (first_token_at or end) - start,
+            "tokens": chunks,
+            "tokens_per_second": (
+                chunks / (end - first_token_at)
+                if first_token_at is not None and end > first_token_at
+                else 0.0
+            ),
+            "total_time": end - start,
+        }
+        self.llm_turn_metrics.append(metrics)
+        log.info(
+            "LLM replied in %.2fs: first token after %.2fs, %s tokens at %.1f tokens/s",
+            metrics["total_time"],
+            metrics["time_to_first_token"],
+            metrics["tokens"],
+            metrics["tokens_per_second"],
+        )
+        return strip_eot_from_string(command)
+
     def can_llm_be_reached(self) -> bool:
         """Check if the LLM API can be reached with a quick prompt.
 
@@ -401,7 +1103,7 @@ class Runner:  # pylint: disable=too-many-arguments
             return True
         except Exception as e:
             log.error("Failed to reach the target server: %s", str(e))
-            update_job_status(self.job_id, "Failed")
+            self.update_status("Failed")
             return False
 
     def wait_for_llm_to_become_available(self) -> None:
@@ -417,7 +1119,7 @@ class Runner:  # pylint: disable=too-many-arguments
                 time.sleep(10)
             else:
                 return
-        update_job_status(self.job_id, "Failed")
+        self.update_status("Failed")
         raise RuntimeError("Timed out waiting for LLM server to become available!")
 
     def summarize_string(self, string: str) -> str:
@@ -446,6 +1148,27 @@ class Runner:  # pylint: disable=too-many-arguments
         log.warning("SSH reply was summarized to: %s", llm_summarization)
         return llm_summarization
 
+    def summarize_turns(self, turns: str) -> str:
+        """Summarize earlier turns of the conversation with the LLM API.
+
+        Args:
+            turns (str): The earlier commands and their output.
+
+        Returns:
+            str: The summary.
+        """
+        prompt = [
+            {
+                "role": "system",
+                "content": self.system_prompt_summarize_turns,
+            },
+            {
+                "role": "user",
+                "content": turns,
+            },
+        ]
+        return self.query_llm(prompt=prompt)
+
     def context_size_warning_check(self, messages, threshold=0.85) -> bool:
         """Print a warning if we're about to exceed the context size of the model.
 
@@ -512,44 +1235,40 @@ class Runner:  # pylint: disable=too-many-arguments
             return output
         except Exception as e:
             log.error("SSH command failed: %s", e)
-            update_job_status(self.job_id, "Failed")
+            self.update_status("Failed")
             raise
 
     def is_job_canceled(self) -> bool:
-        """Call the SSHerlock server API to get the current status of the job.
+        """Check whether the server has reported the job as canceled.
+
+        No request is made; the job's status arrives with the responses to the status
+        updates and log batches the runner already sends.
 
         Returns:
             bool: True if the job is canceled, False otherwise.
         """
-        try:
-            response = requests.get(
-                f"{SSHERLOCK_SERVER_PROTOCOL}://{SSHERLOCK_SERVER_DOMAIN}/job_status",
-                headers={"Authorization": f"Bearer {SSHERLOCK_SERVER_RUNNER_TOKEN}"},
-                timeout=5,
-            )
-            response.raise_for_status()
-            status = response.json().get("status")
-            if status == "Canceled":
-                return True
-            return False
-        except requests.RequestException as e:
-            log.error("Error checking job status: %s", str(e))
-            return False
+        return job_was_canceled(self.job_id)
 
     def initialize_messages(self) -> list:
         """Initialize the messages list with the system and user prompts.
 
+        Nothing specific to the turn (like the time or the tokens used so far) goes
+        into these messages, so every prompt of the job starts with the same bytes and
+        the LLM server can reuse its prompt cache from one turn to the next.
+
         Args:
             system_prompt (str): The system's prompt.
             initial_prompt (str): The initial user's prompt.
 
         Returns:
-            list: Initialized messages list.
+            Conversation: Initialized messages list.
         """
-        return [
-            {"role": "system", "content": self.system_prompt},
-            {"role": "user", "content": self.initial_prompt},
-        ]
+        return Conversation(
+            [
+                {"role": "system", "content": self.system_prompt},
+                {"role": "user", "content": self.initial_prompt},
+            ]
+        )
 
     def setup_ssh_connection_params(self) -> dict:
         """Prepare SSH connection parameters based on the configuration.
@@ -618,31 +1337,61 @@ class Runner:  # pylint: disable=too-many-arguments
             connect_kwargs=connect_args,
             gateway=gateway,
         ) as ssh:
-            update_job_status(self.job_id, "Running")
+            self.update_status("Running")
             while True:
-                llm_reply = self.query_llm(messages)
+                llm_reply = self.query_llm(messages, first_command=True)
                 log.warning("LLM reply was: %s", llm_reply)
 
                 if is_llm_done(llm_reply):
                     log.critical("All done!")
-                    update_job_status(self.job_id, "Completed")
+                    self.update_status("Completed")
                     return
 
                 if self.is_job_canceled():
                     log.critical("Job canceled!")
-                    update_job_status(self.job_id, "Canceled")
+                    self.update_status("Canceled")
                     return
 
-                ssh_reply = self.handle_ssh_command(ssh, llm_reply)
+                ssh_reply = self.handle_ssh_command(ssh, llm_reply, messages)
                 update_conversation(messages, llm_reply, ssh_reply)
                 self.context_size_warning_check(messages)
+                if not self.context_strategy.fit(messages, self.summarize_turns):
+                    log.critical("Conversation no longer fits in the model's context!")
+                    self.update_status("Context Exceeded")
+                    return
+
+    def output_token_allowance(self, messages) -> int:
+        """Return how many tokens the next command's output may use.
 
-    def handle_ssh_command(self, ssh: fabric.Connection, llm_reply: str) -> str:
+        The allowance is SSHERLOCK_RUNNER_OUTPUT_CONTEXT_SHARE of the model's context
+        window, or whatever's left of the window if that's less, but never less than
+        OUTPUT_MIN_TOKENS.
+
+        Args:
+            messages (list of dicts): The conversation so far.
+
+        Returns:
+            int: The number of tokens.
+        """
+        share = int(SSHERLOCK_RUNNER_OUTPUT_CONTEXT_SHARE * self.model_context_size)
+        remaining = self.model_context_size - count_tokens(messages)
+        return max(min(share, remaining), OUTPUT_MIN_TOKENS)
+
+    def handle_ssh_command(
+        self, ssh: fabric.Connection, llm_reply: str, messages=None
+    ) -> str:
         """Send the LLM reply to the server via SSH and get the server's response.
 
+        The response is reduced locally first. If the model's context size is known, a
+        response still over its token allowance is truncated locally when it's only a
+        little over, and summarized by the LLM otherwise. If it isn't known, responses
+        longer than OUTPUT_MAX_CHARACTERS are summarized.
+
         Args:
             ssh (fabric.Connection): The active SSH connection.
             llm_reply (str): The reply from the LLM.
+            messages (list of dicts): The conversation so far, which the response's
+                token allowance depends on.
 
         Returns:
             str: The server's response.
@@ -650,10 +1399,45 @@ class Runner:  # pylint: disable=too-many-arguments
         ssh_reply = self.run_ssh_cmd(connection=ssh, command=llm_reply)
         log.warning("SSH reply was: %s", ssh_reply)
 
-        if is_string_too_long(ssh_reply):
+        if not self.model_context_size:
+            ssh_reply = self.reduce_ssh_reply(ssh_reply, OUTPUT_MAX_CHARACTERS, len)
+            if is_string_too_long(ssh_reply, OUTPUT_MAX_CHARACTERS):
+                ssh_reply = self.summarize_string(ssh_reply)
+            return ssh_reply
+
+        allowance = self.output_token_allowance(messages or [])
+        ssh_reply = self.reduce_ssh_reply(ssh_reply, allowance, count_message_tokens)
+        num_tokens = count_message_tokens(ssh_reply)
+        if num_tokens <= allowance:
+            return ssh_reply
+        if num_tokens > OUTPUT_TRUNCATE_RATIO * allowance:
             ssh_reply = self.summarize_string(ssh_reply)
+        else:
+            log.info(
+                "SSH reply was truncated from %s to %s tokens", num_tokens, allowance
+            )
+        # A summary can still be over the allowance.
+        return truncate_to_tokens(ssh_reply, allowance)
 
-        return ssh_reply
+    def reduce_ssh_reply(self, ssh_reply: str, threshold: int, count) -> str:
+        """Reduce an SSH reply locally and log how much it was reduced by.
+
+        Args:
+            ssh_reply (str): The SSH reply.
+            threshold (int): The size the reply should be reduced to.
+            count (callable): Measures the reply's size in the same units as threshold.
+
+        Returns:
+            str: The reduced reply.
+        """
+        reduced_reply = reduce_output(ssh_reply, threshold, count)
+        if len(reduced_reply) < len(ssh_reply):
+            log.info(
+                "SSH reply was reduced from %s to %s characters",
+                len(ssh_reply),
+                len(reduced_reply),
+            )
+        return reduced_reply
 
     def run(self):
         """Initialize and run the job."""
@@ -693,6 +1477,29 @@ def strip_eot_from_string(string: str) -> str:
     return string
 
 
+def first_command_in_reply(reply: str) -> Optional[str]:
+    """Return the first command in a partial LLM reply, once its line is complete.
+
+    Blank lines and Markdown code fences around the command are skipped. A reply that
+    starts with DONE is complete as soon as anything but a word character follows it, so
+    a model that explains itself after DONE isn't waited for.
+
+    Args:
+        reply (str): The reply received from the LLM so far.
+
+    Returns:
+        str: The first command, or None if no complete command line has arrived yet.
+    """
+    if re.match(r"\s*DONE\W", reply):
+        return "DONE"
+    *complete_lines, _ = reply.split("\n")
+    for line in complete_lines:
+        line = line.strip()
+        if line and not line.startswith("```"):
+            return line
+    return None
+
+
 def is_string_too_long(string: str, threshold: int = 1000) -> bool:
     """Determine if the given string is longer than a certain threshold.
 
@@ -711,11 +1518,370 @@ def is_string_too_long(string: str, threshold: int = 1000) -> bool:
     return False
 
 
+def clean_output_lines(output: str) -> List[str]:
+    """Split command output into lines as they'd appear on a terminal.
+
+    Terminal escape sequences and trailing whitespace are removed, and only the text
+    after the last carriage return of each line is kept, so a progress bar redrawn in
+    place leaves just its final state.
+
+    Args:
+        output (str): The command output.
+
+    Returns:
+        list of str: The output's lines.
+    """
+    output = ANSI_ESCAPE_PATTERN.sub("", output)
+    lines = []
+    for line in output.split("\n"):
+        redraws = [part for part in line.split("\r") if part.strip()]
+        lines.append(redraws[-1].rstrip() if redraws else "")
+    return lines
+
+
+def collapse_repeated_lines(lines: List[str]) -> List[str]:
+    """Replace each run of identical lines with the line and a count of its repeats.
+
+    Args:
+        lines (list of str): The lines of command output.
+
+    Returns:
+        list of str: The lines with repeats collapsed.
+    """
+    collapsed = []
+    i = 0
+    while i < len(lines):
+        j = i + 1
+        while j < len(lines) and lines[j] == lines[i]:
+            j += 1
+        collapsed.append(lines[i])
+        if j - i > 1 and lines[i]:
+            collapsed.append(f"[previous line repeated {j - i - 1} more times]")
+        i = j
+    return collapsed
+
+
+def line_kind(line: str) -> str:
+    """Return what kind of line of command output the given line is.
+
+    Lines showing progress are all the same kind. Otherwise a line's kind is its first
+    word with any digits removed, so "Get:1 ..." and "Get:2 ..." or "Unpacking a ..."
+    and "Unpacking b ..." are alike.
+    """
+    if PROGRESS_LINE_PATTERN.search(line):
+        return "progress"
+    words = line.split(maxsplit=1)
+    if not words:
+        return ""
+    return re.sub(r"\d+", "", words[0])
+
+
+def collapse_similar_runs(lines: List[str]) -> List[str]:
+    """Cut runs of similar lines, like package lists and progress, down to their ends.
+
+    Lines that look like errors are kept wherever they are in a run.
+
+    Args:
+        lines (list of str): The lines of command output.
+
+    Returns:
+        list of str: The lines with long runs of similar lines collapsed.
+    """
+    collapsed = []
+    i = 0
+    while i < len(lines):
+        kind = line_kind(lines[i])
+        j = i + 1
+        while j < len(lines) and kind and line_kind(lines[j]) == kind:
+            j += 1
+        run = lines[i:j]
+        if len(run) < OUTPUT_SIMILAR_RUN_LINES:
+            collapsed.extend(run)
+        elif kind == "progress":
+            collapsed.append(run[-1])
+        else:
+            middle = run[1:-1]
+            errors = [line for line in middle if ERROR_LINE_PATTERN.search(line)]
+            collapsed.append(run[0])
+            collapsed.extend(errors)
+            collapsed.append(f"[{len(middle) - len(errors)} similar lines omitted]")
+            collapsed.append(run[-1])
+        i = j
+    return collapsed
+
+
+def keep_head_tail_and_errors(lines: List[str]) -> List[str]:
+    """Keep the first and last lines of command output and any errors in between.
+
+    Args:
+        lines (list of str): The lines of command output.
+
+    Returns:
+        list of str: The kept lines, with a note where lines were omitted.
+    """
+    if len(lines) <= OUTPUT_HEAD_LINES + OUTPUT_TAIL_LINES:
+        return lines
+    middle = lines[OUTPUT_HEAD_LINES:-OUTPUT_TAIL_LINES]
+    errors = [line for line in middle if ERROR_LINE_PATTERN.search(line)]
+    errors = errors[:OUTPUT_MAX_ERROR_LINES]
+    return (
+        lines[:OUTPUT_HEAD_LINES]
+        + [f"[{len(middle) - len(errors)} lines omitted]"]
+        + errors
+        + lines[-OUTPUT_TAIL_LINES:]
+    )
+
+
+def reduce_output(
+    output: str, threshold: int = OUTPUT_MAX_CHARACTERS, count=len
+) -> str:
+    """Shrink command output locally, so fewer outputs need summarizing by the LLM.
+
+    Escape sequences, redrawn progress bars and repeated lines are always removed. If
+    the output is still bigger than the threshold, runs of similar lines are cut down
+    and then only its first and last lines and any errors are kept. The steps are
+    deterministic, so the same output is always reduced the same way.
+
+    Args:
+        output (str): The command output.
+        threshold (int): The size the output should be reduced to.
+        count (callable): Measures the output's size in the same units as threshold,
+            like count_message_tokens. Default is len, which counts characters.
+
+    Returns:
+        str: The reduced output. It can still be bigger than the threshold.
+    """
+    lines = collapse_repeated_lines(clean_output_lines(output))
+    reduced = "\n".join(lines).strip("\n")
+    if count(reduced) <= threshold:
+        return reduced
+    lines = collapse_similar_runs(lines)
+    reduced = "\n".join(lines).strip("\n")
+    if count(reduced) <= threshold:
+        return reduced
+    return "\n".join(keep_head_tail_and_errors(lines)).strip("\n")
+
+
+def truncate_to_tokens(string: str, max_tokens: int) -> str:
+    """Cut the middle out of a string so it has at most about max_tokens tokens.
+
+    More is kept from the end than the start, since that's where commands report how
+    they went.
+
+    Args:
+        string (str): The string to truncate.
+        max_tokens (int): The number of tokens to keep.
+
+    Returns:
+        str: The string, with a note where tokens were omitted.
+    """
+    encoding = get_token_encoding()
+    tokens = encoding.encode_ordinary(string)
+    if len(tokens) <= max_tokens:
+        return string
+    head = max_tokens // 3
+    tail = max_tokens - head
+    return (
+        encoding.decode(tokens[:head])
+        + f"\n[{len(tokens) - max_tokens} tokens omitted]\n"
+        + encoding.decode(tokens[-tail:])
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def get_token_encoding(model: str = SSHERLOCK_TOKEN_ENCODING_MODEL) -> tiktoken.Encoding:
+    """Return the tiktoken encoding for the given model, loading it once per process.
+
+    Encodings are thread-safe, so every job shares them.
+    """
+    return tiktoken.encoding_for_model(model)
+
+
+def count_message_tokens(content: str) -> int:
+    """Count the number of LLM tokens in a single message's content."""
+    return len(get_token_encoding().encode_ordinary(content))
+
+
+class Conversation(list):
+    """The messages of a conversation with the LLM, with a running count of their tokens.
+
+    Each message's tokens are counted once, the first time the count is needed after it's
+    added, so checking the size of the conversation after every turn only encodes the new
+    messages however long the conversation gets. A Conversation is a list of message
+    dicts, so it can be passed to the LLM API as is. Messages must be added and removed
+    with append, extend, pop or del to keep the count.
+    """
+
+    def __init__(self, messages=()):
+        """Initialize the conversation with the given messages."""
+        super().__init__(messages)
+        # Token counts of the first len(_token_counts) messages; the rest aren't counted yet.
+        self._token_counts: List[int] = []
+        self._token_total = 0
+
+    @property
+    def token_count(self) -> int:
+        """The number of tokens in the content of all of the conversation's messages."""
+        counted = len(self._token_counts)
+        for message in self[counted:]:
+            token_count = count_message_tokens(message["content"])
+            self._token_counts.append(token_count)
+            self._token_total += token_count
+        return self._token_total
+
+    def pop(self, index: int = -1) -> dict:
+        """Remove and return the message at the given index."""
+        index = range(len(self))[index]
+        if index < len(self._token_counts):
+            self._token_total -= self._token_counts.pop(index)
+        return super().pop(index)
+
+    def insert(self, index: int, message: dict) -> None:
+        """Insert a message before the given index."""
+        # Normalize the index the way list.insert does.
+        if index < 0:
+            index = max(len(self) + index, 0)
+        index = min(index, len(self))
+        if index < len(self._token_counts):
+            token_count = count_message_tokens(message["content"])
+            self._token_counts.insert(index, token_count)
+            self._token_total += token_count
+        super().insert(index, message)
+
+    def __delitem__(self, index) -> None:
+        """Remove the message or slice of messages at the given index."""
+        indexes = range(len(self))[index]
+        if isinstance(indexes, int):
+            indexes = [indexes]
+        for i in sorted(indexes, reverse=True):
+            self.pop(i)
+
+
+class ContextStrategy(abc.ABC):
+    """Keeps a Runner's conversation within the LLM's context window.
+
+    Subclasses implement fit(), which the Runner calls after every turn.
+    """
+
+    @abc.abstractmethod
+    def fit(self, conversation: Conversation, summarize) -> bool:
+        """Shrink the conversation if needed so the next prompt fits the context window.
+
+        Args:
+            conversation (Conversation): The conversation, changed in place.
+            summarize (callable): Takes text and returns an LLM-written summary of it.
+
+        Returns:
+            bool: True if the conversation fits, False if it can't be made to fit.
+        """
+
+
+class UnboundedContext(ContextStrategy):
+    """Never shrinks the conversation."""
+
+    def fit(self, conversation: Conversation, summarize) -> bool:
+        """Leave the conversation as it is."""
+        return True
+
+
+class SlidingWindowContext(ContextStrategy):
+    """Folds older turns into a rolling summary once the conversation gets too big.
+
+    The first pinned_messages messages (the system prompt and the task) are always kept,
+    as are the last keep_turns turns. Once the conversation passes compact_ratio of the
+    context window, the turns in between are summarized by the LLM, together with any
+    earlier summary, into a single message that follows the pinned ones. The prompt
+    therefore stays bounded however long the job runs.
+
+    Between compactions the conversation is only appended to, so each prompt starts with
+    the previous one and the LLM server can reuse its KV cache for everything but the
+    newest turn. Compactions are the only points where that prefix changes.
+    """
+
+    # Messages added to the conversation per turn: the LLM's command and its output.
+    MESSAGES_PER_TURN = 2
+
+    def __init__(
+        self,
+        context_size: int,
+        keep_turns: int = None,
+        compact_ratio: float = None,
+        pinned_messages: int = 2,
+    ):
+        """Initialize the strategy.
+
+        Args:
+            context_size (int): Number of tokens the LLM's context window holds. 0 disables
+                compaction.
+            keep_turns (int): Number of most recent turns always kept verbatim.
+            compact_ratio (float): Fraction of the context window the conversation may
+                fill before it's compacted.
+            pinned_messages (int): Number of leading messages that are never summarized.
+        """
+        self.context_size = context_size
+        self.keep_turns = (
+            keep_turns if keep_turns is not None else SSHERLOCK_RUNNER_CONTEXT_KEEP_TURNS
+        )
+        self.compact_ratio = (
+            compact_ratio
+            if compact_ratio is not None
+            else SSHERLOCK_RUNNER_CONTEXT_COMPACT_RATIO
+        )
+        self.pinned_messages = pinned_messages
+        # The summary of every turn folded so far, if any.
+        self.summary = None
+
+    def fit(self, conversation: Conversation, summarize) -> bool:
+        """Fold older turns into the summary if the conversation is over budget."""
+        if not self.context_size:
+            return True
+        if conversation.token_count <= self.compact_ratio * self.context_size:
+            return True
+
+        start = self.pinned_messages + (1 if self.summary is not None else 0)
+        end = len(conversation) - self.keep_turns * self.MESSAGES_PER_TURN
+        # Fold turns in batches of at least keep_turns, so a conversation still over the
+        # threshold after a compaction isn't compacted again (changing its prefix) on
+        # every turn. Only a conversation that no longer fits is compacted sooner.
+        if (
+            end - start < self.keep_turns * self.MESSAGES_PER_TURN
+            and conversation.token_count <= self.context_size
+        ):
+            return True
+        if end > start:
+            folded = []
+            if self.summary is not None:
+                folded.append(f"Summary of earlier commands:\n{self.summary}")
+            for message in conversation[start:end]:
+                if message["role"] == "assistant":
+                    folded.append(f"Command: {message['content']}")
+                else:
+                    folded.append(f"Output: {message['content']}")
+            try:
+                summary = summarize("\n".join(folded))
+            except Exception as e:
+                log.error("Failed to summarize older turns: %s", e)
+            else:
+                log.warning("Folded %s older messages into a summary", end - start)
+                pinned = self.pinned_messages
+                del conversation[pinned:end]
+                self.summary = summary
+                conversation.insert(
+                    self.pinned_messages,
+                    {
+                        "role": "user",
+                        "content": f"Summary of the commands run so far:\n{summary}",
+                    },
+                )
+
+        return conversation.token_count <= self.context_size
+
+
 def count_tokens(messages) -> int:
     """Count the number of LLM tokens in the provided dictionary of context.
 
     Uses the list of dictionaries inside the messages list and counts the tokens in the
-    "content" key.
+    "content" key. A Conversation's running count is returned without re-encoding it.
 
     Args:
         messages (list of dicts): Counts tokens in the "content" key of each dictionary in the
@@ -731,13 +1897,11 @@ def count_tokens(messages) -> int:
     Returns:
         int: The number of tokens.
     """
-    content_string = " ".join(message["content"] for message in messages)
-
-    encoding = tiktoken.encoding_for_model(SSHERLOCK_TOKEN_ENCODING_MODEL)
-    tokens = encoding.encode(content_string)
+    if isinstance(messages, Conversation):
+        return messages.token_count
 
-    num_tokens = len(tokens)
-    return num_tokens
+    content_string = " ".join(message["content"] for message in messages)
+    return count_message_tokens(content_string)
 
 
 def is_llm_done(llm_reply: str) -> bool:
@@ -785,11 +1949,15 @@ def fetch_job_data(attempt, max_attempts):
             return None
 
         try:
+            requested_at = time.monotonic()
             job_data = request_job()
             if job_data:
                 return job_data
             log.info("Runner: waiting for a job...%s", attempt + 1)
-            time.sleep(3)
+            # The long-poll already waited on the server. Only back off if it returned
+            # straight away, which means long-polling is disabled or the request failed.
+            if time.monotonic() - requested_at < 1:
+                time.sleep(3)
         except Exception as e:
             log.error("Runner: error requesting job: %s", str(e))
             log.info("Retrying to fetch job...")
@@ -811,22 +1979,60 @@ def execute_job(job_data):
         log.info("Continuing to wait for new jobs...")
 
 
-def main(max_attempts=25):
+def main(max_attempts=25, concurrency=None):
     """Main loop to continually request a job to run and run any job it receives.
 
+    Up to `concurrency` jobs run at once in a thread pool. A new job is only requested from
+    the server once a worker slot is free, so the runner never claims more than it can run.
+
     Args:
         max_attempts (int, optional): Maximum attempts to wait for a job. Defaults to None.
+        concurrency (int, optional): Maximum number of jobs to run at once. Defaults to
+                                     SSHERLOCK_RUNNER_CONCURRENCY.
     """
     attempt = 0
+    if concurrency is None:
+        concurrency = SSHERLOCK_RUNNER_CONCURRENCY
+    concurrency = max(1, concurrency)
+    free_slots = threading.BoundedSemaphore(concurrency)
+
+    log.info("Starting runner with concurrency %s", concurrency)
+    try:
+        # Leaving the executor's context waits for any running jobs to finish.
+        with ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="ssherlock_job"
+        ) as executor:
+            while True:
+                free_slots.acquire()
+                job_data = fetch_job_data(attempt, max_attempts)
+                if job_data is None:
+                    free_slots.release()
+                    return
+
+                future = executor.submit(execute_job, job_data)
+                future.add_done_callback(lambda _: free_slots.release())
+    finally:
+        close_llm_clients()
 
-    log.info("Starting runner")
-    while True:
-        job_data = fetch_job_data(attempt, max_attempts)
-        if job_data is None:
-            return
 
-        execute_job(job_data)
+def parse_args(argv=None):
+    """Parse the runner's command-line arguments.
+
+    Args:
+        argv (list of str, optional): Arguments to parse. Defaults to sys.argv.
+
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=SSHERLOCK_RUNNER_CONCURRENCY,
+        help="Maximum number of jobs to run at once (default: %(default)s).",
+    )
+    return parser.parse_args(argv)
 
 
 if __name__ == "__main__":
-    main()
+    main(concurrency=parse_args().concurrency)
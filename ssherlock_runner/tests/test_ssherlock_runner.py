@@ -3,8 +3,11 @@
 # pylint: disable=import-error, redefined-outer-name, wrong-import-position
 
 import sys
+import gzip
 import json
+import logging as log
 import os
+import threading
 
 from unittest.mock import MagicMock
 from unittest.mock import patch
@@ -16,13 +19,30 @@ import pytest
 
 sys.path.insert(1, "../")
 from ssherlock_runner import (
+    ContextStrategy,
+    Conversation,
+    HttpPostHandler,
     Runner,
+    ServerApiClient,
+    SlidingWindowContext,
+    clear_job_context,
+    close_llm_clients,
     count_tokens,
+    first_command_in_reply,
+    forget_job_status,
+    get_llm_client,
+    get_model_context_size,
+    get_token_encoding,
     is_llm_done,
+    job_was_canceled,
     is_string_too_long,
     main,
+    parse_args,
+    reduce_output,
     request_job,
+    rollup_job_status,
     run_job,
+    set_job_context,
     strip_eot_from_string,
     update_conversation,
     update_job_status,
@@ -36,6 +56,14 @@ SSHERLOCK_SERVER_PROTOCOL = "http"
 SSHERLOCK_SERVER_RUNNER_TOKEN = "myprivatekey"
 
 
+@pytest.fixture(autouse=True)
+def fresh_llm_clients():
+    """Ensure each test builds its own (possibly mocked) shared LLM client."""
+    close_llm_clients()
+    yield
+    close_llm_clients()
+
+
 @pytest.fixture
 def job():
     """Fixture to set up a Runner object."""
@@ -66,6 +94,49 @@ def test_is_string_too_long():
     assert is_string_too_long("a" * 499, threshold=500) is False
 
 
+def test_reduce_output_cleans_terminal_output():
+    """Ensure escape sequences, redrawn progress bars and repeated lines are removed."""
+    output = "\x1b[1;31mError\x1b[0m: failed\n10%\r50%\r100%\n"
+    output += "retrying\n" * 4 + "ok"
+    assert reduce_output(output) == (
+        "Error: failed\n100%\nretrying\n[previous line repeated 3 more times]\nok"
+    )
+
+
+def test_reduce_output_leaves_short_output_alone():
+    """Ensure short output that's already clean isn't changed, even if it's a list."""
+    output = "\n".join(f"ii  package{i}  1.{i}  amd64" for i in range(10))
+    assert reduce_output(output) == output
+
+
+def test_reduce_output_collapses_package_lists():
+    """Ensure runs of per-package lines are cut down, keeping any errors in them."""
+    lines = [f"Get:{i} http://deb.debian.org pkg{i} [{i}00 kB]" for i in range(30)]
+    lines += [f"Unpacking pkg{i} (1.{i}) ..." for i in range(30)]
+    lines[40] = "Unpacking pkg10 (1.10) ... failed"
+    reduced = reduce_output("\n".join(lines))
+    assert reduced.splitlines() == [
+        lines[0],
+        "[28 similar lines omitted]",
+        lines[29],
+        lines[30],
+        lines[40],
+        "[27 similar lines omitted]",
+        lines[59],
+    ]
+
+
+def test_reduce_output_keeps_head_tail_and_errors():
+    """Ensure very long output keeps its first and last lines and errors in between."""
+    words = ["alpha", "beta", "gamma"]
+    lines = [f"{words[i % 3]} {i}" for i in range(200)]
+    lines[100] = "cannot open /etc/missing.conf"
+    reduced = reduce_output("\n".join(lines)).splitlines()
+    assert reduced[:10] == lines[:10]
+    assert reduced[10:12] == ["[169 lines omitted]", "cannot open /etc/missing.conf"]
+    assert reduced[12:] == lines[-20:]
+
+
 def test_count_tokens():
     """Ensure tokens get counted correctly."""
     messages = [
@@ -82,6 +153,164 @@ def test_count_tokens():
     assert count_tokens(messages) == 1
 
 
+@pytest.fixture
+def word_encoding():
+    """Count each word as one token, so tests don't need tiktoken's encoding files."""
+    encoding = MagicMock()
+    encoding.encode_ordinary.side_effect = lambda text: text.split()
+    encoding.decode.side_effect = " ".join
+    with patch("ssherlock_runner.get_token_encoding", return_value=encoding):
+        yield encoding
+
+
+def test_conversation_counts_tokens_incrementally(word_encoding):
+    """Ensure a conversation only encodes each new message, once."""
+    conversation = Conversation(
+        [
+            {"role": "system", "content": "You are a helpful AI assistant."},
+            {"role": "user", "content": "What is the capital of Japan?"},
+        ]
+    )
+    assert conversation.token_count == 12
+    assert conversation.token_count == 12
+    assert word_encoding.encode_ordinary.call_count == 2
+
+    conversation.append({"role": "assistant", "content": "Tokyo"})
+    assert conversation.token_count == 13
+    assert count_tokens(conversation) == 13
+    assert word_encoding.encode_ordinary.call_count == 3
+    assert conversation[2] == {"role": "assistant", "content": "Tokyo"}
+
+
+@pytest.mark.usefixtures("word_encoding")
+def test_conversation_removing_messages_updates_count():
+    """Ensure removing messages takes their tokens off the running count."""
+    conversation = Conversation(
+        [
+            {"role": "system", "content": "one"},
+            {"role": "user", "content": "two two"},
+            {"role": "assistant", "content": "three three three"},
+        ]
+    )
+    assert conversation.token_count == 6
+    assert conversation.pop(1)["content"] == "two two"
+    assert conversation.token_count == 4
+    del conversation[0:1]
+    assert conversation.token_count == 3
+    assert len(conversation) == 1
+    conversation.append({"role": "user", "content": "four four four four"})
+    del conversation[-1]
+    assert conversation.token_count == 3
+
+
+def make_conversation(turns):
+    """Build a conversation with a system prompt, a task and the given number of turns."""
+    conversation = Conversation(
+        [
+            {"role": "system", "content": "system prompt"},
+            {"role": "user", "content": "the task"},
+        ]
+    )
+    for i in range(turns):
+        conversation.append({"role": "assistant", "content": f"command{i}"})
+        conversation.append({"role": "user", "content": f"output{i} word word"})
+    return conversation
+
+
+@pytest.mark.usefixtures("word_encoding")
+def test_sliding_window_context_folds_older_turns():
+    """Ensure older turns are summarized while the pinned messages and recent turns stay."""
+    conversation = make_conversation(4)
+    context = SlidingWindowContext(40, keep_turns=1, compact_ratio=0.4)
+    summarize = MagicMock(return_value="ran three commands")
+
+    assert context.fit(conversation, summarize) is True
+
+    folded = summarize.call_args.args[0]
+    assert "Command: command0" in folded and "Output: output2 word word" in folded
+    assert "command3" not in folded
+    assert [message["content"] for message in conversation] == [
+        "system prompt",
+        "the task",
+        "Summary of the commands run so far:\nran three commands",
+        "command3",
+        "output3 word word",
+    ]
+    assert conversation.token_count == 18
+
+    # The next compaction folds the earlier summary into the new one.
+    conversation.append({"role": "assistant", "content": "command4"})
+    conversation.append({"role": "user", "content": "output4 " + "word " * 20})
+    summarize.return_value = "ran four commands"
+    assert context.fit(conversation, summarize) is True
+    assert "Summary of earlier commands:\nran three commands" in (
+        summarize.call_args.args[0]
+    )
+    assert len(conversation) == 5
+    assert conversation[2]["content"].endswith("ran four commands")
+
+
+@pytest.mark.usefixtures("word_encoding")
+def test_sliding_window_context_keeps_prefix_between_compactions():
+    """Ensure turns are folded in batches, and only appended to in between."""
+    conversation = make_conversation(6)
+    context = SlidingWindowContext(60, keep_turns=3, compact_ratio=0.25)
+    assert context.fit(conversation, MagicMock(return_value="ran three commands"))
+    assert len(conversation) == 3 + 3 * 2
+    summarize = MagicMock(return_value="ran four commands")
+
+    # Still over the threshold, but too few new turns to fold yet.
+    for i in range(6, 8):
+        prefix = list(conversation)
+        update_conversation(conversation, f"command{i}", "ok")
+        assert context.fit(conversation, summarize) is True
+        assert conversation[: len(prefix)] == prefix
+    summarize.assert_not_called()
+
+    update_conversation(conversation, "command8", "ok")
+    assert context.fit(conversation, summarize) is True
+    summarize.assert_called_once()
+    assert conversation[2]["content"].endswith("ran four commands")
+    assert len(conversation) == 3 + 3 * 2
+
+
+@pytest.mark.usefixtures("word_encoding")
+def test_sliding_window_context_under_budget():
+    """Ensure a conversation under budget, or with no context size set, is left alone."""
+    summarize = MagicMock()
+    conversation = make_conversation(4)
+    assert SlidingWindowContext(1000).fit(conversation, summarize) is True
+    assert SlidingWindowContext(0).fit(conversation, summarize) is True
+    summarize.assert_not_called()
+    assert len(conversation) == 10
+
+
+@pytest.mark.usefixtures("word_encoding")
+def test_sliding_window_context_reports_overflow():
+    """Ensure fit fails when even the compacted conversation is too big."""
+    conversation = make_conversation(2)
+    conversation[1]["content"] = "word " * 100
+    context = SlidingWindowContext(40, keep_turns=1, compact_ratio=0.5)
+    assert context.fit(conversation, MagicMock(return_value="summary")) is False
+
+
+def test_context_strategy_is_abstract():
+    """Ensure a strategy must implement fit."""
+    with pytest.raises(TypeError):
+        ContextStrategy()  # pylint: disable=abstract-class-instantiated
+
+
+def test_get_token_encoding_is_cached():
+    """Ensure the encoding is only loaded once per process."""
+    get_token_encoding.cache_clear()
+    try:
+        with patch("ssherlock_runner.tiktoken.encoding_for_model") as mock_load:
+            assert get_token_encoding() is get_token_encoding()
+        mock_load.assert_called_once()
+    finally:
+        get_token_encoding.cache_clear()
+
+
 def test_context_size_warning_check(job):
     """Ensure we get warned properly when the context is about to be exceeded."""
     messages = [
@@ -207,6 +436,193 @@ def test_query_llm(job):
         assert response == "Tokyo"
 
 
+def test_query_llm_reuses_client(job):
+    """Ensure every LLM query made for the same API shares a single client."""
+    mock_client = MagicMock()
+    mock_client.chat.completions.create.return_value.choices[0].message.content = "ok"
+
+    with patch("openai.OpenAI", return_value=mock_client) as mock_openai:
+        job.query_llm([{"role": "user", "content": "one"}])
+        job.query_llm([{"role": "user", "content": "two"}])
+        job.summarize_string("three")
+        assert mock_openai.call_count == 1
+
+
+def make_stream(*contents):
+    """Return a mock chat completion stream that sends the given pieces of content."""
+    chunks = []
+    for content in contents:
+        chunk = MagicMock()
+        chunk.choices[0].delta.content = content
+        chunks.append(chunk)
+    stream = MagicMock()
+    stream.__iter__.return_value = iter(chunks)
+    return stream
+
+
+def test_query_llm_streams_first_command(job):
+    """Ensure a streamed reply is cut off once its first command is complete."""
+    mock_client = MagicMock()
+    stream = make_stream(
+        "```bash\n", "sudo apt", " update", "\n", "sudo apt", " upgrade"
+    )
+    mock_client.chat.completions.create.return_value = stream
+
+    with patch("openai.OpenAI", return_value=mock_client):
+        response = job.query_llm(
+            [{"role": "user", "content": "hi"}], first_command=True
+        )
+
+    assert response == "sudo apt update"
+    assert mock_client.chat.completions.create.call_args.kwargs["stream"] is True
+    stream.close.assert_called_once()
+    assert len(job.llm_turn_metrics) == 1
+    assert job.llm_turn_metrics[0]["tokens"] == 4
+    assert job.llm_turn_metrics[0]["time_to_first_token"] >= 0
+
+
+def test_query_llm_streams_done(job):
+    """Ensure DONE is returned without waiting for the rest of the reply."""
+    mock_client = MagicMock()
+    mock_client.chat.completions.create.return_value = make_stream(
+        "DONE", ". The", " task is complete."
+    )
+
+    with patch("openai.OpenAI", return_value=mock_client):
+        response = job.query_llm(
+            [{"role": "user", "content": "hi"}], first_command=True
+        )
+
+    assert response == "DONE"
+    assert job.llm_turn_metrics[0]["tokens"] == 2
+
+
+def test_query_llm_streams_reply_without_newline(job):
+    """Ensure a streamed reply that ends before a newline is returned whole."""
+    mock_client = MagicMock()
+    mock_client.chat.completions.create.return_value = make_stream(
+        "ls", " -la", "<|eot_id|>"
+    )
+
+    with patch("openai.OpenAI", return_value=mock_client):
+        response = job.query_llm(
+            [{"role": "user", "content": "hi"}], first_command=True
+        )
+
+    assert response == "ls -la"
+
+
+def test_query_llm_without_streaming(job):
+    """Ensure the full reply is requested when streaming is disabled."""
+    mock_client = MagicMock()
+    mock_client.chat.completions.create.return_value.choices[0].message.content = "ls"
+
+    with patch("ssherlock_runner.SSHERLOCK_LLM_STREAM", False):
+        with patch("openai.OpenAI", return_value=mock_client):
+            response = job.query_llm(
+                [{"role": "user", "content": "hi"}], first_command=True
+            )
+
+    assert response == "ls"
+    assert "stream" not in mock_client.chat.completions.create.call_args.kwargs
+
+
+def test_query_llm_sends_cache_hints(job):
+    """Ensure conversation requests carry prompt caching hints when they're enabled."""
+    mock_client = MagicMock()
+    mock_client.chat.completions.create.return_value = make_stream("ls\n")
+
+    with patch("ssherlock_runner.SSHERLOCK_LLM_CACHE_HINTS", True):
+        with patch("openai.OpenAI", return_value=mock_client):
+            job.query_llm([{"role": "user", "content": "hi"}], first_command=True)
+            kwargs = mock_client.chat.completions.create.call_args.kwargs
+            assert kwargs["user"] == "ssherlock-1234567890abcdef"
+            assert kwargs["extra_body"] == {"cache_prompt": True}
+
+            # Summaries don't share the conversation's prefix, so they aren't cached.
+            job.summarize_string("output")
+            kwargs = mock_client.chat.completions.create.call_args.kwargs
+            assert "extra_body" not in kwargs and "user" not in kwargs
+
+
+def test_query_llm_without_cache_hints(job):
+    """Ensure no prompt caching hints are sent by default."""
+    mock_client = MagicMock()
+    mock_client.chat.completions.create.return_value = make_stream("ls\n")
+
+    with patch("openai.OpenAI", return_value=mock_client):
+        job.query_llm([{"role": "user", "content": "hi"}], first_command=True)
+
+    assert "extra_body" not in mock_client.chat.completions.create.call_args.kwargs
+
+
+def test_first_command_in_reply():
+    """Ensure the first command is only returned once its line is complete."""
+    assert first_command_in_reply("sudo apt") is None
+    assert first_command_in_reply("\n\n```sh\n") is None
+    assert first_command_in_reply("\n```sh\nuptime\nfree -m") == "uptime"
+    assert first_command_in_reply("  DONE\n") == "DONE"
+    assert first_command_in_reply("DONE!") == "DONE"
+    assert first_command_in_reply("DONE") is None
+
+
+def test_get_llm_client_is_per_api():
+    """Ensure different LLM APIs get different clients, and the same API gets the same one."""
+    client_a = get_llm_client("http://a.example.com/v1", "key")
+    assert get_llm_client("http://a.example.com/v1", "key") is client_a
+    assert get_llm_client("http://b.example.com/v1", "key") is not client_a
+    assert get_llm_client("http://a.example.com/v1", "other-key") is not client_a
+
+
+def test_get_model_context_size_from_model_list():
+    """Ensure the context size is read from the LLM API's model list, and cached."""
+    client = MagicMock()
+    model = openai.types.Model(
+        id="llama3.1", created=0, object="model", owned_by="me", max_model_len=32768
+    )
+    client.models.list.return_value = [model]
+    with patch("ssherlock_runner.get_llm_client", return_value=client):
+        assert get_model_context_size("http://vllm.example.com/v1", "key") == 32768
+        assert get_model_context_size("http://vllm.example.com/v1", "key") == 32768
+    client.models.list.assert_called_once()
+
+
+def test_get_model_context_size_from_model_meta():
+    """Ensure the context size is read from llama.cpp's model metadata."""
+    client = MagicMock()
+    model = openai.types.Model(
+        id="llama3.1",
+        created=0,
+        object="model",
+        owned_by="me",
+        meta={"n_ctx_train": 131072},
+    )
+    client.models.list.return_value = [model]
+    with patch("ssherlock_runner.get_llm_client", return_value=client):
+        assert get_model_context_size("http://llamacpp.example.com/v1", "key") == 131072
+
+
+def test_get_model_context_size_falls_back_to_default():
+    """Ensure the configured default is used, with a warning, when the API doesn't say."""
+    client = MagicMock()
+    client.models.list.side_effect = openai.APIConnectionError(request=MagicMock())
+    with patch("ssherlock_runner.get_llm_client", return_value=client), patch(
+        "ssherlock_runner.SSHERLOCK_LLM_DEFAULT_CONTEXT_SIZE", 131072
+    ), patch("ssherlock_runner.log.warning") as mock_warning:
+        assert get_model_context_size("http://down.example.com/v1", "key") == 131072
+    mock_warning.assert_called_once()
+    assert mock_warning.call_args.args[1] == 131072
+
+
+def test_get_model_context_size_from_env():
+    """Ensure SSHERLOCK_LLM_CONTEXT_SIZE overrides the lookup."""
+    with patch("ssherlock_runner.SSHERLOCK_LLM_CONTEXT_SIZE", 4096), patch(
+        "ssherlock_runner.get_llm_client"
+    ) as mock_client:
+        assert get_model_context_size("http://env.example.com/v1", "key") == 4096
+    mock_client.assert_not_called()
+
+
 def test_can_llm_be_reached_success(job):
     """Ensure the correct bool is returned when we check the reachability of the LLM and succeed."""
     with patch.object(job, "query_llm", return_value="GOOD"):
@@ -309,6 +725,7 @@ def test_run_ssh_cmd_without_sudo(job):
 #     mock_update_status.assert_called_once_with("1234567890abcdef", "Failed")
 
 
+@pytest.mark.usefixtures("word_encoding")
 def test_handle_ssh_command_no_summarization(job):
     """Ensure running an SSH command works correctly without output summarization."""
     mock_ssh = MagicMock()
@@ -326,6 +743,7 @@ def test_handle_ssh_command_with_summarization(job):
     mock_llm_reply = "ls -1"
     mock_ssh_reply = "dir1 dir2 dir3 file1.txt file2.txt"
     summarized_output = "A list of directories and files."
+    job.model_context_size = 0
 
     # Patch both the run_ssh_cmd method and the is_string_too_long method.
     with patch.object(job, "run_ssh_cmd", return_value=mock_ssh_reply), patch(
@@ -337,32 +755,144 @@ def test_handle_ssh_command_with_summarization(job):
         assert response == summarized_output
 
 
+def test_handle_ssh_command_reduces_before_summarizing(job):
+    """Ensure output that's short enough once reduced isn't sent to the LLM."""
+    mock_ssh_reply = "\n".join(f"Setting up pkg{i} (1.{i}) ..." for i in range(100))
+    job.model_context_size = 0
+
+    with patch.object(job, "run_ssh_cmd", return_value=mock_ssh_reply), patch.object(
+        job, "summarize_string"
+    ) as mock_summarize:
+        response = job.handle_ssh_command(MagicMock(), "sudo apt-get install -y pkg")
+
+    mock_summarize.assert_not_called()
+    assert response == (
+        "Setting up pkg0 (1.0) ...\n[98 similar lines omitted]\n"
+        "Setting up pkg99 (1.99) ..."
+    )
+
+
+@pytest.mark.usefixtures("word_encoding")
+def test_output_token_allowance(job):
+    """Ensure an output's allowance is a share of the context, capped by what's left."""
+    job.model_context_size = 10000
+    messages = [{"role": "user", "content": "word " * 100}]
+    assert job.output_token_allowance(messages) == 1000
+
+    messages = [{"role": "user", "content": "word " * 9500}]
+    assert job.output_token_allowance(messages) == 500
+
+    messages = [{"role": "user", "content": "word " * 10000}]
+    assert job.output_token_allowance(messages) == 64
+
+
+@pytest.mark.usefixtures("word_encoding")
+def test_handle_ssh_command_truncates_output_slightly_over_budget(job):
+    """Ensure output a little over its token allowance is truncated without the LLM."""
+    job.model_context_size = 1000
+    mock_ssh_reply = " ".join(f"word{i}" for i in range(150))
+
+    with patch.object(job, "run_ssh_cmd", return_value=mock_ssh_reply), patch.object(
+        job, "summarize_string"
+    ) as mock_summarize:
+        response = job.handle_ssh_command(MagicMock(), "cat file", [])
+
+    mock_summarize.assert_not_called()
+    assert response.startswith("word0 word1")
+    assert "[50 tokens omitted]" in response
+    assert response.endswith("word148 word149")
+
+
+@pytest.mark.usefixtures("word_encoding")
+def test_handle_ssh_command_summarizes_output_far_over_budget(job):
+    """Ensure output far over its token allowance is summarized by the LLM."""
+    job.model_context_size = 1000
+    mock_ssh_reply = " ".join(f"word{i}" for i in range(500))
+
+    with patch.object(job, "run_ssh_cmd", return_value=mock_ssh_reply), patch.object(
+        job, "summarize_string", return_value="five hundred words"
+    ) as mock_summarize:
+        response = job.handle_ssh_command(MagicMock(), "cat file", [])
+
+    mock_summarize.assert_called_once()
+    assert response == "five hundred words"
+
+
+@pytest.mark.usefixtures("word_encoding")
+def test_handle_ssh_command_passes_output_within_budget(job):
+    """Ensure output within a large model's allowance isn't summarized or truncated."""
+    job.model_context_size = 128000
+    mock_ssh_reply = " ".join(f"word{i}" for i in range(2000))
+
+    with patch.object(job, "run_ssh_cmd", return_value=mock_ssh_reply), patch.object(
+        job, "summarize_string"
+    ) as mock_summarize:
+        response = job.handle_ssh_command(MagicMock(), "cat file", [])
+
+    mock_summarize.assert_not_called()
+    assert response == mock_ssh_reply
+
+
 def test_update_job_status_success():
     """Ensure job status is updated successfully."""
-    with patch("requests.post") as mock_post:
+    with patch("ssherlock_runner.server_api.post") as mock_post:
         mock_response = MagicMock()
         mock_response.status_code = 200
         mock_post.return_value = mock_response
 
         update_job_status("job123", "Completed")
-        # Use the values from the module under test to build the expected URL so
-        # tests remain in sync with the module's configuration.
-        import ssherlock_runner as runner_mod
 
         mock_post.assert_called_once_with(
-            f"{runner_mod.SSHERLOCK_SERVER_PROTOCOL}://{runner_mod.SSHERLOCK_SERVER_DOMAIN}/update_job_status/job123",
-            headers={
-                "Authorization": f"Bearer {runner_mod.SSHERLOCK_SERVER_RUNNER_TOKEN}",
-                "Content-Type": "application/json",
-            },
-            data=json.dumps({"status": "Completed"}),
+            "update_job_status/job123",
+            json={"status": "Completed"},
             timeout=10,
         )
 
 
+def test_update_job_status_claimed_by_another_runner():
+    """Ensure a job another runner has claimed is stopped like a canceled one."""
+    with patch("ssherlock_runner.server_api.post") as mock_post:
+        mock_post.return_value.status_code = 403
+        update_job_status("job403", "Running")
+    assert job_was_canceled("job403")
+    forget_job_status("job403")
+
+
+def test_server_api_client_sets_auth_headers_once():
+    """Ensure the shared server API session carries the runner's auth and ID headers."""
+    client = ServerApiClient("http://server.example.com/", "token123", "runner-1")
+    assert client.session.headers["Authorization"] == "Bearer token123"
+    assert client.session.headers["X-Runner-Id"] == "runner-1"
+
+    with patch.object(client.session, "post") as mock_post:
+        client.post("log_job_data/job123", json={"log": "line"}, timeout=10)
+        mock_post.assert_called_once_with(
+            "http://server.example.com/log_job_data/job123",
+            json={"log": "line"},
+            timeout=10,
+        )
+
+
+def test_server_api_client_does_not_retry_job_claims():
+    """Ensure a claim is only retried if it never reached the server."""
+    client = ServerApiClient("http://server.example.com", "token123", "runner-1")
+    claim_retry = client.session.get_adapter(
+        "http://server.example.com/request_job?wait=25"
+    ).max_retries
+    assert claim_retry.read == 0
+    assert claim_retry.status == 0
+    assert claim_retry.connect == 3
+
+    other_retry = client.session.get_adapter(
+        "http://server.example.com/update_job_status/job123"
+    ).max_retries
+    assert other_retry.status_forcelist == (502, 503, 504)
+    assert other_retry.read is None
+
+
 def test_update_job_status_failure():
     """Ensure proper logging on failure to update job status."""
-    with patch("requests.post") as mock_post, patch(
+    with patch("ssherlock_runner.server_api.post") as mock_post, patch(
         "ssherlock_runner.log.error"
     ) as mock_log_error:
         mock_response = MagicMock()
@@ -382,9 +912,9 @@ def test_update_job_status_failure():
 
 def test_update_job_status_exception():
     """Ensure proper logging on exception during job status update."""
-    with patch("requests.post", side_effect=Exception("Connection error")) as _, patch(
-        "ssherlock_runner.log.error"
-    ) as mock_log_error:
+    with patch(
+        "ssherlock_runner.server_api.post", side_effect=Exception("Connection error")
+    ) as _, patch("ssherlock_runner.log.error") as mock_log_error:
 
         update_job_status("job123", "Failed")
 
@@ -417,9 +947,171 @@ def test_run_job():
         mock_runner_instance.run.assert_called_once()
 
 
+def test_run_job_reports_running_before_slow_startup():
+    """Ensure a runner whose startup outlasts the claim lease has already reported Running."""
+    job_data = {
+        "id": "job123",
+        "llm_api_baseurl": "http://api.example.com",
+        "instructions": "Run this job",
+        "target_host_hostname": "localhost",
+        "credentials_for_target_hosts_username": "user",
+    }
+
+    def slow_initialize():
+        # By the time the LLM has come up, the server's claim lease has long expired.
+        mock_update.assert_called_once_with("job123", "Running")
+        raise RuntimeError
+
+    with patch("ssherlock_runner.update_job_status") as mock_update, patch(
+        "ssherlock_runner.Runner.initialize", side_effect=slow_initialize
+    ), patch("ssherlock_runner.get_model_context_size", return_value=8192), patch(
+        "ssherlock_runner.HttpPostHandler.emit"
+    ):
+        run_job(job_data)
+    assert mock_update.call_args_list[-1].args == ("job123", "Failed")
+
+
+def test_rollup_job_status():
+    """Ensure per-host statuses are combined into one job status."""
+    assert rollup_job_status(["Completed", "Completed"]) == "Completed"
+    assert rollup_job_status(["Completed", "Failed"]) == "Failed"
+    assert rollup_job_status(["Canceled", "Failed"]) == "Canceled"
+    assert rollup_job_status(["Completed", "Context Exceeded"]) == "Context Exceeded"
+    assert rollup_job_status(["Completed", None]) == "Failed"
+    assert rollup_job_status([]) == "Failed"
+
+
+def test_run_job_fans_out_across_target_hosts():
+    """Ensure a job with several target hosts runs one Runner per host in parallel."""
+    job_data = {
+        "id": "job123",
+        "llm_api_baseurl": "http://api.example.com",
+        "instructions": "Run this job",
+        "target_hosts": [
+            {"id": "host-1", "hostname": "host1.example.com", "port": 22},
+            {"id": "host-2", "hostname": "host2.example.com", "port": 22},
+        ],
+    }
+    barrier = threading.Barrier(2, timeout=5)
+
+    def run(self):
+        barrier.wait()
+        self.update_status("Completed")
+
+    with patch("ssherlock_runner.update_job_status") as mock_update_job_status, patch(
+        "ssherlock_runner.Runner.run", autospec=True, side_effect=run
+    ):
+        run_job(job_data)
+
+    mock_update_job_status.assert_any_call("job123", "Running")
+    mock_update_job_status.assert_any_call("job123", "Completed", target_host="host-1")
+    mock_update_job_status.assert_any_call("job123", "Completed", target_host="host-2")
+    assert mock_update_job_status.call_args == (("job123", "Completed"),)
+
+
+def test_http_post_handler_only_forwards_its_own_job():
+    """Ensure log records from threads working on other jobs aren't forwarded."""
+    handler = HttpPostHandler("job123")
+    record = MagicMock()
+    record.levelno = 20
+    try:
+        set_job_context("job123")
+        assert handler.filter(record)
+        set_job_context("job456")
+        assert not handler.filter(record)
+    finally:
+        clear_job_context()
+
+
+def sent_log_entries(call):
+    """Return the log entries from a mocked log_job_data_batch POST."""
+    body = call.kwargs["data"]
+    if call.kwargs["headers"].get("Content-Encoding") == "gzip":
+        body = gzip.decompress(body)
+    return json.loads(body)["logs"]
+
+
+def test_http_post_handler_sends_batches():
+    """Ensure queued log records are sent in batches and flushed when the handler closes."""
+    with patch("ssherlock_runner.server_api.post") as mock_post:
+        mock_post.return_value.status_code = 200
+        handler = HttpPostHandler("job123", batch_size=2, flush_interval=10)
+        handler.setFormatter(log.Formatter("%(message)s"))
+        logger = log.getLogger("test_http_post_handler_sends_batches")
+        logger.addHandler(handler)
+        try:
+            set_job_context("job123")
+            for i in range(3):
+                logger.warning("line %s", i)
+        finally:
+            clear_job_context()
+            logger.removeHandler(handler)
+            handler.close()
+
+    sent = [sent_log_entries(c) for c in mock_post.call_args_list]
+    assert [[entry["message"] for entry in batch] for batch in sent] == [
+        ["line 0", "line 1"],
+        ["line 2"],
+    ]
+    assert all(entry["level"] == "WARNING" for batch in sent for entry in batch)
+    assert all(isinstance(entry["timestamp"], float) for batch in sent for entry in batch)
+    assert mock_post.call_args.args == ("log_job_data_batch/job123",)
+
+
+def test_http_post_handler_gzips_large_batches():
+    """Ensure batches over the size threshold are sent gzip-compressed."""
+    with patch("ssherlock_runner.server_api.post") as mock_post, patch(
+        "ssherlock_runner.SSHERLOCK_RUNNER_LOG_GZIP_MIN_BYTES", 64
+    ):
+        mock_post.return_value.status_code = 200
+        handler = HttpPostHandler("job123", flush_interval=10)
+        handler.setFormatter(log.Formatter("%(message)s"))
+        logger = log.getLogger("test_http_post_handler_gzips_large_batches")
+        logger.addHandler(handler)
+        try:
+            set_job_context("job123")
+            logger.warning("x" * 200)
+        finally:
+            clear_job_context()
+            logger.removeHandler(handler)
+            handler.close()
+
+    headers = mock_post.call_args.kwargs["headers"]
+    assert headers["Content-Encoding"] == "gzip"
+    assert sent_log_entries(mock_post.call_args)[0]["message"] == "x" * 200
+
+
+def test_http_post_handler_drops_records_when_queue_is_full():
+    """Ensure a full queue drops records instead of blocking, and reports the drops."""
+    release = threading.Event()
+    with patch("ssherlock_runner.server_api.post") as mock_post:
+        mock_post.side_effect = lambda *args, **kwargs: release.wait(5) and MagicMock(
+            status_code=200
+        )
+        handler = HttpPostHandler("job123", batch_size=1, flush_interval=0, queue_size=1)
+        handler.setFormatter(log.Formatter("%(message)s"))
+        logger = log.getLogger("test_http_post_handler_drops_records")
+        logger.addHandler(handler)
+        try:
+            set_job_context("job123")
+            for i in range(50):
+                logger.warning("line %s", i)
+        finally:
+            clear_job_context()
+            logger.removeHandler(handler)
+            release.set()
+            handler.close()
+
+    sent = [
+        entry["message"] for c in mock_post.call_args_list for entry in sent_log_entries(c)
+    ]
+    assert len([message for message in sent if message.startswith("line")]) < 50
+    assert any("log records were dropped" in message for message in sent)
+
+
 def test_request_job_success():
     """Ensure get_next_job fetches job data successfully."""
-    with patch("requests.get") as mock_get:
+    with patch("ssherlock_runner.server_api.get") as mock_get:
         mock_response = MagicMock()
         mock_response.status_code = 200
         mock_response.json.return_value = {"id": "job123"}
@@ -429,10 +1121,23 @@ def test_request_job_success():
         assert job_data == {"id": "job123"}
 
 
+def test_request_job_long_polls():
+    """Ensure request_job asks the server to hold the request open until a job arrives."""
+    import ssherlock_runner as runner_mod
+
+    with patch("ssherlock_runner.server_api.get") as mock_get:
+        mock_get.return_value.status_code = 404
+        request_job()
+        _, kwargs = mock_get.call_args
+        assert kwargs["params"] == {"wait": runner_mod.SSHERLOCK_RUNNER_LONG_POLL_SECONDS}
+        assert kwargs["timeout"] > runner_mod.SSHERLOCK_RUNNER_LONG_POLL_SECONDS
+
+
 def test_request_job_failure():
     """Ensure get_next_job handles network errors gracefully."""
     with patch(
-        "requests.get", side_effect=requests.RequestException("Network error")
+        "ssherlock_runner.server_api.get",
+        side_effect=requests.RequestException("Network error"),
     ) as _, patch("ssherlock_runner.log.error") as mock_log_error:
 
         result = request_job()
@@ -454,6 +1159,26 @@ def test_initialize_success(mock_can_reach, mock_wait_llm, job):
     mock_wait_llm.assert_called_once()
 
 
+@patch("ssherlock_runner.get_model_context_size", return_value=32768)
+@patch("ssherlock_runner.Runner.wait_for_llm_to_become_available")
+@patch("ssherlock_runner.Runner.can_target_server_be_reached", return_value=True)
+def test_initialize_looks_up_context_size(mock_can_reach, mock_wait_llm, mock_size):
+    """Ensure a runner without a context size gets the model's."""
+    runner = Runner(
+        job_id="1234567890abcdef",
+        llm_api_base_url="api1.example.com",
+        initial_prompt="Initial prompt example message.",
+        target_host_hostname="target1.example.com",
+        credentials_for_target_hosts_username="user1",
+    )
+    runner.initialize()
+    mock_can_reach.assert_called_once()
+    mock_wait_llm.assert_called_once()
+    mock_size.assert_called_once_with("api1.example.com", "Bearer no-key")
+    assert runner.model_context_size == 32768
+    assert runner.context_strategy.context_size == 32768
+
+
 @patch("ssherlock_runner.log.critical")
 @patch("ssherlock_runner.Runner.wait_for_llm_to_become_available")
 @patch("ssherlock_runner.Runner.can_target_server_be_reached", return_value=False)
@@ -511,52 +1236,46 @@ def test_can_target_server_be_reached_failure(
     mock_update_status.assert_called_once_with("1234567890abcdef", "Failed")
 
 
-@patch("ssherlock_runner.requests.get")
-@patch("ssherlock_runner.log.error")
-def test_is_job_canceled_success(mock_log_error, mock_requests_get, job):
-    """Test is_job_canceled method when job status is 'Canceled'."""
-
-    mock_response = MagicMock()
-    mock_response.raise_for_status.return_value = None
-    mock_response.json.return_value = {"status": "Canceled"}
-    mock_requests_get.return_value = mock_response
-
-    result = job.is_job_canceled()
-
-    assert result is True
-    mock_log_error.assert_not_called()
-
-
-@patch("ssherlock_runner.requests.get")
-@patch("ssherlock_runner.log.error")
-def test_is_job_canceled_not_canceled(mock_log_error, mock_requests_get, job):
-    """Test is_job_canceled method when job status is not 'Canceled'."""
-
-    mock_response = MagicMock()
-    mock_response.raise_for_status.return_value = None
-    mock_response.json.return_value = {"status": "Running"}
-    mock_requests_get.return_value = mock_response
-
-    result = job.is_job_canceled()
-
-    assert result is False
-    mock_log_error.assert_not_called()
+def test_is_job_canceled_from_status_update_response(job):
+    """Test a job learns it was canceled from the reply to one of its status updates."""
+    try:
+        with patch("ssherlock_runner.server_api.post") as mock_post:
+            mock_post.return_value.status_code = 409
+            mock_post.return_value.json.return_value = {
+                "message": "Job is already Canceled.",
+                "status": "Canceled",
+            }
+            assert job.is_job_canceled() is False
+            update_job_status(job.job_id, "Running")
+        assert job.is_job_canceled() is True
+    finally:
+        forget_job_status(job.job_id)
+    assert job.is_job_canceled() is False
 
 
-@patch("ssherlock_runner.requests.get")
-@patch("ssherlock_runner.log.error")
-def test_is_job_canceled_failure(mock_log_error, mock_requests_get, job):
-    """Test is_job_canceled method when an exception occurs."""
-
-    # Simulate a RequestException being raised
-    mock_requests_get.side_effect = requests.RequestException("Network error")
+def test_is_job_canceled_from_log_batch_response(job):
+    """Test a job learns it was canceled from the reply to one of its log batches."""
+    try:
+        with patch("ssherlock_runner.server_api.post") as mock_post:
+            mock_post.return_value.status_code = 200
+            mock_post.return_value.json.return_value = {"status": "Canceled"}
+            handler = HttpPostHandler(job.job_id, flush_interval=10)
+            handler._send([{"timestamp": 0.0, "level": "INFO", "message": "line"}])
+            handler.close()
+        assert job.is_job_canceled() is True
+    finally:
+        forget_job_status(job.job_id)
 
-    result = job.is_job_canceled()
 
-    assert result is False
-    mock_log_error.assert_called_once_with(
-        "Error checking job status: %s", "Network error"
-    )
+@patch("ssherlock_runner.server_api.get")
+def test_is_job_canceled_does_not_call_server(mock_get, job):
+    """Test checking for cancellation doesn't make a request."""
+    with patch("ssherlock_runner.server_api.post") as mock_post:
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.json.return_value = {"status": "Running"}
+        update_job_status(job.job_id, "Running")
+    assert job.is_job_canceled() is False
+    mock_get.assert_not_called()
 
 
 @patch("ssherlock_runner.fabric.Connection")
@@ -650,6 +1369,30 @@ def test_process_interaction_job_canceled(
     mock_update_job_status.assert_any_call(job.job_id, "Canceled")
 
 
+@patch("ssherlock_runner.fabric.Connection")
+@patch("ssherlock_runner.Runner.query_llm")
+@patch("ssherlock_runner.update_job_status")
+@pytest.mark.usefixtures("word_encoding")
+def test_process_interaction_context_exceeded(
+    mock_update_job_status, mock_query_llm, mock_fabric_connection, job
+):
+    """Ensure the job stops as Context Exceeded when its conversation can't be made to fit."""
+    mock_query_llm.side_effect = ["command1", "command2"]
+    mock_ssh_connection = MagicMock()
+    mock_ssh_connection.run.return_value.stdout = "Command executed"
+    mock_ssh_connection.run.return_value.stderr = ""
+    mock_fabric_connection.return_value.__enter__.return_value = mock_ssh_connection
+    job.context_size_warning_check = MagicMock(return_value=True)
+    job.context_strategy = MagicMock()
+    job.context_strategy.fit.return_value = False
+
+    job.process_interaction_loop(job.initialize_messages(), {})
+
+    assert mock_query_llm.call_count == 1
+    job.context_strategy.fit.assert_called_once()
+    mock_update_job_status.assert_called_with(job.job_id, "Context Exceeded")
+
+
 @patch("ssherlock_runner.fabric.Connection")
 @patch("ssherlock_runner.Runner.query_llm")
 @patch("ssherlock_runner.update_job_status")
@@ -895,3 +1638,33 @@ def test_main_exception_handling_in_request_job(_, mock_request_job, mock_run_jo
 
     assert mock_request_job.call_count >= 3
     mock_run_job.assert_called_once_with({"id": "job123"})
+
+
+@patch("ssherlock_runner.run_job")
+@patch("ssherlock_runner.request_job")
+@patch("ssherlock_runner.time.sleep", return_value=None)
+def test_main_runs_jobs_concurrently(_, mock_request_job, mock_run_job):
+    """
+    Test the main function to ensure multiple jobs run at the same time when concurrency > 1.
+
+    Asserts:
+        - Both jobs reach the barrier together, which only happens if they run in parallel.
+    """
+    barrier = threading.Barrier(2, timeout=5)
+    reached_together = []
+
+    def wait_for_other_job(job_data):
+        barrier.wait()
+        reached_together.append(job_data["id"])
+
+    mock_run_job.side_effect = wait_for_other_job
+    mock_request_job.side_effect = [{"id": "job1"}, {"id": "job2"}, None, None, None]
+
+    main(max_attempts=3, concurrency=2)
+
+    assert sorted(reached_together) == ["job1", "job2"]
+
+
+def test_parse_args_concurrency():
+    """Ensure the --concurrency flag is parsed."""
+    assert parse_args(["--concurrency", "4"]).concurrency == 4